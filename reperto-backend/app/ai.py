@@ -1,17 +1,28 @@
 # ai.py
-import os
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv() 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
-def call_openai_parse(text: str):
+from .llm import engine, OPENAI_MODEL
+from .llm_cache import llm_cache, make_key, normalize_prompt_text
+
+# Bump when a prompt changes so cached responses from the old one are not reused
+OPENAI_PARSE_TEMPLATE = "openai_parse/v1"
+PARSE_TEXT_TEMPLATE = "parse_text/v1"
+CDSS_INSIGHTS_TEMPLATE = "cdss_insights/v1"
+
+
+async def call_openai_parse(text: str):
+    key = make_key(OPENAI_MODEL, OPENAI_PARSE_TEMPLATE, normalize_prompt_text(text))
+    cached = await llm_cache.aget(key)
+    if cached is not None:
+        return cached
+
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-                       messages=[
+        resp = await engine.chat(
+            model=OPENAI_MODEL,
+            messages=[
                 {
                     "role": "system",
                     "content": (
@@ -32,7 +43,9 @@ def call_openai_parse(text: str):
         )
 
         content = resp.choices[0].message.content.strip()
-        return json.loads(content)
+        result = json.loads(content)
+        await llm_cache.aset(key, OPENAI_PARSE_TEMPLATE, result)
+        return result
 
     except Exception as e:
         print("OPENAI ERROR:", e)
@@ -45,10 +58,15 @@ def call_openai_parse(text: str):
         ]
 
 
-def parse_text_endpoint(text: str):
+async def parse_text_endpoint(text: str):
+    key = make_key(OPENAI_MODEL, PARSE_TEXT_TEMPLATE, normalize_prompt_text(text))
+    cached = await llm_cache.aget(key)
+    if cached is not None:
+        return cached
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await engine.chat(
+            model=OPENAI_MODEL,
             messages=[
                 {
                     "role": "system",
@@ -74,7 +92,9 @@ def parse_text_endpoint(text: str):
             temperature=0.1
         )
 
-        return json.loads(response.choices[0].message.content)
+        result = json.loads(response.choices[0].message.content)
+        await llm_cache.aset(key, PARSE_TEXT_TEMPLATE, result)
+        return result
 
     except Exception as e:
         return {
@@ -90,45 +110,90 @@ def parse_text_endpoint(text: str):
         }
 
 
+def _insight_messages(doctor_text: str, rubrics: list, remedies: list):
+    rubric_list = [r["rubric"] for r in rubrics]
+    remedy_list = [rem["remedy"] for rem in remedies]
+
+    prompt = (
+        f"Case Notes: {doctor_text}\n\n"
+        f"Selected Rubrics: {', '.join(rubric_list)}\n"
+        f"Ranked Remedies: {', '.join(remedy_list)}\n\n"
+        "Analyze the above clinical data. Provide:\n"
+        "1. A professional English summary of the patient's problem.\n"
+        "2. A short rationale for why each rubric matches the case notes.\n"
+        "3. A short clinical insight for why each remedy is indicated based on these rubrics.\n\n"
+        "Return ONLY JSON in this format:\n"
+        "{\n"
+        "  \"summary\": \"string\",\n"
+        "  \"rubric_rationales\": { \"rubric_path\": \"short rationale\" },\n"
+        "  \"remedy_insights\": { \"remedy_name\": \"short insight\" }\n"
+        "}"
+    )
+
+    return [
+        {"role": "system", "content": "You are a senior homeopathic clinical consultant."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _insight_key(doctor_text: str, rubrics: list, remedies: list):
+    return make_key(OPENAI_MODEL, CDSS_INSIGHTS_TEMPLATE, {
+        "notes": normalize_prompt_text(doctor_text),
+        "rubrics": [r["rubric"] for r in rubrics],
+        "remedies": [rem["remedy"] for rem in remedies],
+    })
+
+
+INSIGHTS_FALLBACK = {
+    "summary": "Clinical analysis completed.",
+    "rubric_rationales": {},
+    "remedy_insights": {}
+}
+
+
 def generate_cdss_insights(doctor_text: str, rubrics: list, remedies: list):
     """
     Generate medical rationales for selected rubrics and remedies.
+    Blocking variant for sync callers (runs on the shared engine loop).
     """
+    key = _insight_key(doctor_text, rubrics, remedies)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        rubric_list = [r["rubric"] for r in rubrics]
-        remedy_list = [rem["remedy"] for rem in remedies]
-
-        prompt = (
-            f"Case Notes: {doctor_text}\n\n"
-            f"Selected Rubrics: {', '.join(rubric_list)}\n"
-            f"Ranked Remedies: {', '.join(remedy_list)}\n\n"
-            "Analyze the above clinical data. Provide:\n"
-            "1. A professional English summary of the patient's problem.\n"
-            "2. A short rationale for why each rubric matches the case notes.\n"
-            "3. A short clinical insight for why each remedy is indicated based on these rubrics.\n\n"
-            "Return ONLY JSON in this format:\n"
-            "{\n"
-            "  \"summary\": \"string\",\n"
-            "  \"rubric_rationales\": { \"rubric_path\": \"short rationale\" },\n"
-            "  \"remedy_insights\": { \"remedy_name\": \"short insight\" }\n"
-            "}"
+        response = engine.chat_sync(
+            model=OPENAI_MODEL,
+            messages=_insight_messages(doctor_text, rubrics, remedies),
+            temperature=0.3
         )
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a senior homeopathic clinical consultant."},
-                {"role": "user", "content": prompt}
-            ],
+        result = json.loads(response.choices[0].message.content)
+        llm_cache.set(key, CDSS_INSIGHTS_TEMPLATE, result)
+        return result
+
+    except Exception as e:
+        print("AI INSIGHT ERROR:", repr(e))
+        return dict(INSIGHTS_FALLBACK)
+
+
+async def generate_cdss_insights_async(doctor_text: str, rubrics: list, remedies: list):
+    key = _insight_key(doctor_text, rubrics, remedies)
+    cached = await llm_cache.aget(key)
+    if cached is not None:
+        return cached
+
+    try:
+        response = await engine.chat(
+            model=OPENAI_MODEL,
+            messages=_insight_messages(doctor_text, rubrics, remedies),
             temperature=0.3
         )
 
-        return json.loads(response.choices[0].message.content)
+        result = json.loads(response.choices[0].message.content)
+        await llm_cache.aset(key, CDSS_INSIGHTS_TEMPLATE, result)
+        return result
 
     except Exception as e:
-        print("AI INSIGHT ERROR:", e)
-        return {
-            "summary": "Clinical analysis completed.",
-            "rubric_rationales": {},
-            "remedy_insights": {}
-        }
+        print("AI INSIGHT ERROR:", repr(e))
+        return dict(INSIGHTS_FALLBACK)
@@ -1,26 +1,106 @@
 # backend/app/auth.py
 import os
-from passlib.context import CryptContext
-from jose import jwt
+import threading
 from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from .models import User
 from .database import SessionLocal
+from .cache import TTLCache
+from .hashing import hashing_pool
+from .metrics import register_cache
+
+# argon2 cost is a per-deployment trade-off (latency vs. attack cost);
+# unset variables keep passlib's defaults
+_ARGON2_SETTINGS = {
+    f"argon2__{name}": int(os.environ[env])
+    for name, env in (
+        ("time_cost", "ARGON2_TIME_COST"),
+        ("memory_cost", "ARGON2_MEMORY_COST"),  # KiB
+        ("parallelism", "ARGON2_PARALLELISM"),
+    )
+    if os.environ.get(env)
+}
 
-pwd_ctx = CryptContext(schemes=["argon2"], deprecated="auto")
 SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-def create_user(db: Session, name: str, email: str, password: str):
+# Authenticated principals (token `sub` -> {"name", "email"}), so polling
+# clients don't cost a users lookup per request
+principal_cache = TTLCache(
+    maxsize=int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("PRINCIPAL_CACHE_TTL", "60")),
+    name="principals"
+)
+register_cache("principals", principal_cache.stats)
+
+
+# passlib and python-jose (with its crypto backends) are imported on
+# first use, or by the startup warmup (warm_auth), not with this module
+_pwd_ctx = None
+_pwd_lock = threading.Lock()
+
+
+def get_pwd_context():
+    global _pwd_ctx
+
+    if _pwd_ctx is None:
+        with _pwd_lock:
+            if _pwd_ctx is None:
+                from passlib.context import CryptContext
+                _pwd_ctx = CryptContext(schemes=["argon2"], deprecated="auto", **_ARGON2_SETTINGS)
+    return _pwd_ctx
+
+
+def warm_auth():
+    """
+    Imports the token and hashing libraries and loads the argon2 backend.
+    """
+    from jose import jwt  # noqa: F401
+    get_pwd_context().handler("argon2").get_backend()
+
+
+def invalidate_principal(email: str):
+    """
+    Call whenever a user row is created, changed or removed.
+    """
+    principal_cache.invalidate(email)
+
+
+def get_principal(email: str):
+    """
+    Cached {"name", "email"} for a token subject, or None if no such user.
+    Only hits the database on a cache miss.
+    """
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+    finally:
+        db.close()
+
+    if not user:
+        return None
+
+    principal = {"name": user.name, "email": user.email}
+    principal_cache.set(email, principal)
+    return principal
+
+async def create_user(db: Session, name: str, email: str, password: str):
     # Check if user already exists
     existing_user = db.query(User).filter(User.email == email).first()
     if existing_user:
         return False
+    # hand the connection back to the pool while hashing
+    db.rollback()
 
     # Truncate password to 72 bytes for bcrypt/argon2 compatibility
     password = password[:72]
-    hashed = pwd_ctx.hash(password)
+    hashed = await hashing_pool.run(get_pwd_context().hash, password)
     
     new_user = User(
         name=name,
@@ -28,11 +108,17 @@ def create_user(db: Session, name: str, email: str, password: str):
         password_hash=hashed
     )
     db.add(new_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent signup for the same email committed while we hashed
+        db.rollback()
+        return False
+    invalidate_principal(email)
     return True
 
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: Session, email: str, password: str):
     # Truncate password to match creation
     password = password[:72]
 
@@ -40,15 +126,19 @@ def authenticate_user(db: Session, email: str, password: str):
     if not user:
         return None
 
-    if not pwd_ctx.verify(password, user.password_hash):
+    name, user_email, password_hash = user.name, user.email, user.password_hash
+    # hand the connection back to the pool while verifying
+    db.rollback()
+
+    if not await hashing_pool.run(get_pwd_context().verify, password, password_hash):
         return None
 
-    access_token = create_access_token(user.email)
+    access_token = create_access_token(user_email)
     return {
         "access_token": access_token,
         "user": {
-            "name": user.name,
-            "email": user.email
+            "name": name,
+            "email": user_email
         }
     }
 
@@ -59,5 +149,17 @@ def create_access_token(subject: str, expires_delta: int | None = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": subject}
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def decode_access_token(token: str):
+    """
+    Claims of a valid token, or None if it is malformed, forged or expired.
+    """
+    from jose import jwt, JWTError
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
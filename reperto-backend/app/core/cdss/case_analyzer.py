@@ -1,64 +1,170 @@
 from app.core.nlp.rubric_mapper import map_text_to_rubrics
-from app.core.repertory.scoring import score_remedies
+from app.core.repertory.scoring import score_remedies, DEFAULT_STRATEGY
 from app.core.nlp.dataset_writer import store_phrase_mapping
 from app.core.cdss.explanation import build_explanations
-from app.ai import generate_cdss_insights
+from app.ai import generate_cdss_insights, generate_cdss_insights_async
+from app.metrics import stage
 
+RUBRIC_RATIONALE_DEFAULT = "Matched based on clinical tokens."
+REMEDY_RATIONALE_DEFAULT = "Indicated based on cumulative rubric scores."
 
 
-def analyze_case(db, doctor_text: str, top_rubrics=5, top_remedies=10):
+def _rubric_path(rubric):
+    return rubric.full_path_en if rubric.full_path_en else rubric.full_path
+
+
+def prepare_case(
+    db,
+    doctor_text: str,
+    top_rubrics=5,
+    top_remedies=10,
+    strategy=DEFAULT_STRATEGY,
+    include_subrubrics=False
+):
     """
-    Full CDSS pipeline.
+    Deterministic half of the pipeline (no LLM): tokens, rubric
+    candidates and scored remedies, ready for `finalize_case` or
+    `stream_case_analysis`.
     """
 
     # 1. Language understanding → rubric candidates
     tokens, ranked_rubrics = map_text_to_rubrics(db, doctor_text)
 
     # 1.1 Proprietary Dataset Capture
-    store_phrase_mapping(db, doctor_text, tokens, ranked_rubrics)
+    with stage("store_phrase_mapping"):
+        store_phrase_mapping(db, doctor_text, tokens, ranked_rubrics)
 
     if not ranked_rubrics:
+        return {"doctor_text": doctor_text, "tokens": tokens, "selected": [], "remedies": []}
+
+    # 2. Take top rubrics (simulate doctor confirmation)
+    selected = ranked_rubrics[:top_rubrics]
+    selected_rubrics = [item["rubric"] for item in selected]
+
+    # 3. Deterministic repertory scoring
+    with stage("repertory_score"):
+        raw_scores = score_remedies(
+            db,
+            selected_rubrics,
+            strategy=strategy,
+            include_subrubrics=include_subrubrics
+        )
+    with stage("build_explanations"):
+        explained_scores = build_explanations(db, raw_scores, selected_rubrics)
+
+    return {
+        "doctor_text": doctor_text,
+        "tokens": tokens,
+        "selected": selected,
+        "remedies": explained_scores[:top_remedies]
+    }
+
+
+def case_insights_args(prepared):
+    """Arguments for generate_cdss_insights(_async)."""
+    rubric_paths = [_rubric_path(item["rubric"]) for item in prepared["selected"]]
+    return prepared["doctor_text"], [{"rubric": p} for p in rubric_paths], prepared["remedies"]
+
+
+def deterministic_result(prepared):
+    """
+    Everything that does not depend on the LLM, in the response shape
+    minus summary/rationales.
+    """
+    if not prepared["selected"]:
         return {
-            "tokens": tokens,
+            "tokens": prepared["tokens"],
             "rubrics": [],
             "remedies": [],
             "message": "No confident rubrics found"
         }
 
-    # 2. Take top rubrics (simulate doctor confirmation)
-    selected = ranked_rubrics[:top_rubrics]
-    selected_rubrics = [item["rubric"] for item in selected]
+    return {
+        "tokens": prepared["tokens"],
+        "rubrics": [
+            {
+                "rubric": _rubric_path(item["rubric"]),
+                "confidence": item["confidence"],
+                "matched": item["matched_tokens"]
+            }
+            for item in prepared["selected"]
+        ],
+        "remedies": prepared["remedies"]
+    }
 
-    # 3. Deterministic repertory scoring
-    raw_scores = score_remedies(db, selected_rubrics)
-    explained_scores = build_explanations(db, raw_scores, selected_rubrics)
-    
-    # 3.1 AI Insights (Rationale & English Summary)
-    rubric_paths = [r.full_path_en if r.full_path_en else r.full_path for r in selected_rubrics]
-    insights = generate_cdss_insights(doctor_text, [{"rubric": p} for p in rubric_paths], explained_scores[:top_remedies])
+
+def rationales(result, insights):
+    """Per-item rationales for a deterministic_result, defaults filled in."""
+    return {
+        "summary": insights["summary"],
+        "rubric_rationales": {
+            r["rubric"]: insights["rubric_rationales"].get(r["rubric"], RUBRIC_RATIONALE_DEFAULT)
+            for r in result["rubrics"]
+        },
+        "remedy_rationales": {
+            rem["remedy"]: insights["remedy_insights"].get(rem["remedy"], REMEDY_RATIONALE_DEFAULT)
+            for rem in result["remedies"]
+        }
+    }
+
+
+def finalize_case(prepared, insights):
+    result = deterministic_result(prepared)
+    if not prepared["selected"]:
+        return result
 
     # 4. Final response build with Rationales
-    final_rubrics = []
-    for item in selected:
-        path_en = item["rubric"].full_path_en if item["rubric"].full_path_en else item["rubric"].full_path
-        final_rubrics.append({
-            "rubric": path_en,
-            "confidence": item["confidence"],
-            "matched": item["matched_tokens"],
-            "rationale": insights["rubric_rationales"].get(path_en, "Matched based on clinical tokens.")
-        })
-
-    final_remedies = []
-    for rem in explained_scores[:top_remedies]:
-        final_remedies.append({
-            **rem,
-            "rationale": insights["remedy_insights"].get(rem["remedy"], "Indicated based on cumulative rubric scores.")
-        })
+    explained = rationales(result, insights)
 
     return {
-        "summary": insights["summary"],
-        "tokens": tokens,
-        "rubrics": final_rubrics,
-        "remedies": final_remedies
+        "summary": explained["summary"],
+        "tokens": result["tokens"],
+        "rubrics": [
+            {**r, "rationale": explained["rubric_rationales"][r["rubric"]]}
+            for r in result["rubrics"]
+        ],
+        "remedies": [
+            {**rem, "rationale": explained["remedy_rationales"][rem["remedy"]]}
+            for rem in result["remedies"]
+        ]
     }
 
+
+def analyze_case(
+    db,
+    doctor_text: str,
+    top_rubrics=5,
+    top_remedies=10,
+    strategy=DEFAULT_STRATEGY,
+    include_subrubrics=False
+):
+    """
+    Full CDSS pipeline.
+    `strategy` selects the repertorization method (see SCORING_STRATEGIES);
+    `include_subrubrics` also scores the descendants of each selected rubric.
+    """
+    prepared = prepare_case(db, doctor_text, top_rubrics, top_remedies, strategy, include_subrubrics)
+    if not prepared["selected"]:
+        return finalize_case(prepared, None)
+
+    # 3.1 AI Insights (Rationale & English Summary)
+    with stage("llm"):
+        insights = generate_cdss_insights(*case_insights_args(prepared))
+
+    return finalize_case(prepared, insights)
+
+
+async def stream_case_analysis(prepared):
+    """
+    Yields (event, payload) pairs: the deterministic result immediately,
+    then the LLM summary/rationales once they arrive.
+    """
+    result = deterministic_result(prepared)
+    yield "result", result
+
+    if prepared["selected"]:
+        with stage("llm"):
+            insights = await generate_cdss_insights_async(*case_insights_args(prepared))
+        yield "insights", rationales(result, insights)
+
+    yield "done", {}
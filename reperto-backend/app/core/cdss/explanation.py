@@ -1,9 +1,15 @@
+from app.core.repertory.compiled import get_compiled_repertory
+
+
 def build_explanations(db, remedies, selected_rubrics):
     """
     Converts raw scoring output into clinical explanations.
+    Contributions from subrubrics (include_subrubrics) are named from
+    the compiled repertory.
     """
 
     rubric_map = {r.id: r.full_path_en if r.full_path_en else r.full_path for r in selected_rubrics}
+    compiled = None
 
     explained = []
 
@@ -14,7 +20,12 @@ def build_explanations(db, remedies, selected_rubrics):
             rid = c["rubric_id"]
             grade = c["grade"]
 
-            name = rubric_map.get(rid, f"Rubric {rid}")
+            name = rubric_map.get(rid)
+            if name is None:
+                compiled = compiled or get_compiled_repertory(db)
+                rubric = compiled.get_rubric(rid)
+                name = (rubric.full_path_en or rubric.full_path) if rubric else f"Rubric {rid}"
+                rubric_map[rid] = name
 
             if name not in used:
                 used[name] = []
@@ -1,25 +1,332 @@
+"""
+Doctor language → rubric dataset capture (clinical_phrase_map).
+
+Capture is write-behind: requests only enqueue rows, and a background
+thread inserts them in batches (one executemany per flush) when
+PHRASE_BATCH_SIZE rows are buffered or PHRASE_FLUSH_INTERVAL seconds
+have passed. This keeps the INSERT + COMMIT off the request path, and
+on SQLite it stops every /cdss/analyze from queueing for the write lock.
+
+Under pressure (queue full) rows are appended to PHRASE_SPILL_PATH and
+re-ingested once the queue drains; with no spill path they are dropped
+and counted. Batches whose INSERT fails (e.g. "database is locked") go
+back to the spill file, and a spill file is only deleted once every row
+in it has been committed. Pending rows are flushed on shutdown (`phrase_writer.close()`).
+
+Every uvicorn worker shares the spill file. Appends and the claim
+(rename to `.draining`) hold an exclusive flock on `<spill>.lock`, and
+only the worker holding `<spill>.draining.lock` re-ingests the claim, so
+a row is inserted once. A line that is not valid JSON (a crash
+mid-append) is moved to `<spill>.bad` instead of stopping the drain.
+"""
 import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from sqlalchemy import text
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: single-worker deployments only
+    fcntl = None
+
+from app.metrics import register_collector
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PHRASE_WRITE_BEHIND = os.environ.get("PHRASE_WRITE_BEHIND", "1") not in ("0", "false", "no")
+PHRASE_BATCH_SIZE = int(os.environ.get("PHRASE_BATCH_SIZE", "500"))
+PHRASE_FLUSH_INTERVAL = float(os.environ.get("PHRASE_FLUSH_INTERVAL", "2.0"))
+PHRASE_QUEUE_MAX = int(os.environ.get("PHRASE_QUEUE_MAX", "50000"))
+PHRASE_SPILL_PATH = os.environ.get(
+    "PHRASE_SPILL_PATH", os.path.join(BASE_DIR, "data", "phrase_map_spill.ndjson")
+)
+
+INSERT_PHRASE_SQL = text("""
+    INSERT INTO clinical_phrase_map
+    (doctor_text, normalized_tokens, rubric, confidence)
+    VALUES (:d, :t, :r, :c)
+""")
+
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """
+    Exclusive flock on `path` (created if needed), shared by every process
+    on the host. Yields False when `blocking` is off and another holder has it.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _phrase_rows(doctor_text, tokens, ranked_rubrics):
+    tokens_json = json.dumps(tokens)
+    return [
+        {
+            "d": doctor_text,
+            "t": tokens_json,
+            "r": item["rubric"].full_path,
+            "c": item["confidence"]
+        }
+        for item in ranked_rubrics
+    ]
+
+
+class PhraseMapWriter:
+
+    def __init__(
+        self,
+        batch_size: int = PHRASE_BATCH_SIZE,
+        flush_interval: float = PHRASE_FLUSH_INTERVAL,
+        max_queue: int = PHRASE_QUEUE_MAX,
+        spill_path: str | None = PHRASE_SPILL_PATH,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+
+        self.engine = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.failed = 0
+        self.corrupt = 0
+        self.errors = 0
+
+    # ---------------------------
+    # PRODUCER SIDE
+    # ---------------------------
+
+    def _ensure_started(self, engine):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self.engine = engine
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="phrase-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, engine, rows):
+        self._ensure_started(engine)
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self._overflow(rows[i:])
+                return
+
+    def _overflow(self, rows):
+        if not self.spill_path:
+            self.dropped += len(rows)
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(row) + "\n" for row in rows))
+            self.spilled += len(rows)
+        except OSError as e:
+            print("PHRASE SPILL ERROR:", e)
+            self.errors += 1
+            self.dropped += len(rows)
+
+    # ---------------------------
+    # CONSUMER SIDE
+    # ---------------------------
+
+    def _write(self, rows) -> bool:
+        """One INSERT batch; False (rows not committed) on error."""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(INSERT_PHRASE_SQL, rows)
+            self.written += len(rows)
+            self.batches += 1
+            return True
+        except Exception as e:
+            print("PHRASE MAP WRITE ERROR:", e)
+            self.errors += 1
+            self.failed += len(rows)
+            return False
+
+    def _flush(self, rows):
+        # a failed batch is spilled (or dropped without a spill path), not lost silently
+        if not self._write(rows):
+            self._overflow(rows)
+
+    def _keep_unwritten(self, claimed, done):
+        """Rewrites the claimed spill file without its first `done` lines."""
+        tmp_path = claimed + ".tmp"
+        with open(claimed, encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+            for i, line in enumerate(src):
+                if i >= done:
+                    dst.write(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, claimed)
+
+    def _quarantine(self, line):
+        self.corrupt += 1
+        with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+            f.write(line if line.endswith("\n") else line + "\n")
+
+    def _drain_spill(self):
+        """Re-ingest spilled rows; only called while the queue is quiet."""
+        if not self.spill_path:
+            return
+
+        # another worker is draining: its claim is not ours to re-ingest
+        with _file_lock(self.spill_path + ".draining.lock", blocking=False) as owned:
+            if owned:
+                self._drain_claim()
+
+    def _drain_claim(self):
+        # a leftover claim means a previous drain was interrupted: finish that first
+        claimed = self.spill_path + ".draining"
+        if not os.path.exists(claimed):
+            with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+                try:
+                    os.replace(self.spill_path, claimed)
+                except OSError:
+                    return
+
+        # the claim is removed only once all of it is committed; after a
+        # failed batch it keeps the rest (from the first uncommitted line)
+        # and the next drain retries it
+        batch = []
+        lines = 0  # lines behind `batch`, blank and quarantined ones included
+        done = 0
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                if not line.strip():
+                    continue
+                try:
+                    batch.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self._quarantine(line)
+                    continue
+                if len(batch) >= self.batch_size:
+                    if not self._write(batch):
+                        break
+                    done += lines
+                    lines = 0
+                    batch = []
+            else:
+                if not batch or self._write(batch):
+                    batch = []
+
+        if batch:
+            self._keep_unwritten(claimed, done)
+        else:
+            os.remove(claimed)
+
+    def _drain_safely(self):
+        # one bad spill file must not end the writer thread
+        try:
+            self._drain_spill()
+        except Exception as e:
+            print("PHRASE SPILL DRAIN ERROR:", e)
+            self.errors += 1
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            # wake up periodically so close() is noticed promptly
+            timeout = min(max(0.0, deadline - time.monotonic()), 0.25)
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if len(batch) >= self.batch_size or now >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                if self._queue.qsize() < self.batch_size:
+                    self._drain_safely()
+                deadline = now + self.flush_interval
+
+            if self._stopping.is_set() and self._queue.empty():
+                break
+
+        if batch:
+            self._flush(batch)
+        self._drain_safely()
+
+    def close(self):
+        """Flush everything pending and stop the writer thread."""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "corrupt": self.corrupt,
+            "errors": self.errors,
+        }
+
+
+phrase_writer = PhraseMapWriter()
+
+
+def _writer_metrics():
+    stats = phrase_writer.stats()
+    yield "reperto_phrase_queue_depth", "gauge", "Phrase mappings waiting to be written.", {}, stats["queued"]
+    for outcome in ("written", "spilled", "dropped", "failed"):
+        yield "reperto_phrase_rows_total", "counter", "Phrase mapping rows by outcome.", {"outcome": outcome}, stats[outcome]
+    yield "reperto_phrase_spill_corrupt_total", "counter", "Unreadable spill lines moved to the .bad file.", {}, stats["corrupt"]
+    yield "reperto_phrase_writer_errors_total", "counter", "Failed inserts, spill appends and drains.", {}, stats["errors"]
+
+
+register_collector(_writer_metrics)
+
 
 def store_phrase_mapping(db, doctor_text, tokens, ranked_rubrics):
     """
     Save doctor language → rubric mappings
     """
+    rows = _phrase_rows(doctor_text, tokens, ranked_rubrics)
+    if not rows:
+        return
 
-    for item in ranked_rubrics:
-        db.execute(
-            text("""
-                INSERT INTO clinical_phrase_map
-                (doctor_text, normalized_tokens, rubric, confidence)
-                VALUES (:d, :t, :r, :c)
-            """),
-            {
-                "d": doctor_text,
-                "t": json.dumps(tokens),
-                "r": item["rubric"].full_path,
-                "c": item["confidence"]
-            }
-        )
+    if PHRASE_WRITE_BEHIND:
+        phrase_writer.submit(db.get_bind(), rows)
+        return
 
+    db.execute(INSERT_PHRASE_SQL, rows)
     db.commit()
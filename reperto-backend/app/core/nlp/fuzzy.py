@@ -0,0 +1,75 @@
+"""
+Character-trigram index for typo / transliteration tolerant lookups.
+
+Hinglish arrives in many spellings ("ghabrahat", "ghabrahut"); an exact
+dictionary hit misses all but one. Words are indexed by their padded
+character trigrams; a query only compares against words sharing at
+least one trigram and of similar length, so lookup cost is bounded by
+the few postings it touches, not the vocabulary size.
+"""
+from collections import Counter
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance with adjacent transpositions counted as one edit."""
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+
+    def __init__(self, words):
+        self.words = {}
+        self.postings = {}
+
+        for w in set(words):
+            grams = trigrams(w)
+            self.words[w] = grams
+            for g in grams:
+                self.postings.setdefault(g, []).append(w)
+
+    def __len__(self):
+        return len(self.words)
+
+    def nearest(self, token: str, threshold: float, accept=None):
+        """
+        Best vocabulary word by Dice similarity of trigram sets, among
+        those `accept(word)` allows (all by default).
+        Returns (word, similarity) or None below `threshold`.
+        """
+        grams = trigrams(token)
+        max_len_diff = max(2, len(token) // 3)
+
+        shared = Counter()
+        for g in grams:
+            for w in self.postings.get(g, ()):
+                shared[w] += 1
+
+        best = None
+        for w, n in shared.items():
+            if abs(len(w) - len(token)) > max_len_diff:
+                continue
+            sim = 2 * n / (len(grams) + len(self.words[w]))
+            if sim < threshold:
+                continue
+            if accept is not None and not accept(w):
+                continue
+            # ties go to the lexicographically smaller word, for stable output
+            if best is None or (-sim, w) < (-best[1], best[0]):
+                best = (w, sim)
+
+        return best
@@ -1,4 +1,10 @@
+import os
 import re
+import threading
+from functools import lru_cache
+
+from app.core.nlp.fuzzy import TrigramIndex, edit_distance
+from app.metrics import register_cache
 
 # ---------------------------
 # CORE CLINICAL DICTIONARY
@@ -41,6 +47,104 @@ STOPWORDS = {
 }
 
 
+# ---------------------------
+# FUZZY (TYPO / TRANSLITERATION) MATCHING
+# ---------------------------
+
+# Minimum trigram Dice similarity for a misspelled token to resolve
+FUZZY_THRESHOLD = float(os.getenv("NORMALIZER_FUZZY_THRESHOLD", "0.6"))
+# Shorter tokens are too ambiguous to correct ("dar", "pet")
+FUZZY_MIN_LENGTH = 4
+FUZZY_CACHE_SIZE = 16384
+# Trigram similarity alone lets ordinary words slide onto clinical ones
+# ("hearing" -> "tearing", "paint" -> "pain"); a correction must also keep
+# the first letter and stay within a length-dependent edit budget
+FUZZY_MAX_EDITS_SHORT = 1   # up to 8 letters (5 and less: substitutions only)
+FUZZY_MAX_EDITS_LONG = 2    # 9 letters and more
+
+_ANCHORS = {a for anchors in NORMALIZATION_MAP.values() for a in anchors}
+
+_rubric_vocabulary = frozenset()
+_fuzzy_index = TrigramIndex(set(NORMALIZATION_MAP) | _ANCHORS)
+_vocab_lock = threading.Lock()
+
+
+def build_rubric_vocabulary(words):
+    """
+    Prepares repertory words for install_rubric_vocabulary (the costly
+    part: the trigram index). Only words that can survive clean_text
+    (a-z) are kept.
+    """
+    vocab = frozenset(
+        w for w in (w.lower() for w in words)
+        if len(w) >= FUZZY_MIN_LENGTH and re.fullmatch(r"[a-z]+", w)
+    )
+    return vocab, TrigramIndex(set(NORMALIZATION_MAP) | _ANCHORS | vocab)
+
+
+def install_rubric_vocabulary(built):
+    """
+    Makes a build_rubric_vocabulary() result the fuzzy vocabulary.
+    """
+    global _rubric_vocabulary, _fuzzy_index
+
+    with _vocab_lock:
+        _rubric_vocabulary, _fuzzy_index = built
+        resolve_token.cache_clear()
+
+
+def register_rubric_vocabulary(words):
+    """
+    Adds repertory words (e.g. every word of the golden rubric paths) to
+    the fuzzy vocabulary, so misspellings of them resolve as well.
+    """
+    install_rubric_vocabulary(build_rubric_vocabulary(words))
+
+
+def _plausible_typo(token: str, word: str) -> bool:
+    """
+    Whether `word` is a believable misspelling target for `token`:
+    same first letter, and at most one edit (two from 9 letters on). Words
+    of 5 letters or less only allow a substitution, since one added or
+    dropped letter there is usually a different word ("paint", "dread").
+    """
+    if token[0] != word[0]:
+        return False
+    if len(token) <= 5:
+        return len(word) == len(token) and edit_distance(token, word) <= 1
+    budget = FUZZY_MAX_EDITS_LONG if len(token) >= 9 else FUZZY_MAX_EDITS_SHORT
+    return edit_distance(token, word) <= budget
+
+
+@lru_cache(maxsize=FUZZY_CACHE_SIZE)
+def resolve_token(token: str) -> tuple:
+    """
+    Single cleaned token -> canonical repertory tokens.
+
+    exact dictionary hit          -> its anchors
+    known anchor / rubric word    -> itself
+    close misspelling of either   -> the nearest one's anchors / itself
+    anything else                 -> itself
+    """
+    if token in NORMALIZATION_MAP:
+        return tuple(NORMALIZATION_MAP[token])
+
+    if token in _ANCHORS or token in _rubric_vocabulary or len(token) < FUZZY_MIN_LENGTH:
+        return (token,)
+
+    hit = _fuzzy_index.nearest(token, FUZZY_THRESHOLD, accept=lambda w: _plausible_typo(token, w))
+    if hit is None:
+        return (token,)
+
+    word = hit[0]
+    if word in NORMALIZATION_MAP:
+        return tuple(NORMALIZATION_MAP[word])
+    return (word,)
+
+
+register_cache("fuzzy_tokens", lambda: resolve_token.cache_info()._asdict())
+
+
 def clean_text(text: str) -> str:
     text = text.lower()
     text = re.sub(r"[^a-zA-Z\s]", " ", text)
@@ -63,9 +167,6 @@ def normalize_input(text: str):
         if token in STOPWORDS:
             continue
 
-        if token in NORMALIZATION_MAP:
-            normalized_tokens.extend(NORMALIZATION_MAP[token])
-        else:
-            normalized_tokens.append(token)
+        normalized_tokens.extend(resolve_token(token))
 
     return list(set(normalized_tokens))
@@ -1,3 +1,24 @@
+from functools import lru_cache
+
+from app.core.repertory.compiled import CompiledRepertory, get_compiled_repertory, current_compiled_repertory
+from app.core.repertory.search_index import tokenize
+from app.metrics import register_cache
+
+
+def _confidence(rubric, hits, n_tokens):
+    if hits == 0:
+        return 0.0
+
+    confidence = hits / n_tokens
+
+    # soft boost if deep rubric (more specific)
+    depth_boost = min((rubric.depth or 0) * 0.05, 0.3)
+
+    confidence = min(confidence + depth_boost, 1.0)
+
+    return round(confidence, 3)
+
+
 def compute_rubric_confidence(rubric, normalized_tokens):
     """
     Simple deterministic confidence scoring.
@@ -10,22 +31,104 @@ def compute_rubric_confidence(rubric, normalized_tokens):
 
     text = rubric.full_path.lower()
 
-    hits = 0
-    matched = []
+    matched = [token for token in normalized_tokens if token in text]
 
-    for token in normalized_tokens:
-        if token in text:
-            hits += 1
-            matched.append(token)
+    return _confidence(rubric, len(matched), len(normalized_tokens)), matched
 
-    if hits == 0:
-        return 0.0, matched
 
-    confidence = hits / len(normalized_tokens)
+# ---------------------------
+# BATCH SCORING
+# ---------------------------
 
-    # soft boost if deep rubric (more specific)
-    depth_boost = min(rubric.depth * 0.05, 0.3)
+class RubricTokenMatcher:
+    """
+    Pre-tokenized full_path words of every compiled rubric.
 
-    confidence = min(confidence + depth_boost, 1.0)
+    A normalized token is a run of letters, so `token in full_path.lower()`
+    holds exactly when the token is a substring of one full_path word.
+    Each query token is therefore resolved once against the vocabulary
+    (cached) into the set of rubric rows it hits, and all candidates are
+    scored from those sets in one pass, instead of a substring search
+    per token x candidate.
+    """
+
+    def __init__(self, compiled: CompiledRepertory):
+        self.compiled = compiled
+
+        rows_of_word = {}
+        for row, rubric in enumerate(compiled.rubrics):
+            for word in set(tokenize(rubric.full_path)):
+                rows_of_word.setdefault(word, set()).add(row)
+
+        self.rows_of_word = rows_of_word
+        self.vocabulary = tuple(rows_of_word)
+        self.rows_for_token = lru_cache(maxsize=8192)(self._rows_for_token)
+
+    def _rows_for_token(self, token: str) -> frozenset:
+        rows = set()
+        for word in self.vocabulary:
+            if token in word:
+                rows |= self.rows_of_word[word]
+        return frozenset(rows)
+
+    def match(self, rubrics, normalized_tokens):
+        """
+        Returns [(confidence, matched_tokens), ...] aligned with `rubrics`.
+        """
+        compiled_rubrics = self.compiled.rubrics
+        row_of = self.compiled.row_of
+        n_tokens = len(normalized_tokens)
+
+        rows = []
+        for rubric in rubrics:
+            row = row_of.get(rubric.id)
+            if row is not None and compiled_rubrics[row].full_path != rubric.full_path:
+                row = None
+            rows.append(row)
+
+        # one pass over the token -> rows sets, restricted to the candidates
+        candidate_rows = {row for row in rows if row is not None}
+        matched_by_row = {}
+        for token in normalized_tokens:
+            for row in self.rows_for_token(token) & candidate_rows:
+                matched_by_row.setdefault(row, []).append(token)
+
+        results = []
+        for rubric, row in zip(rubrics, rows):
+            if row is None:
+                # not in the compiled repertory (e.g. stale); check directly
+                results.append(compute_rubric_confidence(rubric, normalized_tokens))
+                continue
+
+            matched = list(matched_by_row.get(row, ()))
+            results.append((_confidence(rubric, len(matched), n_tokens), matched))
+
+        return results
+
+
+def get_token_matcher(compiled: CompiledRepertory) -> RubricTokenMatcher:
+    # one matcher per repertory version, so requests still pinned to a
+    # replaced version do not rebuild it for the new one (or vice versa)
+    return compiled.memo("token_matcher", lambda: RubricTokenMatcher(compiled))
+
+
+def _matcher_cache_stats():
+    # the live version's matcher, if built; never builds one
+    compiled = current_compiled_repertory()
+    matcher = compiled.memo("token_matcher") if compiled is not None else None
+    return matcher.rows_for_token.cache_info()._asdict() if matcher is not None else None
+
+
+register_cache("token_matcher", _matcher_cache_stats)
+
+
+def compute_rubric_confidences(db, rubrics, normalized_tokens):
+    """
+    Batch form of compute_rubric_confidence for a list of candidates.
+    Output: [(confidence, matched_tokens), ...] aligned with `rubrics`.
+    """
+    if not rubrics or not normalized_tokens:
+        return [(0.0, []) for _ in rubrics]
 
-    return round(confidence, 3), matched
+    matcher = get_token_matcher(get_compiled_repertory(db))
+    return matcher.match(rubrics, normalized_tokens)
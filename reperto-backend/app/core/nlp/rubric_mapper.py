@@ -1,24 +1,74 @@
-from app.core.nlp.normalizer import normalize_input
+import os
+
+from app.core.nlp.normalizer import normalize_input, build_rubric_vocabulary, install_rubric_vocabulary
+from app.core.repertory.compiled import get_compiled_repertory, current_compiled_repertory
 from app.core.repertory.rubric_search import search_rubrics
-from app.core.nlp.rubric_confidence import compute_rubric_confidence
+from app.core.repertory.search_index import tokenize
+from app.core.nlp.rubric_confidence import compute_rubric_confidences
+from app.metrics import stage
+
+# Candidates pulled from search before confidence ranking
+RUBRIC_CANDIDATE_LIMIT = int(os.getenv("RUBRIC_CANDIDATE_LIMIT", "30"))
+
+_vocabulary_source = None
+
+
+def _build_vocabulary(compiled):
+    words = set()
+    for r in compiled.rubrics:
+        words.update(tokenize(r.full_path))
+        words.update(tokenize(r.full_path_en or ""))
+    return build_rubric_vocabulary(words)
+
+
+def warm_rubric_vocabulary(compiled):
+    """
+    Builds the fuzzy vocabulary of `compiled` ahead of time (e.g. before
+    a hot swap), so the first request on it only installs it.
+    """
+    return compiled.memo("rubric_vocabulary", lambda: _build_vocabulary(compiled))
+
+
+def sync_rubric_vocabulary(db):
+    """
+    Feeds the compiled repertory's words to the normalizer's fuzzy
+    matcher; only does work when the repertory has changed.
+    """
+    global _vocabulary_source
+
+    compiled = get_compiled_repertory(db)
+    if compiled is _vocabulary_source:
+        return
+
+    # a request still pinned to a replaced version keeps the newer
+    # vocabulary instead of flipping the process back to its own
+    if _vocabulary_source is not None and compiled is not current_compiled_repertory():
+        return
+
+    install_rubric_vocabulary(warm_rubric_vocabulary(compiled))
+    _vocabulary_source = compiled
 
 
-def map_text_to_rubrics(db, doctor_text: str, limit=30):
+def map_text_to_rubrics(db, doctor_text: str, limit=RUBRIC_CANDIDATE_LIMIT):
     """
     Doctor text → rubric candidates with confidence
     """
 
-    normalized_tokens = normalize_input(doctor_text)
+    with stage("normalize"):
+        sync_rubric_vocabulary(db)
+        normalized_tokens = normalize_input(doctor_text)
 
     query = " ".join(normalized_tokens)
 
-    rubrics = search_rubrics(db, query, limit=limit)
+    with stage("search_rubrics"):
+        rubrics = search_rubrics(db, query, limit=limit)
 
     ranked = []
 
-    for r in rubrics:
-        confidence, matched = compute_rubric_confidence(r, normalized_tokens)
+    with stage("confidence"):
+        scored = compute_rubric_confidences(db, rubrics, normalized_tokens)
 
+    for r, (confidence, matched) in zip(rubrics, scored):
         if confidence > 0:
             ranked.append({
                 "rubric": r,
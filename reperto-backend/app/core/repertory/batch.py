@@ -0,0 +1,197 @@
+"""
+Batch repertory scoring
+
+Scores many rubric sets (cases) in one pass against the compiled
+repertory. Conceptually this is the sparse product
+
+    cases x rubrics  (0/1 selection)  @  rubrics x remedies  (grades)
+
+computed row-shared: each rubric row is read once and its grades are
+added to every case that selected it. Large batches are split across a
+process pool so re-scoring an archive scales with cores.
+"""
+import heapq
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.repertory.compiled import CompiledRepertory, current_compiled_repertory
+
+# Below this many cases the pool start-up/pickling cost outweighs the gain
+BATCH_PARALLEL_THRESHOLD = int(os.getenv("BATCH_PARALLEL_THRESHOLD", "256"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+# Max rubric-rows x remedies cells expanded densely per batch
+DENSE_CELL_BUDGET = int(os.getenv("BATCH_DENSE_CELL_BUDGET", "20000000"))
+
+
+def score_case_batch(compiled: CompiledRepertory, rubric_sets: list, top_k: int = 10):
+    """
+    Input:
+        rubric_sets -> list of lists of rubric full paths (one list per case)
+
+    Output:
+        list (same order as input) of:
+        {
+            "remedies": [{"remedy_id": int, "remedy": str, "score": int}],
+            "unmatched": [str]   # paths not found in the repertory
+        }
+    """
+
+    # case -> selected rows, and the transposed rubric row -> cases
+    case_rows = []
+    cases_of_row = {}
+    unmatched = []
+
+    for case_idx, paths in enumerate(rubric_sets):
+        rows = []
+        missing = []
+        for path in paths:
+            row = compiled.row_of_path.get(path)
+            if row is None:
+                missing.append(path)
+            elif row not in rows:
+                rows.append(row)
+                cases_of_row.setdefault(row, []).append(case_idx)
+        case_rows.append(rows)
+        unmatched.append(missing)
+
+    indptr = compiled.indptr
+    indices = compiled.indices
+    grades = compiled.grades
+    n_remedies = compiled.n_remedies
+
+    if len(cases_of_row) * n_remedies <= DENSE_CELL_BUDGET:
+        # expand each used rubric row once, then every case is a column-wise
+        # sum of its dense rows (zip/sum run in C)
+        dense = {}
+        for row in cases_of_row:
+            vec = [0] * n_remedies
+            for i in range(indptr[row], indptr[row + 1]):
+                vec[indices[i]] += grades[i]
+            dense[row] = vec
+
+        scores = []
+        for rows in case_rows:
+            if not rows:
+                scores.append({})
+                continue
+            totals = list(map(sum, zip(*(dense[r] for r in rows))))
+            top_cols = heapq.nlargest(top_k, range(n_remedies), key=totals.__getitem__)
+            scores.append({col: totals[col] for col in top_cols if totals[col]})
+    else:
+        # sparse fallback: one pass over every used rubric row
+        scores = [{} for _ in rubric_sets]
+        for row, case_ids in cases_of_row.items():
+            start, end = indptr[row], indptr[row + 1]
+            row_cols = indices[start:end]
+            row_grades = grades[start:end]
+            for case_idx in case_ids:
+                acc = scores[case_idx]
+                for col, grade in zip(row_cols, row_grades):
+                    acc[col] = acc.get(col, 0) + grade
+
+    results = []
+    for acc, missing in zip(scores, unmatched):
+        top = heapq.nlargest(top_k, acc.items(), key=lambda x: x[1])
+        results.append({
+            "remedies": [
+                {
+                    "remedy_id": compiled.remedy_ids[col],
+                    "remedy": compiled.remedy_names[col],
+                    "score": score
+                }
+                for col, score in top
+            ],
+            "unmatched": missing
+        })
+
+    return results
+
+
+# ---------------------------
+# PROCESS POOL
+# ---------------------------
+
+_worker_compiled = None
+
+# repertory version -> {"pool", "users"}; a request still pinned to a
+# replaced version keeps using that version's pool until it is done
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _init_worker(compiled):
+    global _worker_compiled
+    _worker_compiled = compiled
+
+
+def _score_chunk(rubric_sets, top_k):
+    return score_case_batch(_worker_compiled, rubric_sets, top_k)
+
+
+def _acquire_pool(compiled: CompiledRepertory):
+    """
+    One pool per repertory version: workers receive the matrix once at
+    start-up instead of with every chunk. Acquired pools are never shut
+    down under a caller; release with _release_pool.
+    """
+    with _pool_lock:
+        entry = _pools.get(compiled.version)
+        if entry is None:
+            entry = _pools[compiled.version] = {
+                "pool": ProcessPoolExecutor(
+                    max_workers=BATCH_WORKERS,
+                    initializer=_init_worker,
+                    initargs=(compiled,)
+                ),
+                "users": 0,
+            }
+        entry["users"] += 1
+        return entry["pool"]
+
+
+def _release_pool(compiled: CompiledRepertory):
+    """Drops one use; retires pools of replaced versions nobody uses."""
+    current = current_compiled_repertory() or compiled
+
+    with _pool_lock:
+        _pools[compiled.version]["users"] -= 1
+        for version, entry in list(_pools.items()):
+            if version != current.version and entry["users"] == 0:
+                entry["pool"].shutdown(wait=False)
+                del _pools[version]
+
+
+def shutdown_batch_pool():
+    with _pool_lock:
+        for entry in _pools.values():
+            entry["pool"].shutdown(wait=True)
+        _pools.clear()
+
+
+def score_batch(compiled: CompiledRepertory, rubric_sets: list, top_k: int = 10):
+    """
+    Scores the batch in-process, or across the process pool when it is
+    larger than BATCH_PARALLEL_THRESHOLD. Result order matches input order.
+    """
+
+    if len(rubric_sets) < BATCH_PARALLEL_THRESHOLD or BATCH_WORKERS < 2:
+        return score_case_batch(compiled, rubric_sets, top_k)
+
+    chunk_size = -(-len(rubric_sets) // BATCH_WORKERS)
+    chunks = [
+        rubric_sets[i:i + chunk_size]
+        for i in range(0, len(rubric_sets), chunk_size)
+    ]
+
+    pool = _acquire_pool(compiled)
+    try:
+        futures = [pool.submit(_score_chunk, chunk, top_k) for chunk in chunks]
+
+        results = []
+        for f in futures:
+            results.extend(f.result())
+        return results
+    finally:
+        _release_pool(compiled)
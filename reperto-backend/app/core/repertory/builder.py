@@ -1,18 +1,40 @@
+import argparse
+
 from app.database import SessionLocal
-from app.core.repertory.engine import OorepSessionLocal
 from app.core.repertory.loader import build_golden_repertory
+from app.core.repertory.incremental import build_golden_repertory_incremental
 
 
-def run_build():
+def run_build(incremental=False, dry_run=False, dump=None):
     golden_db = SessionLocal()
-    oorep_db = OorepSessionLocal()
+
+    if dump:
+        from app.core.repertory.oorep_dump import OorepDumpSource
+        oorep_db = OorepDumpSource(dump)
+    else:
+        # imported here so dump builds never need a Postgres driver
+        from app.core.repertory.engine import OorepSessionLocal
+        oorep_db = OorepSessionLocal()
 
     try:
-        build_golden_repertory(golden_db, oorep_db)
+        if incremental or dry_run:
+            build_golden_repertory_incremental(golden_db, oorep_db, dry_run=dry_run)
+        else:
+            build_golden_repertory(golden_db, oorep_db)
     finally:
         golden_db.close()
-        oorep_db.close()
+        if not dump:
+            oorep_db.close()
 
 
 if __name__ == "__main__":
-    run_build()
+    parser = argparse.ArgumentParser(description="Build the Golden Repertory from OOREP")
+    parser.add_argument("--incremental", action="store_true",
+                        help="apply only what changed since the last manifest")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the differential report without writing")
+    parser.add_argument("--dump", metavar="PATH",
+                        help="read OOREP from a pg_dump file (.sql or .sql.gz) instead of Postgres")
+    args = parser.parse_args()
+
+    run_build(incremental=args.incremental, dry_run=args.dry_run, dump=args.dump)
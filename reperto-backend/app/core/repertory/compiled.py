@@ -0,0 +1,446 @@
+"""
+Compiled Repertory
+
+Read-only, in-memory mirror of the golden tables used at request time.
+
+The rubric -> remedy grades are stored as a sparse matrix in CSR form
+(one row per rubric, one column per remedy) using flat `array` buffers,
+and remedy names live in an interned lookup table. It is built once from
+golden_rubrics / golden_remedies / golden_rubric_remedies (normally at
+startup) so scoring never goes back to the database.
+
+The process-wide instance can be replaced at runtime (snapshot hot
+swap, see snapshot.py). A request that must see one consistent version
+end to end pins it with `pinned_repertory()`.
+"""
+import hashlib
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+class RubricRecord(NamedTuple):
+    """
+    Lightweight stand-in for GoldenRubric.
+    Exposes the same attribute names so callers can use either.
+    """
+    id: int
+    chapter: Optional[str]
+    text: Optional[str]
+    text_en: Optional[str]
+    full_path: str
+    full_path_en: Optional[str]
+    parent_id: Optional[int]
+    depth: int
+
+
+class CompiledRepertory:
+    """
+    Sparse rubric x remedy grade matrix.
+
+    rows:    rubrics, in golden_rubrics.id order
+    columns: remedies, in golden_remedies.id order
+
+    indptr[row] .. indptr[row + 1] is the slice of `indices` / `grades`
+    holding the remedies (column numbers) and grades of that rubric.
+    """
+
+    # derived arrays a snapshot may carry precomputed (see snapshot.py)
+    DERIVED = ("rubric_sizes", "remedy_totals", "remedy_rubric_counts", "tin", "tout", "euler_order")
+
+    def __init__(self, rubrics, remedy_ids, remedy_names, indptr, indices, grades, derived=None, snapshot=None):
+        """
+        Array arguments may be `array("l")` or int64 memoryviews over a
+        memory-mapped snapshot; `derived` skips recomputing DERIVED.
+        """
+        self.rubrics = rubrics
+        self.remedy_ids = remedy_ids
+        self.remedy_names = remedy_names
+        self.indptr = indptr
+        self.indices = indices
+        self.grades = grades
+        # the RepertorySnapshot this was loaded from, if any
+        self.snapshot = snapshot
+        self._version = snapshot.version if snapshot is not None else None
+        # objects derived from this repertory (token matcher, ...), see memo()
+        self._memo = {}
+
+        self.row_of = {r.id: row for row, r in enumerate(rubrics)}
+        self.row_of_path = {r.full_path: row for row, r in enumerate(rubrics)}
+
+        if derived is not None:
+            for name in self.DERIVED:
+                setattr(self, name, derived[name])
+        else:
+            self._build_statistics()
+            self._build_hierarchy_intervals()
+
+        self.mean_remedy_total = (sum(self.remedy_totals) / len(remedy_ids)) if len(remedy_ids) else 0.0
+
+    def __getstate__(self):
+        # mmap-backed instances travel (e.g. to batch workers) as their
+        # snapshot path and are re-mapped on the other side
+        if self.snapshot is not None:
+            return {"_snapshot_path": self.snapshot.path}
+        state = dict(self.__dict__)
+        state["_memo"] = {}
+        return state
+
+    def __setstate__(self, state):
+        if "_snapshot_path" in state:
+            from app.core.repertory.snapshot import RepertorySnapshot
+            state = RepertorySnapshot.open(state["_snapshot_path"]).compiled().__dict__
+        self.__dict__.update(state)
+
+    @property
+    def version(self) -> str:
+        """
+        Content hash of the repertory (rubrics, remedies, grades).
+        Identical for the SQL-built and snapshot-loaded forms of the same data.
+        """
+        if self._version is None:
+            self._version = content_version(self)
+        return self._version
+
+    def memo(self, key, build=None):
+        """
+        Returns the object cached under `key` for this repertory, calling
+        `build()` the first time. Lets several repertory versions keep
+        their own derived state side by side during a swap. Without
+        `build` only looks (None if nothing is cached yet).
+        """
+        value = self._memo.get(key)
+        if value is None and build is not None:
+            value = self._memo.setdefault(key, build())
+        return value
+
+    def _build_statistics(self):
+        """
+        Precomputed statistics used by the scoring strategies.
+        """
+        indptr = self.indptr
+        self.rubric_sizes = array("l", (indptr[i + 1] - indptr[i] for i in range(len(self.rubrics))))
+        self.remedy_totals = array("l", [0] * len(self.remedy_ids))
+        self.remedy_rubric_counts = array("l", [0] * len(self.remedy_ids))
+        for col, grade in zip(self.indices, self.grades):
+            self.remedy_totals[col] += grade
+            self.remedy_rubric_counts[col] += 1
+
+    def _build_hierarchy_intervals(self):
+        """
+        Euler-tour (pre-order) numbering of the rubric tree:
+        the subtree of `row` is exactly euler_order[tin[row] : tout[row] + 1].
+        """
+        n = len(self.rubrics)
+        children = [[] for _ in range(n)]
+        roots = []
+
+        for row, r in enumerate(self.rubrics):
+            parent = self.row_of.get(r.parent_id) if r.parent_id is not None else None
+            if parent is None or parent == row:
+                roots.append(row)
+            else:
+                children[parent].append(row)
+
+        tin = array("l", [-1] * n)
+        tout = array("l", [-1] * n)
+        order = array("l")
+
+        def visit(root):
+            stack = [(root, False)]
+            while stack:
+                row, done = stack.pop()
+                if done:
+                    tout[row] = len(order) - 1
+                    continue
+                if tin[row] != -1:
+                    continue
+                tin[row] = len(order)
+                order.append(row)
+                stack.append((row, True))
+                for child in reversed(children[row]):
+                    stack.append((child, False))
+
+        for root in roots:
+            visit(root)
+        # rows only reachable through a parent cycle
+        for row in range(n):
+            if tin[row] == -1:
+                visit(row)
+
+        self.tin = tin
+        self.tout = tout
+        self.euler_order = order
+
+    @property
+    def n_rubrics(self):
+        return len(self.rubrics)
+
+    @property
+    def n_remedies(self):
+        return len(self.remedy_ids)
+
+    @property
+    def n_relations(self):
+        return len(self.indices)
+
+    # ---------------------------
+    # LOOKUPS
+    # ---------------------------
+
+    def get_rubric(self, rubric_id: int):
+        row = self.row_of.get(rubric_id)
+        return self.rubrics[row] if row is not None else None
+
+    def get_rubric_by_fullpath(self, fullpath: str):
+        row = self.row_of_path.get(fullpath)
+        return self.rubrics[row] if row is not None else None
+
+    def rows_for(self, rubric_ids):
+        """
+        Rubric ids -> unique matrix rows, preserving first-seen order.
+        Unknown ids are skipped.
+        """
+        rows = []
+        seen = set()
+        for rid in rubric_ids:
+            row = self.row_of.get(rid)
+            if row is None or row in seen:
+                continue
+            seen.add(row)
+            rows.append(row)
+        return rows
+
+    # ---------------------------
+    # HIERARCHY
+    # ---------------------------
+
+    def descendant_rows(self, row: int, include_self: bool = True):
+        start = self.tin[row] if include_self else self.tin[row] + 1
+        return self.euler_order[start:self.tout[row] + 1]
+
+    def is_ancestor(self, ancestor_row: int, row: int) -> bool:
+        return self.tin[ancestor_row] <= self.tin[row] <= self.tout[ancestor_row]
+
+    def ancestor_rows(self, row: int):
+        """
+        Parent chain of `row`, nearest first.
+        """
+        result = []
+        parent = self.row_of.get(self.rubrics[row].parent_id)
+        while parent is not None and parent != row and parent not in result:
+            result.append(parent)
+            parent = self.row_of.get(self.rubrics[parent].parent_id)
+        return result
+
+    def expand_subrubrics(self, rows):
+        """
+        Rows plus all their descendants, each once, in first-seen order.
+
+        Returns (expanded, origin): origin[row] is the tuple of given rows
+        whose subtree contains `row` (a descendant of two nested selected
+        rubrics belongs to both).
+        """
+        expanded = []
+        origin = {}
+        for row in rows:
+            for r in self.descendant_rows(row):
+                if r not in origin:
+                    origin[r] = (row,)
+                    expanded.append(r)
+                elif row not in origin[r]:
+                    origin[r] += (row,)
+        return expanded, origin
+
+    # ---------------------------
+    # SCORING
+    # ---------------------------
+
+    def accumulate(self, rows):
+        """
+        Sum grades per remedy over the given matrix rows.
+
+        Returns (scores, contributions):
+            scores:        dict[column] = summed grade
+            contributions: dict[column] = [(row, grade), ...]
+        Both dicts keep first-hit order, mirroring relation order.
+        """
+        indptr = self.indptr
+        indices = self.indices
+        grades = self.grades
+
+        scores = {}
+        contributions = {}
+
+        for row in rows:
+            start, end = indptr[row], indptr[row + 1]
+            for col, grade in zip(indices[start:end], grades[start:end]):
+                if col in scores:
+                    scores[col] += grade
+                    contributions[col].append((row, grade))
+                else:
+                    scores[col] = grade
+                    contributions[col] = [(row, grade)]
+
+        return scores, contributions
+
+
+# ---------------------------
+# BUILD
+# ---------------------------
+
+def build_compiled_repertory(db: Session) -> CompiledRepertory:
+    """
+    Reads the three golden tables (one query each) and compiles them.
+    """
+
+    rubric_rows = db.execute(text("""
+        SELECT id, chapter, text, text_en, full_path, full_path_en, parent_id, depth
+        FROM golden_rubrics
+        ORDER BY id
+    """)).fetchall()
+
+    rubrics = [
+        RubricRecord(
+            id=r.id,
+            chapter=sys.intern(r.chapter) if r.chapter else r.chapter,
+            text=r.text,
+            text_en=r.text_en,
+            full_path=r.full_path,
+            full_path_en=r.full_path_en,
+            parent_id=r.parent_id,
+            depth=r.depth or 0,
+        )
+        for r in rubric_rows
+    ]
+    row_of = {r.id: row for row, r in enumerate(rubrics)}
+
+    remedy_rows = db.execute(text("""
+        SELECT id, long_name
+        FROM golden_remedies
+        ORDER BY id
+    """)).fetchall()
+
+    remedy_ids = array("l", (r.id for r in remedy_rows))
+    remedy_names = [sys.intern(r.long_name or "") for r in remedy_rows]
+    col_of = {rid: col for col, rid in enumerate(remedy_ids)}
+
+    relation_rows = db.execute(text("""
+        SELECT rubric_id, remedy_id, grade
+        FROM golden_rubric_remedies
+        ORDER BY rubric_id, id
+    """)).fetchall()
+
+    # relations arrive grouped by rubric in row order, so they can be appended as-is
+    counts = [0] * len(rubrics)
+    indices = array("l")
+    grades = array("l")
+
+    for rel in relation_rows:
+        row = row_of.get(rel.rubric_id)
+        col = col_of.get(rel.remedy_id)
+        if row is None or col is None:
+            continue
+        counts[row] += 1
+        indices.append(col)
+        grades.append(rel.grade or 0)
+
+    indptr = array("l", [0])
+    total = 0
+    for c in counts:
+        total += c
+        indptr.append(total)
+
+    return CompiledRepertory(rubrics, remedy_ids, remedy_names, indptr, indices, grades)
+
+
+def content_version(compiled: CompiledRepertory) -> str:
+    h = hashlib.sha256()
+    for r in compiled.rubrics:
+        h.update(f"{r.id}\x1f{r.full_path}\x1f{r.full_path_en or ''}\x1f{r.parent_id}\x1e".encode("utf-8"))
+    for rid, name in zip(compiled.remedy_ids, compiled.remedy_names):
+        h.update(f"{rid}\x1f{name}\x1e".encode("utf-8"))
+    for values in (compiled.indptr, compiled.indices, compiled.grades):
+        h.update(array("q", values).tobytes())
+    return h.hexdigest()[:12]
+
+
+# ---------------------------
+# PROCESS-WIDE INSTANCE
+# ---------------------------
+
+_compiled: Optional[CompiledRepertory] = None
+_lock = threading.Lock()
+
+# set for the duration of a request by pinned_repertory()
+_pinned: ContextVar[Optional[CompiledRepertory]] = ContextVar("pinned_repertory", default=None)
+
+
+def load_compiled_repertory(db: Session) -> CompiledRepertory:
+    """
+    (Re)builds the process-wide compiled repertory. Called at startup.
+    """
+    return set_compiled_repertory(build_compiled_repertory(db))
+
+
+def set_compiled_repertory(compiled: CompiledRepertory) -> CompiledRepertory:
+    """
+    Installs an already built/loaded repertory as the process-wide one.
+    """
+    global _compiled
+
+    with _lock:
+        _compiled = compiled
+    return compiled
+
+
+def get_compiled_repertory(db: Optional[Session] = None) -> CompiledRepertory:
+    """
+    Returns the repertory pinned for the current request, else the
+    process-wide one. If startup did not load it, it is built lazily
+    from `db` on first use.
+    """
+    global _compiled
+
+    pinned = _pinned.get()
+    if pinned is not None:
+        return pinned
+
+    if _compiled is not None:
+        return _compiled
+
+    if db is None:
+        raise RuntimeError("Compiled repertory is not loaded and no session was given.")
+
+    with _lock:
+        if _compiled is None:
+            _compiled = build_compiled_repertory(db)
+        return _compiled
+
+
+def current_compiled_repertory() -> Optional[CompiledRepertory]:
+    """
+    The process-wide repertory, ignoring any request pin.
+    """
+    return _compiled
+
+
+@contextmanager
+def pinned_repertory(db: Optional[Session] = None):
+    """
+    Pins the current repertory for everything inside the block (search,
+    scoring, explanations), so a hot swap in the middle of a request
+    cannot mix two versions. Yields the pinned CompiledRepertory.
+    """
+    compiled = get_compiled_repertory(db)
+    token = _pinned.set(compiled)
+    try:
+        yield compiled
+    finally:
+        _pinned.reset(token)
@@ -0,0 +1,208 @@
+"""
+Database full-text backend for golden rubric search.
+
+For deployments that cannot hold the in-process index (search_index.py):
+the golden build maintains a full-text index inside the database itself.
+
+    SQLite     -> FTS5 external-content table `golden_rubrics_fts` with
+                  the trigram tokenizer (SQLite >= 3.34), kept in sync
+                  with golden_rubrics by triggers
+    PostgreSQL -> generated lowercase column `search_text` + pg_trgm
+                  GIN index
+
+Both index full_path and full_path_en, rank results, and match query
+tokens anywhere inside a word, like the in-process index: "schmerz"
+finds "Kopfschmerz" as well as "Schmerzen". Trigram indexes need at
+least 3 characters per token; shorter tokens are not looked up.
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.repertory.models import GoldenRubric
+from app.core.repertory.search_index import tokenize
+
+FTS_TABLE = "golden_rubrics_fts"
+
+# shortest token a trigram index can look up
+MIN_TERM_LENGTH = 3
+SQLITE_TRIGRAM_VERSION = (3, 34, 0)
+
+_RUBRIC_COLUMNS = ", ".join(
+    f"golden_rubrics.{c}"
+    for c in ("id", "chapter", "text", "text_en", "full_path", "full_path_en", "parent_id", "depth", "oorep_id")
+)
+
+_SQLITE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        full_path,
+        full_path_en,
+        content='golden_rubrics',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS golden_rubrics_fts_ai AFTER INSERT ON golden_rubrics BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, full_path, full_path_en)
+        VALUES (new.id, new.full_path, new.full_path_en);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS golden_rubrics_fts_ad AFTER DELETE ON golden_rubrics BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_path, full_path_en)
+        VALUES ('delete', old.id, old.full_path, old.full_path_en);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS golden_rubrics_fts_au AFTER UPDATE ON golden_rubrics BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_path, full_path_en)
+        VALUES ('delete', old.id, old.full_path, old.full_path_en);
+        INSERT INTO {FTS_TABLE}(rowid, full_path, full_path_en)
+        VALUES (new.id, new.full_path, new.full_path_en);
+    END
+    """,
+    # resync with rows written before the triggers existed
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # tsvector column of earlier builds: prefix matches only
+    "ALTER TABLE golden_rubrics DROP COLUMN IF EXISTS search_tsv",
+    """
+    ALTER TABLE golden_rubrics
+    ADD COLUMN IF NOT EXISTS search_text text
+    GENERATED ALWAYS AS (
+        lower(coalesce(full_path, '') || ' ' || coalesce(full_path_en, ''))
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_golden_rubrics_search_trgm
+    ON golden_rubrics USING GIN (search_text gin_trgm_ops)
+    """,
+]
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _sqlite_fts_sql(db: Session):
+    row = db.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :n"),
+        {"n": FTS_TABLE}
+    ).first()
+    return row[0] if row else None
+
+
+def _prepare_sqlite(db: Session):
+    version = db.execute(text("SELECT sqlite_version()")).scalar()
+    if tuple(int(x) for x in re.findall(r"\d+", version)[:3]) < SQLITE_TRIGRAM_VERSION:
+        raise RuntimeError(f"SQLite {version} has no FTS5 trigram tokenizer (needs 3.34+)")
+
+    # a table from an earlier build (unicode61, prefix matches only)
+    # is recreated; the triggers survive and the rebuild refills it
+    existing = _sqlite_fts_sql(db)
+    if existing is not None and "trigram" not in existing:
+        db.execute(text(f"DROP TABLE {FTS_TABLE}"))
+
+
+def ensure_fulltext_index(db: Session):
+    """
+    Creates (or refreshes) the full-text index for the current database.
+    Idempotent; called by the golden repertory build.
+    """
+    dialect = _dialect(db)
+
+    if dialect == "sqlite":
+        _prepare_sqlite(db)
+        statements = _SQLITE_DDL
+    elif dialect == "postgresql":
+        statements = _POSTGRES_DDL
+    else:
+        raise RuntimeError(f"No full-text backend for database dialect '{dialect}'")
+
+    for stmt in statements:
+        db.execute(text(stmt))
+    db.commit()
+
+    return dialect
+
+
+def fulltext_available(db: Session) -> bool:
+    dialect = _dialect(db)
+
+    # an index from an earlier build (prefix matches only) does not
+    # count: searches stay on the in-process index until the next build
+    if dialect == "sqlite":
+        existing = _sqlite_fts_sql(db)
+        return existing is not None and "trigram" in existing
+
+    if dialect == "postgresql":
+        row = db.execute(text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'golden_rubrics' AND column_name = 'search_text'
+        """)).first()
+        return row is not None
+
+    return False
+
+
+def search_rubrics_fulltext(db: Session, tokens: list[str], limit: int = 20):
+    """
+    Ranked substring search in the database. Returns GoldenRubric rows, best first.
+    """
+
+    # only plain word characters reach the query syntax (no quotes, no
+    # LIKE wildcards); trigram indexes cannot look up shorter tokens
+    terms = []
+    for t in tokens:
+        terms.extend(w for w in tokenize(t) if len(w) >= MIN_TERM_LENGTH)
+    terms = list(dict.fromkeys(terms))
+
+    if not terms:
+        return []
+
+    dialect = _dialect(db)
+
+    params = {"n": limit}
+
+    if dialect == "sqlite":
+        # a quoted string on a trigram table matches it as a substring
+        params["q"] = " OR ".join(f'"{t}"' for t in terms)
+        stmt = text(f"""
+            SELECT {_RUBRIC_COLUMNS}
+            FROM {FTS_TABLE}
+            JOIN golden_rubrics ON golden_rubrics.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :q
+            ORDER BY bm25({FTS_TABLE})
+            LIMIT :n
+        """)
+    elif dialect == "postgresql":
+        # one LIKE per term so each can use the trigram index; more
+        # matched terms first, then pg_trgm word similarity
+        likes = []
+        for i, t in enumerate(terms):
+            params[f"p{i}"] = f"%{t}%"
+            likes.append(f"search_text LIKE :p{i}")
+        params["q"] = " ".join(terms)
+        matched = " + ".join(f"({like})::int" for like in likes)
+        stmt = text(f"""
+            SELECT {_RUBRIC_COLUMNS}
+            FROM golden_rubrics
+            WHERE {" OR ".join(likes)}
+            ORDER BY {matched} DESC, word_similarity(:q, search_text) DESC, golden_rubrics.id
+            LIMIT :n
+        """)
+    else:
+        raise RuntimeError(f"No full-text backend for database dialect '{dialect}'")
+
+    return (
+        db.query(GoldenRubric)
+        .from_statement(stmt)
+        .params(**params)
+        .all()
+    )
@@ -0,0 +1,420 @@
+"""
+Differential Golden Repertory build.
+
+Every OOREP source row the golden tables are built from (rubric node,
+remedy, rubric-remedy weight) is fingerprinted and the fingerprints are
+stored in golden_build_manifest. A differential run re-reads the source,
+diffs it against the manifest and applies only the inserts, updates and
+deletes, then refreshes the derived tables (closure, search indexes)
+only if something changed.
+
+A database built before manifests existed gets a baseline derived from
+its golden tables with unknown fingerprints: every existing row is
+rewritten from the source once and rows the source no longer has are
+deleted, so the first run also reconciles drift from earlier full builds.
+
+This is NOT runtime code.
+"""
+import hashlib
+import json
+import time
+from sqlalchemy import bindparam
+
+from app.core.repertory.models import (
+    GoldenRubric, GoldenRemedy, GoldenRubricRemedy, GoldenBuildManifest
+)
+from app.core.repertory.loader import (
+    RUBRIC_TRANSLATIONS,
+    verify_core_rubrics_exist,
+    resolve_rubric_hierarchy,
+    fetch_source_remedies,
+    fetch_source_relations,
+    golden_rubric_row,
+    insert_golden_rubrics,
+    insert_golden_remedies,
+    insert_golden_relations,
+    build_rubric_closure,
+    build_search_index,
+    build_fulltext_index,
+    bulk_insert,
+    _report_rate,
+)
+
+MANIFEST_KINDS = ("rubric", "remedy", "relation")
+
+# How many keys per change type the diff report lists
+REPORT_SAMPLE = 20
+
+
+def _fingerprint(*values):
+    blob = json.dumps(values, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _relation_key(rubricid, remedyid):
+    return f"{rubricid}:{remedyid}"
+
+
+def _first_weights(relation_rows):
+    """(rubricid, remedyid) -> weight; first occurrence wins, as in insert_golden_relations."""
+    weights = {}
+    for row in relation_rows:
+        weights.setdefault((row.rubricid, row.remedyid), row.weight)
+    return weights
+
+
+# ---------------------------
+# MANIFEST
+# ---------------------------
+
+def source_fingerprints(resolved_nodes, remedy_rows, relation_rows):
+    """
+    kind -> {source_key: fingerprint} for the current OOREP source.
+    Rubric fingerprints include the English translation, so editing
+    RUBRIC_TRANSLATIONS also shows up as a change.
+    """
+    rubrics = {
+        str(rid): _fingerprint(
+            node["fullpath"],
+            node["mother"],
+            node["chapter"],
+            node["depth"],
+            RUBRIC_TRANSLATIONS.get(node["fullpath"], node["fullpath"])
+        )
+        for rid, node in resolved_nodes.items()
+    }
+
+    remedies = {str(r.id): _fingerprint(r.nameabbrev, r.namelong) for r in remedy_rows}
+
+    relations = {
+        _relation_key(rubricid, remedyid): _fingerprint(weight)
+        for (rubricid, remedyid), weight in _first_weights(relation_rows).items()
+    }
+
+    return {"rubric": rubrics, "remedy": remedies, "relation": relations}
+
+
+def load_manifest(golden_db):
+    GoldenBuildManifest.__table__.create(bind=golden_db.get_bind(), checkfirst=True)
+
+    manifest = {kind: {} for kind in MANIFEST_KINDS}
+    rows = golden_db.query(
+        GoldenBuildManifest.kind,
+        GoldenBuildManifest.source_key,
+        GoldenBuildManifest.fingerprint
+    ).all()
+    for kind, key, fingerprint in rows:
+        manifest.setdefault(kind, {})[key] = fingerprint
+    return manifest
+
+
+def baseline_manifest(golden_db):
+    """
+    Keys of what the golden tables already hold, with an unknown ("")
+    fingerprint so each one diffs as changed (or removed).
+    """
+    rubric_oorep = dict(golden_db.query(GoldenRubric.id, GoldenRubric.oorep_id).all())
+    remedy_oorep = dict(golden_db.query(GoldenRemedy.id, GoldenRemedy.oorep_id).all())
+    pairs = golden_db.query(GoldenRubricRemedy.rubric_id, GoldenRubricRemedy.remedy_id).all()
+
+    return {
+        "rubric": {str(oorep_id): "" for oorep_id in rubric_oorep.values()},
+        "remedy": {str(oorep_id): "" for oorep_id in remedy_oorep.values()},
+        "relation": {
+            _relation_key(rubric_oorep[r], remedy_oorep[m]): ""
+            for r, m in pairs
+            if r in rubric_oorep and m in remedy_oorep
+        },
+    }
+
+
+def diff_manifests(old, new):
+    """
+    kind -> {"added": [...], "changed": [...], "removed": [...]} of source keys.
+    """
+    diff = {}
+    for kind in MANIFEST_KINDS:
+        before = old.get(kind, {})
+        after = new.get(kind, {})
+        diff[kind] = {
+            "added": sorted(k for k in after if k not in before),
+            "changed": sorted(k for k in after if k in before and before[k] != after[k]),
+            "removed": sorted(k for k in before if k not in after),
+        }
+    return diff
+
+
+def diff_is_empty(diff):
+    return not any(keys for changes in diff.values() for keys in changes.values())
+
+
+def save_manifest(golden_db, new, diff, rewrite=False):
+    table = GoldenBuildManifest.__table__
+
+    if rewrite:
+        golden_db.execute(table.delete())
+        bulk_insert(golden_db, table, [
+            {"kind": kind, "source_key": key, "fingerprint": fingerprint}
+            for kind in MANIFEST_KINDS for key, fingerprint in new[kind].items()
+        ])
+        golden_db.commit()
+        return
+
+    removed = [
+        {"b_kind": kind, "b_key": key}
+        for kind in MANIFEST_KINDS for key in diff[kind]["removed"]
+    ]
+    if removed:
+        golden_db.execute(
+            table.delete().where(
+                (table.c.kind == bindparam("b_kind")) & (table.c.source_key == bindparam("b_key"))
+            ),
+            removed
+        )
+
+    changed = [
+        {"b_kind": kind, "b_key": key, "fingerprint": new[kind][key]}
+        for kind in MANIFEST_KINDS for key in diff[kind]["changed"]
+    ]
+    if changed:
+        golden_db.execute(
+            table.update().where(
+                (table.c.kind == bindparam("b_kind")) & (table.c.source_key == bindparam("b_key"))
+            ),
+            changed
+        )
+
+    bulk_insert(golden_db, table, [
+        {"kind": kind, "source_key": key, "fingerprint": new[kind][key]}
+        for kind in MANIFEST_KINDS for key in diff[kind]["added"]
+    ])
+
+    golden_db.commit()
+
+
+def record_full_build(golden_db, resolved_nodes, remedy_rows, relation_rows, fresh):
+    """
+    Manifest after a full build. A full build only adds missing rows, so
+    unless it started from empty tables (`fresh`) existing rows may still
+    differ from the source: the manifest is then cleared and the next
+    differential run reconciles from a baseline instead.
+    """
+    table = GoldenBuildManifest.__table__
+    table.create(bind=golden_db.get_bind(), checkfirst=True)
+
+    if not fresh:
+        golden_db.execute(table.delete())
+        golden_db.commit()
+        print("\nBuild manifest cleared: the next differential build reconciles from a baseline.")
+        return
+
+    new = source_fingerprints(resolved_nodes, remedy_rows, relation_rows)
+    save_manifest(golden_db, new, None, rewrite=True)
+    print("\n✅ Build manifest written:", ", ".join(f"{kind}={len(new[kind])}" for kind in MANIFEST_KINDS))
+
+
+def print_diff_report(diff, resolved_nodes=None, remedy_rows=None):
+    print("\n========== GOLDEN BUILD DIFF ==========")
+
+    rubric_names = {str(rid): n["fullpath"] for rid, n in (resolved_nodes or {}).items()}
+    remedy_names = {str(r.id): r.nameabbrev for r in (remedy_rows or [])}
+    names = {"rubric": rubric_names, "remedy": remedy_names}
+
+    for kind in MANIFEST_KINDS:
+        changes = diff[kind]
+        print(
+            f"{kind:<9} +{len(changes['added'])} "
+            f"~{len(changes['changed'])} "
+            f"-{len(changes['removed'])}"
+        )
+        for label, sign in (("added", "+"), ("changed", "~"), ("removed", "-")):
+            keys = changes[label]
+            for key in keys[:REPORT_SAMPLE]:
+                name = names.get(kind, {}).get(key)
+                print(f"   {sign} {key}" + (f"  {name}" if name else ""))
+            if len(keys) > REPORT_SAMPLE:
+                print(f"   {sign} ... and {len(keys) - REPORT_SAMPLE} more")
+
+
+# ---------------------------
+# APPLY
+# ---------------------------
+
+def _delete_removed(golden_db, diff, rubric_ids, remedy_ids):
+    """
+    Deletes go first so re-added rows never collide on a unique column.
+    """
+    rubrics = GoldenRubric.__table__
+    remedies = GoldenRemedy.__table__
+    relations = GoldenRubricRemedy.__table__
+
+    pairs = []
+    for key in diff["relation"]["removed"]:
+        rubricid, remedyid = (int(x) for x in key.split(":"))
+        if rubricid in rubric_ids and remedyid in remedy_ids:
+            pairs.append({"b_rubric": rubric_ids[rubricid], "b_remedy": remedy_ids[remedyid]})
+    if pairs:
+        golden_db.execute(
+            relations.delete().where(
+                (relations.c.rubric_id == bindparam("b_rubric"))
+                & (relations.c.remedy_id == bindparam("b_remedy"))
+            ),
+            pairs
+        )
+
+    gone_rubrics = [rubric_ids.pop(int(k)) for k in diff["rubric"]["removed"] if int(k) in rubric_ids]
+    if gone_rubrics:
+        golden_db.execute(relations.delete().where(relations.c.rubric_id.in_(gone_rubrics)))
+        golden_db.execute(
+            rubrics.update().where(rubrics.c.parent_id.in_(gone_rubrics)).values(parent_id=None)
+        )
+        golden_db.execute(rubrics.delete().where(rubrics.c.id.in_(gone_rubrics)))
+
+    gone_remedies = [remedy_ids.pop(int(k)) for k in diff["remedy"]["removed"] if int(k) in remedy_ids]
+    if gone_remedies:
+        golden_db.execute(relations.delete().where(relations.c.remedy_id.in_(gone_remedies)))
+        golden_db.execute(remedies.delete().where(remedies.c.id.in_(gone_remedies)))
+
+    golden_db.commit()
+    return len(pairs) + len(gone_rubrics) + len(gone_remedies)
+
+
+def _upsert_keys(diff, kind):
+    return diff[kind]["added"] + diff[kind]["changed"]
+
+
+def apply_diff(golden_db, oorep_db, diff, resolved_nodes, remedy_rows, relation_rows):
+    started = time.perf_counter()
+
+    rubric_ids = dict(golden_db.query(GoldenRubric.oorep_id, GoldenRubric.id).all())
+    remedy_ids = dict(golden_db.query(GoldenRemedy.oorep_id, GoldenRemedy.id).all())
+
+    # 1. Deletes
+    deleted = _delete_removed(golden_db, diff, rubric_ids, remedy_ids)
+
+    # 2. Inserts (the loader helpers only insert what is missing)
+    oorep_to_golden_rubrics = insert_golden_rubrics(golden_db, resolved_nodes)
+    oorep_to_golden_remedies = insert_golden_remedies(
+        golden_db, oorep_db, resolved_nodes.keys(), rows=remedy_rows
+    )
+
+    relations = GoldenRubricRemedy.__table__
+    pairs_before = set(golden_db.query(relations.c.rubric_id, relations.c.remedy_id).all())
+
+    insert_golden_relations(
+        golden_db,
+        oorep_db,
+        oorep_to_golden_rubrics,
+        oorep_to_golden_remedies,
+        rows=relation_rows
+    )
+
+    # 3. Updates: changed rows, plus "added" rows that already existed
+    #    (first run against a database built without a manifest)
+    rubric_updates = []
+    for key in _upsert_keys(diff, "rubric"):
+        oorep_id = int(key)
+        if oorep_id in rubric_ids:
+            row = golden_rubric_row(resolved_nodes[oorep_id], oorep_to_golden_rubrics)
+            row["b_oorep_id"] = row.pop("oorep_id")
+            rubric_updates.append(row)
+    if rubric_updates:
+        table = GoldenRubric.__table__
+        golden_db.execute(
+            table.update().where(table.c.oorep_id == bindparam("b_oorep_id")),
+            rubric_updates
+        )
+
+    remedies_by_id = {r.id: r for r in remedy_rows}
+    remedy_updates = [
+        {
+            "b_oorep_id": int(key),
+            "short_name": remedies_by_id[int(key)].nameabbrev,
+            "long_name": remedies_by_id[int(key)].namelong
+        }
+        for key in _upsert_keys(diff, "remedy")
+        if int(key) in remedy_ids
+    ]
+    if remedy_updates:
+        table = GoldenRemedy.__table__
+        golden_db.execute(
+            table.update().where(table.c.oorep_id == bindparam("b_oorep_id")),
+            remedy_updates
+        )
+
+    weights = _first_weights(relation_rows)
+    relation_updates = []
+    for key in _upsert_keys(diff, "relation"):
+        rubricid, remedyid = (int(x) for x in key.split(":"))
+        pair = (oorep_to_golden_rubrics.get(rubricid), oorep_to_golden_remedies.get(remedyid))
+        if pair in pairs_before:
+            relation_updates.append({
+                "b_rubric": pair[0],
+                "b_remedy": pair[1],
+                "grade": weights[(rubricid, remedyid)]
+            })
+    if relation_updates:
+        golden_db.execute(
+            relations.update().where(
+                (relations.c.rubric_id == bindparam("b_rubric"))
+                & (relations.c.remedy_id == bindparam("b_remedy"))
+            ),
+            relation_updates
+        )
+
+    golden_db.commit()
+
+    updated = len(rubric_updates) + len(remedy_updates) + len(relation_updates)
+    print(f"\nDeleted: {deleted}  Updated: {updated}")
+    _report_rate("Differential apply", deleted + updated, started)
+
+
+def build_golden_repertory_incremental(golden_db, oorep_db, dry_run=False):
+    """
+    Differential rebuild. With `dry_run` only the diff report is printed.
+    Returns the diff.
+    """
+    print("\n==============================================")
+    print("   REPERTO AI — GOLDEN REPERTORY DIFF BUILD   ")
+    print("==============================================\n")
+
+    # 1. Read the source (same steps as the full build)
+    verified = verify_core_rubrics_exist(oorep_db)
+    resolved_nodes = resolve_rubric_hierarchy(oorep_db, verified)
+    remedy_rows = fetch_source_remedies(oorep_db, resolved_nodes.keys())
+    relation_rows = fetch_source_relations(oorep_db, resolved_nodes.keys())
+
+    # 2. Diff against the stored manifest
+    new = source_fingerprints(resolved_nodes, remedy_rows, relation_rows)
+    old = load_manifest(golden_db)
+    baseline = not any(old.values())
+    if baseline:
+        old = baseline_manifest(golden_db)
+
+    diff = diff_manifests(old, new)
+    print_diff_report(diff, resolved_nodes, remedy_rows)
+
+    if dry_run:
+        print("\nDry run: no changes applied.")
+        return diff
+
+    if diff_is_empty(diff):
+        print("\n✅ Golden repertory is up to date.")
+        return diff
+
+    # 3. Apply, then refresh what depends on the changed tables
+    apply_diff(golden_db, oorep_db, diff, resolved_nodes, remedy_rows, relation_rows)
+
+    if any(diff["rubric"].values()):
+        build_rubric_closure(golden_db)
+
+    build_search_index(golden_db)
+    build_fulltext_index(golden_db)
+
+    save_manifest(golden_db, new, diff, rewrite=baseline)
+
+    print("\n==============================================")
+    print("   GOLDEN REPERTORY DIFF BUILD COMPLETED     ")
+    print("==============================================\n")
+
+    return diff
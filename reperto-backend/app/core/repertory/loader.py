@@ -224,33 +224,86 @@ GOLDEN_CORE_RUBRICS = [
 ]
 
 
+import csv
+import io
+import time
 from sqlalchemy.orm import Session
-from app.core.repertory.models import GoldenRubric, GoldenRemedy, GoldenRubricRemedy
-from sqlalchemy import text
+from app.core.repertory.models import GoldenRubric, GoldenRemedy, GoldenRubricRemedy, GoldenRubricClosure
+from app.core.repertory.compiled import build_compiled_repertory
+from app.core.repertory.search_index import RubricSearchIndex
+from app.core.repertory.snapshot import SNAPSHOT_PATH, database_fingerprint, write_snapshot
+from app.core.repertory.fulltext import ensure_fulltext_index
+from app.core.repertory.rubric_search import reset_fulltext_check
+from app.core.repertory.sources import as_source
+
+# executemany chunk size for bulk inserts
+BULK_CHUNK_SIZE = 5000
+
+
+def _report_rate(label, n_rows, started):
+    elapsed = time.perf_counter() - started
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{label}: {n_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+
+def _copy_rows(golden_db, table, rows):
+    """
+    COPY ... FROM STDIN on Postgres (psycopg2). Returns False when the
+    driver has no COPY support so the caller can fall back.
+    """
+    raw = golden_db.connection().connection
+    cursor = raw.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        cursor.close()
+        return False
+
+    columns = list(rows[0].keys())
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buf.seek(0)
+
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buf
+        )
+    finally:
+        cursor.close()
+    return True
+
+
+def bulk_insert(golden_db, table, rows):
+    """
+    Set-based insert of `rows` (list of dicts, same keys) into `table`:
+    COPY on Postgres, chunked executemany everywhere else.
+    """
+    if not rows:
+        return 0
+
+    if golden_db.get_bind().dialect.name == "postgresql" and _copy_rows(golden_db, table, rows):
+        return len(rows)
+
+    for i in range(0, len(rows), BULK_CHUNK_SIZE):
+        golden_db.execute(table.insert(), rows[i:i + BULK_CHUNK_SIZE])
+    return len(rows)
+
 
 def verify_core_rubrics_exist(oorep_db):
     """
     Verifies that all Golden Core rubrics exist in OOREP.
+    `oorep_db` is an OOREP session or a source adapter (see sources.py).
     Returns a mapping: fullpath -> oorep_row
     """
 
-    found = {}
-    missing = []
+    rows_by_fp = {}
+    for row in as_source(oorep_db).rubrics_by_fullpath(GOLDEN_CORE_RUBRICS):
+        # Normally exactly 1 row per fullpath
+        rows_by_fp.setdefault(row.fullpath, []).append(row)
 
-    query = text("""
-        SELECT id, fullpath, mother
-        FROM rubric
-        WHERE fullpath = :fp
-    """)
-
-    for fp in GOLDEN_CORE_RUBRICS:
-        result = oorep_db.execute(query, {"fp": fp}).fetchall()
-
-        if not result:
-            missing.append(fp)
-        else:
-            # Normally exactly 1 row
-            found[fp] = result
+    found = {fp: rows_by_fp[fp] for fp in GOLDEN_CORE_RUBRICS if fp in rows_by_fp}
+    missing = [fp for fp in GOLDEN_CORE_RUBRICS if fp not in rows_by_fp]
 
     print("========== GOLDEN RUBRIC VERIFICATION ==========")
     print(f"Total expected: {len(GOLDEN_CORE_RUBRICS)}")
@@ -272,7 +325,7 @@ def verify_core_rubrics_exist(oorep_db):
 def resolve_rubric_hierarchy(oorep_db, starting_rows):
     """
     Given verified OOREP rubric rows,
-    recursively resolve all parent rubrics to build full hierarchy.
+    resolve all parent rubrics to build full hierarchy.
 
     Returns:
         dict[oorep_id] = {
@@ -284,65 +337,66 @@ def resolve_rubric_hierarchy(oorep_db, starting_rows):
         }
     """
 
-    all_nodes = {}
-
-    query = text("""
-        SELECT id, fullpath, mother
-        FROM rubric
-        WHERE id = :rid
-    """)
-
-    def walk_up(rid, depth=0):
-        if rid in all_nodes:
-            return
+    start_ids = [r.id for rows in starting_rows.values() for r in rows]
 
-        row = oorep_db.execute(query, {"rid": rid}).fetchone()
-        if not row:
-            return
-
-        fullpath = row.fullpath
-        mother = row.mother
-
-        raw_chapter = fullpath.split(",")[0].strip()
+    # every starting rubric plus all its ancestors in one lookup
+    all_nodes = {}
+    for row in as_source(oorep_db).rubric_ancestry(start_ids):
+        raw_chapter = row.fullpath.split(",")[0].strip()
         chapter = CHAPTER_NORMALIZATION.get(raw_chapter, raw_chapter)
 
-        
-
-        all_nodes[rid] = {
-            "id": rid,
-            "fullpath": fullpath,
-            "mother": mother,
+        all_nodes[row.id] = {
+            "id": row.id,
+            "fullpath": row.fullpath,
+            "mother": row.mother,
             "chapter": chapter,
-            "depth": None  # filled later
+            "depth": None  # filled below
         }
 
-        if mother:
-            walk_up(mother, depth + 1)
-
-    # start walking from all golden rubrics
-    for rows in starting_rows.values():
-        for r in rows:
-            walk_up(r.id)
-
-    # after collecting all, compute depth properly
-    def compute_depth(rid):
-        node = all_nodes[rid]
-        if not node["mother"]:
-            node["depth"] = 0
-        else:
-            parent = all_nodes.get(node["mother"])
-            if parent["depth"] is None:
-                compute_depth(parent["id"])
-            node["depth"] = parent["depth"] + 1
-
-    for rid in all_nodes:
-        if all_nodes[rid]["depth"] is None:
-            compute_depth(rid)
+    # depth = distance to the root, computed iteratively (no recursion
+    # limit on deep trees); an unknown mother counts as a root
+    for rid, node in all_nodes.items():
+        chain = []
+        on_chain = set()
+        while node["depth"] is None:
+            chain.append(node)
+            on_chain.add(node["id"])
+            parent = all_nodes.get(node["mother"]) if node["mother"] else None
+            if parent is None or parent["id"] in on_chain:
+                node["depth"] = 0
+                chain.pop()
+                break
+            node = parent
+
+        depth = node["depth"]
+        for n in reversed(chain):
+            depth += 1
+            n["depth"] = depth
 
     print("\n========== RUBRIC HIERARCHY RESOLVED ==========")
     print("Total unique rubric nodes (including parents):", len(all_nodes))
 
     return all_nodes
+
+
+def golden_rubric_row(node, oorep_to_golden):
+    """
+    golden_rubrics column values for a resolved OOREP node.
+    `oorep_to_golden` must already hold the node's mother.
+    """
+    full_path_en = RUBRIC_TRANSLATIONS.get(node["fullpath"], node["fullpath"])
+    return {
+        "chapter": node["chapter"],
+        "text": node["fullpath"].split(",")[-1].strip(),
+        "text_en": full_path_en.split(",")[-1].strip(),
+        "full_path": node["fullpath"],
+        "full_path_en": full_path_en,
+        "parent_id": oorep_to_golden.get(node["mother"]) if node["mother"] else None,
+        "depth": node["depth"],
+        "oorep_id": node["id"]
+    }
+
+
 def insert_golden_rubrics(golden_db, resolved_nodes):
     """
     Inserts resolved rubric hierarchy into golden_rubrics table.
@@ -357,118 +411,144 @@ def insert_golden_rubrics(golden_db, resolved_nodes):
         key=lambda x: x["depth"]
     )
 
-    oorep_to_golden = {}
+    started = time.perf_counter()
+    table = GoldenRubric.__table__
+
+    # one query for everything already built
+    oorep_to_golden = dict(golden_db.query(GoldenRubric.oorep_id, GoldenRubric.id).all())
 
+    # one executemany per depth level: parents' golden ids are known
+    # before their children are inserted
+    by_depth = {}
     for node in nodes_sorted:
-        # check if already exists
-        existing = golden_db.query(GoldenRubric).filter_by(
-            oorep_id=node["id"]
-        ).first()
+        if node["id"] not in oorep_to_golden:
+            by_depth.setdefault(node["depth"], []).append(node)
 
-        if existing:
-            oorep_to_golden[node["id"]] = existing.id
-            continue
+    inserted = 0
+    for depth in sorted(by_depth):
+        rows = [golden_rubric_row(node, oorep_to_golden) for node in by_depth[depth]]
 
-        parent_golden_id = None
-        if node["mother"]:
-            parent_golden_id = oorep_to_golden.get(node["mother"])
-
-        full_path_en = RUBRIC_TRANSLATIONS.get(node["fullpath"], node["fullpath"])
-        text_en = full_path_en.split(",")[-1].strip()
-
-        rubric = GoldenRubric(
-            chapter=node["chapter"],
-            text=node["fullpath"].split(",")[-1].strip(),
-            text_en=text_en,
-            full_path=node["fullpath"],
-            full_path_en=full_path_en,
-            parent_id=parent_golden_id,
-            depth=node["depth"],
-            oorep_id=node["id"]
-        )
+        inserted += bulk_insert(golden_db, table, rows)
 
-        golden_db.add(rubric)
-        golden_db.flush()  # get rubric.id
+        new_ids = [row["oorep_id"] for row in rows]
+        oorep_to_golden.update(
+            golden_db.query(GoldenRubric.oorep_id, GoldenRubric.id)
+            .filter(GoldenRubric.oorep_id.in_(new_ids))
+            .all()
+        )
 
-        oorep_to_golden[node["id"]] = rubric.id
+    # keep only the nodes of this build (the table may hold others)
+    oorep_to_golden = {rid: oorep_to_golden[rid] for rid in resolved_nodes if rid in oorep_to_golden}
 
     golden_db.commit()
 
     print("✅ Golden rubrics inserted successfully.")
+    _report_rate("New rubrics", inserted, started)
     print("Total rubrics in Golden Core:", len(oorep_to_golden))
 
     return oorep_to_golden
 
-def insert_golden_remedies(golden_db, oorep_db, oorep_rubric_ids):
+
+def build_rubric_closure(golden_db):
     """
-    Extracts and inserts all remedies linked to selected rubrics.
-    Returns mapping: oorep_remedy_id -> golden_remedy_id
+    Materializes golden_rubric_closure from golden_rubrics.parent_id:
+    every (ancestor, descendant, distance) pair, self pairs included.
+    Rebuilt from scratch on each run.
     """
 
-    print("\n========== EXTRACTING GOLDEN REMEDIES ==========")
+    print("\n========== BUILDING RUBRIC CLOSURE TABLE ==========")
 
-    # Step 1: get all unique remedy IDs for these rubrics
-    remedy_query = text("""
-        SELECT DISTINCT remedyid
-        FROM rubricremedy
-        WHERE rubricid = ANY(:rids)
-    """)
+    GoldenRubricClosure.__table__.create(bind=golden_db.get_bind(), checkfirst=True)
 
-    result = oorep_db.execute(
-        remedy_query,
-        {"rids": list(oorep_rubric_ids)}
-    ).fetchall()
+    parent_of = dict(golden_db.query(GoldenRubric.id, GoldenRubric.parent_id).all())
 
-    remedy_ids = [r[0] for r in result]
+    pairs = []
+    for rid in parent_of:
+        pairs.append({"ancestor_id": rid, "descendant_id": rid, "distance": 0})
 
-    print("Unique remedies found:", len(remedy_ids))
+        seen = {rid}
+        parent = parent_of.get(rid)
+        distance = 1
+        while parent is not None and parent not in seen:
+            pairs.append({"ancestor_id": parent, "descendant_id": rid, "distance": distance})
+            seen.add(parent)
+            parent = parent_of.get(parent)
+            distance += 1
 
-    # Step 2: fetch remedy details
-    details_query = text("""
-        SELECT id, nameabbrev, namelong
-        FROM remedy
-        WHERE id = ANY(:ids)
-    """)
+    golden_db.query(GoldenRubricClosure).delete()
+    bulk_insert(golden_db, GoldenRubricClosure.__table__, pairs)
+    golden_db.commit()
 
-    rows = oorep_db.execute(
-        details_query,
-        {"ids": remedy_ids}
-    ).fetchall()
+    print("✅ Rubric closure table built.")
+    print("Total ancestor/descendant pairs:", len(pairs))
 
-    oorep_to_golden = {}
 
-    # Step 3: insert into golden_remedies
-    for r in rows:
-        existing = golden_db.query(GoldenRemedy).filter_by(
-            oorep_id=r.id
-        ).first()
+def fetch_source_remedies(oorep_db, oorep_rubric_ids):
+    """
+    OOREP remedy rows (id, nameabbrev, namelong) linked to the given rubrics.
+    """
+    rows = as_source(oorep_db).remedies_for_rubrics(list(oorep_rubric_ids))
 
-        if existing:
-            oorep_to_golden[r.id] = existing.id
-            continue
+    print("Unique remedies found:", len(rows))
+
+    return rows
 
-        remedy = GoldenRemedy(
-            short_name=r.nameabbrev,
-            long_name=r.namelong,
-            oorep_id=r.id
-        )
 
-        golden_db.add(remedy)
-        golden_db.flush()
+def fetch_source_relations(oorep_db, oorep_rubric_ids):
+    """
+    OOREP rubricremedy rows (rubricid, remedyid, weight) for the given rubrics.
+    """
+    return as_source(oorep_db).relations_for_rubrics(list(oorep_rubric_ids))
 
-        oorep_to_golden[r.id] = remedy.id
+
+def insert_golden_remedies(golden_db, oorep_db, oorep_rubric_ids, rows=None):
+    """
+    Extracts and inserts all remedies linked to selected rubrics.
+    `rows` skips the extraction when the caller already fetched them.
+    Returns mapping: oorep_remedy_id -> golden_remedy_id
+    """
+
+    print("\n========== EXTRACTING GOLDEN REMEDIES ==========")
+
+    if rows is None:
+        rows = fetch_source_remedies(oorep_db, oorep_rubric_ids)
+
+    # Step 3: insert the ones not already in golden_remedies
+    started = time.perf_counter()
+
+    existing = dict(golden_db.query(GoldenRemedy.oorep_id, GoldenRemedy.id).all())
+
+    new_rows = [
+        {"short_name": r.nameabbrev, "long_name": r.namelong, "oorep_id": r.id}
+        for r in rows
+        if r.id not in existing
+    ]
+    inserted = bulk_insert(golden_db, GoldenRemedy.__table__, new_rows)
+
+    if new_rows:
+        existing.update(
+            golden_db.query(GoldenRemedy.oorep_id, GoldenRemedy.id)
+            .filter(GoldenRemedy.oorep_id.in_([r["oorep_id"] for r in new_rows]))
+            .all()
+        )
+
+    oorep_to_golden = {r.id: existing[r.id] for r in rows}
 
     golden_db.commit()
 
     print("✅ Golden remedies inserted successfully.")
+    _report_rate("New remedies", inserted, started)
     print("Total remedies in Golden Core:", len(oorep_to_golden))
 
     return oorep_to_golden
+
+
 def insert_golden_relations(
     golden_db,
     oorep_db,
     oorep_to_golden_rubrics,
-    oorep_to_golden_remedies
+    oorep_to_golden_remedies,
+    rows=None
 ):
     """
     Inserts rubric-remedy-grade relations into golden_rubric_remedies.
@@ -476,18 +556,15 @@ def insert_golden_relations(
 
     print("\n========== INSERTING GOLDEN RUBRIC-REMEDY RELATIONS ==========")
 
-    oorep_rubric_ids = list(oorep_to_golden_rubrics.keys())
+    if rows is None:
+        rows = fetch_source_relations(oorep_db, oorep_to_golden_rubrics.keys())
 
-    query = text("""
-        SELECT rubricid, remedyid, weight
-        FROM rubricremedy
-        WHERE rubricid = ANY(:rids)
-    """)
+    started = time.perf_counter()
 
-    rows = oorep_db.execute(query, {"rids": oorep_rubric_ids}).fetchall()
-
-    count = 0
+    # prevent duplicates: existing pairs in one query, then a set lookup
+    seen = set(golden_db.query(GoldenRubricRemedy.rubric_id, GoldenRubricRemedy.remedy_id).all())
 
+    new_rows = []
     for row in rows:
         golden_rubric_id = oorep_to_golden_rubrics.get(row.rubricid)
         golden_remedy_id = oorep_to_golden_remedies.get(row.remedyid)
@@ -495,36 +572,73 @@ def insert_golden_relations(
         if not golden_rubric_id or not golden_remedy_id:
             continue
 
-        # prevent duplicates
-        existing = golden_db.query(GoldenRubricRemedy).filter_by(
-            rubric_id=golden_rubric_id,
-            remedy_id=golden_remedy_id
-        ).first()
-
-        if existing:
+        key = (golden_rubric_id, golden_remedy_id)
+        if key in seen:
             continue
+        seen.add(key)
 
-        rel = GoldenRubricRemedy(
-            rubric_id=golden_rubric_id,
-            remedy_id=golden_remedy_id,
-            grade=row.weight
-        )
+        new_rows.append({
+            "rubric_id": golden_rubric_id,
+            "remedy_id": golden_remedy_id,
+            "grade": row.weight
+        })
 
-        golden_db.add(rel)
-        count += 1
+    count = bulk_insert(golden_db, GoldenRubricRemedy.__table__, new_rows)
 
     golden_db.commit()
 
     print("✅ Golden rubric-remedy relations inserted.")
+    _report_rate("New relations", count, started)
     print("Total relations:", count)
 
 
+def build_search_index(golden_db):
+    """
+    Builds the BM25 rubric index from the freshly built golden tables
+    and persists it, together with the repertory snapshot the API maps
+    at startup, under app/data/indexes.
+    """
+
+    print("\n========== BUILDING RUBRIC SEARCH INDEX ==========")
+
+    compiled = build_compiled_repertory(golden_db)
+    index = RubricSearchIndex.build(compiled)
+    index.save()
+
+    print("✅ Rubric search index written.")
+    print("Indexed terms:", len(index.postings))
+
+    if SNAPSHOT_PATH:
+        version = write_snapshot(compiled, index, SNAPSHOT_PATH, database_fingerprint(golden_db))
+        print(f"✅ Repertory snapshot written ({version}).")
+
+
+def build_fulltext_index(golden_db):
+    """
+    Creates/refreshes the database full-text index (FTS5 trigram or pg_trgm).
+    """
+
+    print("\n========== BUILDING FULL-TEXT INDEX ==========")
+
+    try:
+        dialect = ensure_fulltext_index(golden_db)
+    except Exception as e:
+        golden_db.rollback()
+        print("⚠️ Full-text index not created:", e)
+        return
+    reset_fulltext_check()
+
+    print(f"✅ Full-text index ready ({dialect}).")
+
 
 def build_golden_repertory(golden_db, oorep_db):
     print("\n==============================================")
     print("   REPERTO AI — GOLDEN REPERTORY BUILD START  ")
     print("==============================================\n")
 
+    # the manifest can only vouch for tables this build filled from empty
+    fresh = golden_db.query(GoldenRubric.id).first() is None
+
     # 1. Verify whitelist against OOREP
     verified = verify_core_rubrics_exist(oorep_db)
 
@@ -534,21 +648,37 @@ def build_golden_repertory(golden_db, oorep_db):
     # 3. Insert Golden rubrics
     oorep_to_golden_rubrics = insert_golden_rubrics(golden_db, resolved_nodes)
 
+    # 3.1 Materialize the rubric hierarchy closure
+    build_rubric_closure(golden_db)
+
     # 4. Insert Golden remedies
+    remedy_rows = fetch_source_remedies(oorep_db, oorep_to_golden_rubrics.keys())
     oorep_to_golden_remedies = insert_golden_remedies(
         golden_db,
         oorep_db,
-        oorep_to_golden_rubrics.keys()
+        oorep_to_golden_rubrics.keys(),
+        rows=remedy_rows
     )
 
     # 5. Insert Golden relations
+    relation_rows = fetch_source_relations(oorep_db, oorep_to_golden_rubrics.keys())
     insert_golden_relations(
         golden_db,
         oorep_db,
         oorep_to_golden_rubrics,
-        oorep_to_golden_remedies
+        oorep_to_golden_remedies,
+        rows=relation_rows
     )
 
+    # 6. Prebuild the rubric search indexes (in-process and database full-text)
+    build_search_index(golden_db)
+    build_fulltext_index(golden_db)
+
+    # 7. Record the build manifest (baseline of the next differential build);
+    # imported here because incremental.py imports this module
+    from app.core.repertory.incremental import record_full_build
+    record_full_build(golden_db, resolved_nodes, remedy_rows, relation_rows, fresh)
+
     print("\n==============================================")
     print("   GOLDEN REPERTORY BUILD COMPLETED SUCCESS  ")
     print("==============================================\n")
@@ -43,3 +43,29 @@ class GoldenRubricRemedy(Base):
 
     rubric = relationship("GoldenRubric")
     remedy = relationship("GoldenRemedy")
+
+
+class GoldenRubricClosure(Base):
+    """
+    Transitive closure of the rubric tree: one row per (ancestor, descendant)
+    pair, including each rubric with itself at distance 0.
+    """
+    __tablename__ = "golden_rubric_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("golden_rubrics.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("golden_rubrics.id"), primary_key=True, index=True)
+    distance = Column(Integer)
+
+
+class GoldenBuildManifest(Base):
+    """
+    Fingerprint of every OOREP source row the golden tables were built
+    from, so a rebuild can apply only what changed.
+    kind: "rubric" | "remedy" | "relation"; source_key: OOREP id
+    (or "rubricid:remedyid" for relations).
+    """
+    __tablename__ = "golden_build_manifest"
+
+    kind = Column(String, primary_key=True)
+    source_key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
@@ -0,0 +1,167 @@
+"""
+Offline OOREP source: streams the rubric, remedy and rubricremedy
+tables out of a plain-format `pg_dump` file (optionally .gz), so a
+Golden Repertory build needs no running Postgres.
+
+    python -m app.core.repertory.builder --dump oorep.sql.gz
+
+Only the `COPY ... FROM stdin;` data blocks are read. Rows are decoded
+one line at a time and filtered on the fly, so memory is bounded by
+what the build keeps (the whitelisted rubrics, their ancestors and
+their relations), not by the size of the dump. The rubric ancestry is
+resolved with one pass over the rubric block per tree level.
+"""
+import gzip
+import re
+from collections import namedtuple
+
+RubricRow = namedtuple("RubricRow", "id fullpath mother")
+RemedyRow = namedtuple("RemedyRow", "id nameabbrev namelong")
+RelationRow = namedtuple("RelationRow", "rubricid remedyid weight")
+
+_COPY_RE = re.compile(rb"^COPY\s+(?P<table>[^\s(]+)\s*\((?P<columns>[^)]*)\)\s+FROM\s+stdin;", re.IGNORECASE)
+_ESCAPE_RE = re.compile(rb"\\(?:([0-7]{1,3})|x([0-9a-fA-F]{1,2})|(.))")
+_ESCAPES = {b"b": b"\b", b"f": b"\f", b"n": b"\n", b"r": b"\r", b"t": b"\t", b"v": b"\v"}
+
+_END_OF_DATA = b"\\."
+
+
+def _unescape_match(m):
+    octal, hexa, char = m.groups()
+    if octal:
+        return bytes((int(octal, 8) & 0xFF,))
+    if hexa:
+        return bytes((int(hexa, 16),))
+    return _ESCAPES.get(char, char)
+
+
+def decode_copy_field(raw: bytes):
+    """
+    One field of COPY text format: \\N is NULL, backslash escapes decoded.
+    Octal/hex escapes are bytes, so the field is decoded as UTF-8 only
+    after unescaping.
+    """
+    if raw == b"\\N":
+        return None
+    if b"\\" in raw:
+        raw = _ESCAPE_RE.sub(_unescape_match, raw)
+    return raw.decode("utf-8")
+
+
+def _table_name(raw: bytes) -> str:
+    # public.rubric / "public"."rubric" / rubric -> rubric
+    return raw.decode("utf-8").replace('"', "").split(".")[-1]
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+class PgDumpReader:
+
+    def __init__(self, path: str):
+        self.path = path
+        # table -> (offset of the first data line, column names); filled
+        # while scanning so later passes seek straight to the block
+        self._blocks = {}
+
+    def _open(self):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "rb")
+        return open(self.path, "rb")
+
+    def _scan_to(self, f, table):
+        for line in iter(f.readline, b""):
+            if not line.startswith(b"COPY "):
+                continue
+            m = _COPY_RE.match(line)
+            if not m:
+                continue
+            name = _table_name(m.group("table"))
+            columns = [c.strip().strip('"') for c in m.group("columns").decode("utf-8").split(",")]
+            self._blocks.setdefault(name, (f.tell(), columns))
+            if name == table:
+                return columns
+        raise ValueError(f"No COPY block for table {table!r} in {self.path}")
+
+    def rows(self, table: str, columns):
+        """
+        Yields tuples of the requested `columns` (decoded strings or None)
+        for every row of `table`'s COPY block.
+        """
+        with self._open() as f:
+            if table in self._blocks:
+                offset, all_columns = self._blocks[table]
+                f.seek(offset)
+            else:
+                all_columns = self._scan_to(f, table)
+
+            try:
+                positions = [all_columns.index(c) for c in columns]
+            except ValueError as e:
+                raise ValueError(f"{table}: {e} (columns: {all_columns})")
+
+            for line in iter(f.readline, b""):
+                line = line.rstrip(b"\r\n")
+                if line == _END_OF_DATA:
+                    return
+                fields = line.split(b"\t")
+                yield tuple(decode_copy_field(fields[i]) for i in positions)
+
+
+class OorepDumpSource:
+    """
+    Source adapter (see sources.py) over an OOREP pg_dump file.
+    """
+
+    def __init__(self, path: str):
+        self.reader = PgDumpReader(path)
+        self._relations_for = None
+        self._relations = None
+
+    def _rubrics(self):
+        for rid, fullpath, mother in self.reader.rows("rubric", ("id", "fullpath", "mother")):
+            yield RubricRow(int(rid), fullpath, _int(mother))
+
+    def rubrics_by_fullpath(self, fullpaths):
+        wanted = set(fullpaths)
+        return [row for row in self._rubrics() if row.fullpath in wanted]
+
+    def rubric_ancestry(self, rubric_ids):
+        found = {}
+        frontier = set(rubric_ids)
+
+        # one pass per tree level; a cycle ends once every id is found
+        while frontier:
+            level = [row for row in self._rubrics() if row.id in frontier]
+            for row in level:
+                found[row.id] = row
+            frontier = {
+                row.mother for row in level
+                if row.mother and row.mother not in found
+            }
+
+        return list(found.values())
+
+    def relations_for_rubrics(self, rubric_ids):
+        wanted = frozenset(rubric_ids)
+        # remedies_for_rubrics and the relation insert ask for the same
+        # rubric set back to back: scan the biggest table only once
+        if self._relations_for != wanted:
+            self._relations = [
+                RelationRow(int(rubricid), int(remedyid), _int(weight))
+                for rubricid, remedyid, weight
+                in self.reader.rows("rubricremedy", ("rubricid", "remedyid", "weight"))
+                if int(rubricid) in wanted
+            ]
+            self._relations_for = wanted
+        return self._relations
+
+    def remedies_for_rubrics(self, rubric_ids):
+        remedy_ids = {rel.remedyid for rel in self.relations_for_rubrics(rubric_ids)}
+        return [
+            RemedyRow(int(rid), nameabbrev, namelong)
+            for rid, nameabbrev, namelong
+            in self.reader.rows("remedy", ("id", "nameabbrev", "namelong"))
+            if int(rid) in remedy_ids
+        ]
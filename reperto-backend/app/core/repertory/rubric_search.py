@@ -1,10 +1,54 @@
+import os
+
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from app.core.repertory.models import GoldenRubric
+from app.core.repertory.compiled import get_compiled_repertory
+from app.core.repertory.search_index import get_search_index, tokenize
+from app.core.repertory.fulltext import fulltext_available, search_rubrics_fulltext
+
+# "memory":   in-process BM25 index (search_index.py)
+# "fulltext": database full-text index (fulltext.py), FTS5 trigram or pg_trgm
+#             depending on the database, for low-memory deployments
+# "auto":     fulltext if the build created it, otherwise memory
+RUBRIC_SEARCH_BACKEND = os.getenv("RUBRIC_SEARCH_BACKEND", "memory")
+
+# (engine, available) of the last full-text check; checked again when
+# sessions are bound to another engine (DATABASE_URL change, tests)
+_fulltext_checked = None
+
+
+def _use_fulltext(db: Session) -> bool:
+    global _fulltext_checked
+
+    if RUBRIC_SEARCH_BACKEND == "memory":
+        return False
+
+    bind = db.get_bind()
+    if _fulltext_checked is None or _fulltext_checked[0] is not bind:
+        available = fulltext_available(db)
+        _fulltext_checked = (bind, available)
+        if not available and RUBRIC_SEARCH_BACKEND == "fulltext":
+            print("Rubric search warning: full-text index missing, using in-memory index")
 
+    return _fulltext_checked[1]
 
-def normalize_text(text: str) -> str:
-    return text.lower().strip()
+
+def reset_fulltext_check():
+    """Forget the cached full-text check (e.g. after the index was created)."""
+    global _fulltext_checked
+    _fulltext_checked = None
+
+
+def memory_index_needed(db: Session = None) -> bool:
+    """
+    Whether searches are served by the in-memory BM25 index, i.e. whether
+    it is worth building, loading and warming it. Without `db` answers
+    from the last full-text check (memory until one has run).
+    """
+    if RUBRIC_SEARCH_BACKEND == "memory":
+        return True
+    if db is not None:
+        return not _use_fulltext(db)
+    return _fulltext_checked is None or not _fulltext_checked[1]
 
 
 def search_rubrics(db: Session, query: str, limit: int = 20):
@@ -12,26 +56,27 @@ def search_rubrics(db: Session, query: str, limit: int = 20):
     Basic rubric discovery engine.
     Phase 1: lexical search (no AI yet)
 
+    Looks tokens up in a ranked index over full_path and full_path_en
+    (backend picked by RUBRIC_SEARCH_BACKEND) and returns the `limit`
+    best matches.
+
     Input:
         query = free words ("anxiety burning stomach")
     Output:
-        list of GoldenRubric
+        list of rubrics (GoldenRubric or compatible records), best first
     """
 
-    tokens = [t for t in normalize_text(query).split() if len(t) > 2]
+    tokens = [t for t in tokenize(query) if len(t) > 2]
 
     if not tokens:
         return []
 
-    conditions = []
-    for token in tokens:
-        conditions.append(GoldenRubric.full_path.ilike(f"%{token}%"))
+    if _use_fulltext(db):
+        return search_rubrics_fulltext(db, tokens, limit=limit)
+
+    compiled = get_compiled_repertory(db)
+    index = get_search_index(compiled)
 
-    results = (
-        db.query(GoldenRubric)
-        .filter(or_(*conditions))
-        .limit(limit)
-        .all()
-    )
+    hits = index.search(tokens, limit=limit)
 
-    return results
+    return [compiled.rubrics[row] for row, _ in hits]
@@ -1,18 +1,147 @@
-from collections import defaultdict
+import math
+
 from sqlalchemy.orm import Session
 
-from app.core.repertory.repository import (
-    get_rubric_relations,
-    get_remedy_by_id,
-)
+from app.core.repertory.compiled import get_compiled_repertory
+
+
+# ---------------------------
+# STRATEGY REGISTRY
+# ---------------------------
+#
+# A strategy receives the compiled repertory and the per-remedy
+# accumulation for the selected rubric rows:
+#
+#   scores:        dict[column] = summed grade
+#   contributions: dict[column] = [(row, grade), ...]
+#   origin:        dict[row] = (selected row, ...) the row was expanded
+#                  from (include_subrubrics), or None without expansion
+#
+# and returns dict[column] = (score, sort_key). Results are ranked by
+# sort_key, descending. Everything a strategy needs beyond that
+# (rubric sizes, remedy totals) is precomputed on the compiled repertory,
+# so no strategy issues queries.
+
+DEFAULT_STRATEGY = "sum_of_grades"
+
+SCORING_STRATEGIES = {}
+
+
+def register_strategy(name: str):
+    def decorator(fn):
+        SCORING_STRATEGIES[name] = fn
+        return fn
+    return decorator
+
+
+def get_strategy(name: str | None):
+    """
+    Raises ValueError for unknown strategy names.
+    """
+    name = name or DEFAULT_STRATEGY
+    if name not in SCORING_STRATEGIES:
+        raise ValueError(
+            f"Unknown scoring strategy '{name}'. "
+            f"Available: {', '.join(sorted(SCORING_STRATEGIES))}"
+        )
+    return SCORING_STRATEGIES[name]
+
+
+def _coverage(rubric_rows, origin=None):
+    """
+    Number of selected rubrics covered: subrubric rows count for the
+    selected rubric(s) they were expanded from, not one each.
+    """
+    if origin is None:
+        return len({row for row, _ in rubric_rows})
+    return len({selected for row, _ in rubric_rows for selected in origin[row]})
+
+
+@register_strategy("sum_of_grades")
+def sum_of_grades(compiled, scores, contributions, origin=None):
+    """
+    Classic repertorization: add up the grades.
+    """
+    return {col: (score, score) for col, score in scores.items()}
+
+
+@register_strategy("coverage_first")
+def coverage_first(compiled, scores, contributions, origin=None):
+    """
+    Rank by number of selected rubrics covered, then by summed grades.
+    """
+    return {
+        col: (score, (_coverage(contributions[col], origin), score))
+        for col, score in scores.items()
+    }
+
 
+@register_strategy("rarity_weighted")
+def rarity_weighted(compiled, scores, contributions, origin=None):
+    """
+    IDF-style: a grade in a small rubric counts more than one in a rubric
+    listing half the materia medica.
+        weight(rubric) = log(1 + n_remedies / rubric_size)
+    """
+    n_remedies = compiled.n_remedies
+    sizes = compiled.rubric_sizes
+    idf = {}
+
+    result = {}
+    for col, rubric_rows in contributions.items():
+        total = 0.0
+        for row, grade in rubric_rows:
+            w = idf.get(row)
+            if w is None:
+                w = idf[row] = math.log(1 + n_remedies / max(sizes[row], 1))
+            total += grade * w
+        total = round(total, 3)
+        result[col] = (total, total)
+    return result
 
-def repertory_score(db: Session, selected_rubric_ids: list[int]):
+
+@register_strategy("boenninghausen")
+def boenninghausen(compiled, scores, contributions, origin=None):
+    """
+    Boenninghausen-style totality: coverage x intensity, tempered by the
+    remedy's overall weight in the repertory so polychrests that appear
+    everywhere do not dominate by sheer presence. Remedies at or below the
+    average weight are not boosted.
+        score = coverage * sum(grades) / sqrt(max(remedy_total / mean_remedy_total, 1))
+    """
+    totals = compiled.remedy_totals
+    mean_total = compiled.mean_remedy_total
+
+    result = {}
+    for col, score in scores.items():
+        relative = totals[col] / mean_total if mean_total else 1
+        value = _coverage(contributions[col], origin) * score / math.sqrt(max(relative, 1.0))
+        value = round(value, 3)
+        result[col] = (value, value)
+    return result
+
+
+# ---------------------------
+# SCORING
+# ---------------------------
+
+def repertory_score(
+    db: Session,
+    selected_rubric_ids: list[int],
+    strategy: str = DEFAULT_STRATEGY,
+    include_subrubrics: bool = False
+):
     """
     Core CDSS scoring engine.
 
+    Runs against the in-memory compiled repertory (see compiled.py);
+    `db` is only used to build it lazily if startup did not.
+
     Input:
         selected_rubric_ids -> list of GoldenRubric.id
+        strategy            -> name in SCORING_STRATEGIES
+        include_subrubrics  -> also score every descendant of each selected
+                               rubric ("Head, pain" pulls in "Head, pain, forehead")
 
     Output:
         sorted list of dicts:
@@ -20,7 +149,7 @@ def repertory_score(db: Session, selected_rubric_ids: list[int]):
             {
                 "remedy_id": int,
                 "remedy_name": str,
-                "score": int,
+                "score": int | float,
                 "contributions": [
                     {
                         "rubric_id": int,
@@ -31,39 +160,46 @@ def repertory_score(db: Session, selected_rubric_ids: list[int]):
         ]
     """
 
-    relations = get_rubric_relations(db, selected_rubric_ids)
-
-    remedy_scores = defaultdict(int)
-    contributions = defaultdict(list)
+    strategy_fn = get_strategy(strategy)
+    compiled = get_compiled_repertory(db)
 
-    # accumulate scores
-    for rel in relations:
-        remedy_scores[rel.remedy_id] += rel.grade
-        contributions[rel.remedy_id].append({
-            "rubric_id": rel.rubric_id,
-            "grade": rel.grade
-        })
+    rows = compiled.rows_for(selected_rubric_ids)
+    origin = None
+    if include_subrubrics:
+        rows, origin = compiled.expand_subrubrics(rows)
+    remedy_scores, contributions = compiled.accumulate(rows)
+    ranked = strategy_fn(compiled, remedy_scores, contributions, origin)
 
-    # build final ranked list
+    # rank first, then build the final list
+    order = sorted(ranked, key=lambda col: ranked[col][1], reverse=True)
+    rubrics = compiled.rubrics
     results = []
 
-    for remedy_id, score in remedy_scores.items():
-        remedy = get_remedy_by_id(db, remedy_id)
-
+    for col in order:
         results.append({
-            "remedy_id": remedy_id,
-            "remedy_name": remedy.long_name,
-            "score": score,
-            "contributions": contributions[remedy_id]
+            "remedy_id": compiled.remedy_ids[col],
+            "remedy_name": compiled.remedy_names[col],
+            "score": ranked[col][0],
+            "contributions": [
+                {
+                    "rubric_id": rubrics[row].id,
+                    "grade": grade
+                }
+                for row, grade in contributions[col]
+            ]
         })
 
-    results.sort(key=lambda x: x["score"], reverse=True)
     return results
 
 
-def score_remedies(db: Session, rubrics: list):
+def score_remedies(
+    db: Session,
+    rubrics: list,
+    strategy: str = DEFAULT_STRATEGY,
+    include_subrubrics: bool = False
+):
     """
     Wrapper for CDSS scoring that takes GoldenRubric objects.
     """
     rubric_ids = [r.id for r in rubrics]
-    return repertory_score(db, rubric_ids)
+    return repertory_score(db, rubric_ids, strategy=strategy, include_subrubrics=include_subrubrics)
@@ -0,0 +1,310 @@
+"""
+Rubric Search Index
+
+Inverted index token -> posting list over golden rubrics, ranked with BM25.
+Each rubric is indexed as one document made of both `full_path` (German)
+and `full_path_en`.
+
+The index is built from the compiled repertory, kept in memory and
+persisted as JSON under app/data/indexes so it does not need rebuilding
+on every start.
+
+Substring lookups ("schmerz" in "kopfschmerz") go through a trigram ->
+terms map built with the index: a query token's candidates are the
+intersection of its trigrams' term sets, so the work follows the number
+of candidate terms rather than the vocabulary size.
+"""
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Optional
+
+from app.core.repertory.compiled import CompiledRepertory, current_compiled_repertory
+from app.metrics import register_cache, register_collector
+
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "indexes")
+INDEX_PATH = os.path.join(INDEX_DIR, "rubric_index.json")
+INDEX_FORMAT_VERSION = 1
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Query tokens that only match part of an indexed term ("schlaf" in
+# "schlaflosigkeit") are scored at this fraction of an exact hit
+PARTIAL_MATCH_WEIGHT = 0.7
+
+TOKEN_RE = re.compile(r"[^\W\d_]+")
+
+# Length of the n-grams in the substring map
+NGRAM = 3
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _ngrams(term: str) -> set[str]:
+    return {term[i:i + NGRAM] for i in range(len(term) - NGRAM + 1)}
+
+
+def repertory_fingerprint(compiled: CompiledRepertory) -> str:
+    """
+    Identifies the rubric set an index was built from.
+    """
+    h = hashlib.sha1()
+    for r in compiled.rubrics:
+        h.update(f"{r.id}\x1f{r.full_path}\x1f{r.full_path_en or ''}\x1e".encode("utf-8"))
+    return h.hexdigest()
+
+
+class PostingList:
+    """
+    (row, term_frequency) pairs stored as two parallel int sequences,
+    e.g. slices of a memory-mapped snapshot. Iterates like the list form.
+    """
+    __slots__ = ("rows", "tfs")
+
+    def __init__(self, rows, tfs):
+        self.rows = rows
+        self.tfs = tfs
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return zip(self.rows, self.tfs)
+
+
+class RubricSearchIndex:
+    """
+    postings[term] = [(row, term_frequency), ...]   (row = compiled repertory row)
+                     or an equivalent PostingList
+    doc_lengths[row] = number of tokens in the rubric document
+    """
+
+    def __init__(self, fingerprint, postings, doc_lengths):
+        self.fingerprint = fingerprint
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.n_docs = len(doc_lengths)
+        self.avg_doc_length = (sum(doc_lengths) / self.n_docs) if self.n_docs else 0.0
+        self.vocabulary = sorted(postings)
+        self.ngrams = self._ngram_map(self.vocabulary)
+        self.idfs = {term: self._idf(len(plist)) for term, plist in postings.items()}
+
+        # per-index cache of query token -> [(term, weight), ...]
+        self._expand = lru_cache(maxsize=4096)(self._expand_token)
+
+    # ---------------------------
+    # BUILD / PERSIST
+    # ---------------------------
+
+    @classmethod
+    def build(cls, compiled: CompiledRepertory):
+        postings = {}
+        doc_lengths = []
+
+        for row, rubric in enumerate(compiled.rubrics):
+            tokens = tokenize(rubric.full_path)
+            if rubric.full_path_en and rubric.full_path_en != rubric.full_path:
+                tokens += tokenize(rubric.full_path_en)
+
+            doc_lengths.append(len(tokens))
+
+            tf = {}
+            for t in tokens:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                postings.setdefault(t, []).append((row, n))
+
+        return cls(repertory_fingerprint(compiled), postings, doc_lengths)
+
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = {
+            "version": INDEX_FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "doc_lengths": self.doc_lengths,
+            "postings": {term: list(plist) for term, plist in self.postings.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH):
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported rubric index version: {payload.get('version')}")
+
+        postings = {
+            term: [(row, tf) for row, tf in plist]
+            for term, plist in payload["postings"].items()
+        }
+        return cls(payload["fingerprint"], postings, payload["doc_lengths"])
+
+    @staticmethod
+    def _ngram_map(vocabulary):
+        """trigram -> frozenset of positions in `vocabulary` of the terms containing it."""
+        ngrams = {}
+        for i, term in enumerate(vocabulary):
+            for gram in _ngrams(term):
+                ngrams.setdefault(gram, []).append(i)
+        return {gram: frozenset(ids) for gram, ids in ngrams.items()}
+
+    # ---------------------------
+    # QUERY
+    # ---------------------------
+
+    def _containing_terms(self, token: str) -> list[str]:
+        """Vocabulary terms containing `token`, in vocabulary order."""
+        if len(token) < NGRAM:
+            # too short for a trigram; search_rubrics never sends these
+            return [term for term in self.vocabulary if token in term]
+
+        sets = sorted((self.ngrams.get(gram, frozenset()) for gram in _ngrams(token)), key=len)
+        candidates = sets[0]
+        for other in sets[1:]:
+            if not candidates:
+                break
+            candidates = candidates & other
+
+        # sharing every trigram does not make it a substring ("abcab" / "bcabc")
+        vocabulary = self.vocabulary
+        return [vocabulary[i] for i in sorted(candidates) if token in vocabulary[i]]
+
+    def _expand_token(self, token: str):
+        """
+        Query token -> indexed terms it matches, with weights: the exact
+        term at full weight plus every longer vocabulary term containing
+        it at PARTIAL_MATCH_WEIGHT ("schmerz" also finds "kopfschmerz"),
+        the same recall as the old ILIKE '%token%' over the rubric table.
+        """
+        partial = [
+            (term, PARTIAL_MATCH_WEIGHT)
+            for term in self._containing_terms(token)
+            if term != token
+        ]
+        if token in self.postings:
+            partial.insert(0, (token, 1.0))
+        return tuple(partial)
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, tokens: list[str], limit: int = 20):
+        """
+        Returns [(row, bm25_score), ...] best first.
+        """
+        scores = {}
+        doc_lengths = self.doc_lengths
+        avg = self.avg_doc_length or 1.0
+
+        for token in set(tokens):
+            for term, weight in self._expand(token):
+                plist = self.postings[term]
+                idf = self.idfs[term] * weight
+                for row, tf in plist:
+                    norm = tf * (BM25_K1 + 1) / (
+                        tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[row] / avg)
+                    )
+                    scores[row] = scores.get(row, 0.0) + idf * norm
+
+        return heapq.nlargest(limit, scores.items(), key=lambda x: x[1])
+
+
+# ---------------------------
+# PROCESS-WIDE INSTANCE
+# ---------------------------
+
+_index: Optional[RubricSearchIndex] = None
+_index_compiled: Optional[CompiledRepertory] = None
+_lock = threading.Lock()
+_load_errors = 0
+
+
+def load_search_index(compiled: CompiledRepertory, path: str = INDEX_PATH) -> RubricSearchIndex:
+    """
+    Loads the persisted index if it matches the compiled repertory,
+    otherwise rebuilds it and writes it back.
+    """
+    global _load_errors
+
+    fingerprint = repertory_fingerprint(compiled)
+    index = None
+
+    if os.path.exists(path):
+        try:
+            index = RubricSearchIndex.load(path)
+        except Exception as e:
+            print(f"Rubric index warning (rebuilding): {e}")
+            _load_errors += 1
+        if index is not None and index.fingerprint != fingerprint:
+            index = None
+
+    if index is None:
+        index = RubricSearchIndex.build(compiled)
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Rubric index warning (not persisted): {e}")
+            _load_errors += 1
+
+    return set_search_index(index, compiled)
+
+
+def set_search_index(index: RubricSearchIndex, compiled: CompiledRepertory) -> RubricSearchIndex:
+    """
+    Installs an index as the process-wide one for `compiled`.
+    """
+    global _index, _index_compiled
+
+    with _lock:
+        _index = index
+        _index_compiled = compiled
+    return index
+
+
+def get_search_index(compiled: CompiledRepertory) -> RubricSearchIndex:
+    """
+    Returns the index for `compiled`: the one mapped with its snapshot,
+    else the process-wide index, (re)loading it on first use or when
+    the compiled repertory it was built from has been replaced.
+    """
+    if compiled.snapshot is not None and compiled.snapshot.has_search_index:
+        return compiled.snapshot.search_index()
+    if _index is not None and _index_compiled is compiled:
+        return _index
+    return load_search_index(compiled)
+
+
+def _expand_cache_stats():
+    # query-token expansion cache of the live index, if loaded; never loads one
+    compiled = current_compiled_repertory()
+    if compiled is None:
+        return None
+    if compiled.snapshot is not None and compiled.snapshot.has_search_index:
+        index = compiled.snapshot._index
+    else:
+        index = _index if _index_compiled is compiled else None
+    return index._expand.cache_info()._asdict() if index is not None else None
+
+
+def _index_metrics():
+    yield (
+        "reperto_search_index_errors_total", "counter",
+        "Persisted rubric index loads or saves that failed.", {}, _load_errors
+    )
+
+
+register_cache("query_expansion", _expand_cache_stats)
+register_collector(_index_metrics)
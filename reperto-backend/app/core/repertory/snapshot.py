@@ -0,0 +1,586 @@
+"""
+Repertory Snapshot
+
+Versioned, checksummed binary image of the compiled repertory and its
+search index, written to app/data/indexes by the golden build (and by
+the API on a cold start with no snapshot yet).
+
+The API maps it read-only with `mmap`: the CSR relation arrays, the
+derived scoring/hierarchy arrays and the search postings are used in
+place as int64 memoryviews, so every uvicorn worker on a host shares one
+physical copy through the page cache and loading costs a checksum pass
+instead of three SQL queries and an index build. Only the small rubric
+metadata (interned strings) is decoded per process.
+
+Layout (little-endian):
+
+    header     magic "RPSNAP01", format version u32, section count u32,
+               sha256 of everything after the section directory (32 bytes)
+    directory  per section: name (24 bytes, NUL padded), offset u64, length u64
+    sections   8-byte aligned; int64 arrays, or raw bytes ("strings", "meta")
+
+The meta section records the golden tables' fingerprint (row counts, max
+ids, grade sum; see database_fingerprint). A snapshot whose fingerprint no
+longer matches the database it is loaded against is rebuilt, not served.
+
+Strings (chapters, texts, paths, remedy names, search terms) are stored
+once in an interned table: "str_offsets" (n + 1 int64) into the UTF-8
+"strings" blob; columns refer to them by index, -1 meaning NULL.
+
+Hot swap: `snapshot_watcher` polls the snapshot file. When a build
+replaces it (and its db_fingerprint matches the database the API runs
+against), the new file is mapped and everything derived from it is
+prepared on the watcher thread (see register_warmup); then the
+process-wide repertory is switched in one step. Requests that pinned
+the old version (compiled.pinned_repertory) finish on it; its mapping
+is released once the last of them lets go.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.repertory.compiled import (
+    CompiledRepertory, RubricRecord, build_compiled_repertory,
+    set_compiled_repertory
+)
+from app.core.repertory.search_index import (
+    INDEX_DIR, RubricSearchIndex, PostingList, set_search_index
+)
+from app.core.repertory.rubric_search import memory_index_needed
+from app.database import SessionLocal
+from app.metrics import register_collector
+
+SNAPSHOT_PATH = os.getenv("REPERTORY_SNAPSHOT", os.path.join(INDEX_DIR, "repertory.snap"))
+# Seconds between checks for a rebuilt snapshot (0 disables hot swap)
+REPERTORY_WATCH_INTERVAL = float(os.getenv("REPERTORY_WATCH_INTERVAL", "5"))
+
+SNAPSHOT_MAGIC = b"RPSNAP01"
+SNAPSHOT_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sII32s")
+_ENTRY = struct.Struct("<24sQQ")
+_ALIGN = 8
+
+_RUBRIC_STRING_FIELDS = ("chapter", "text", "text_en", "full_path", "full_path_en")
+
+if array("q").itemsize != 8:  # pragma: no cover
+    raise ImportError("Repertory snapshots need 64-bit int arrays")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _StringTable:
+
+    def __init__(self):
+        self.index = {}
+        self.offsets = array("q", [0])
+        self.blob = bytearray()
+
+    def add(self, value):
+        if value is None:
+            return -1
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.offsets) - 1
+            self.index[value] = idx
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return idx
+
+
+def database_fingerprint(db: Session) -> str:
+    """
+    Cheap summary of the golden tables (a few aggregate queries): row
+    count and max id of each table, plus the grade sum so an in-place
+    regrade by a differential build is noticed too.
+    """
+    rubrics = db.execute(text("SELECT COUNT(*), MAX(id) FROM golden_rubrics")).fetchone()
+    remedies = db.execute(text("SELECT COUNT(*), MAX(id) FROM golden_remedies")).fetchone()
+    relations = db.execute(text(
+        "SELECT COUNT(*), MAX(id), SUM(grade) FROM golden_rubric_remedies"
+    )).fetchone()
+    return "rubrics={}/{};remedies={}/{};relations={}/{}/{}".format(*rubrics, *remedies, *relations)
+
+
+# ---------------------------
+# WRITE
+# ---------------------------
+
+def write_snapshot(
+    compiled: CompiledRepertory,
+    index: Optional[RubricSearchIndex],
+    path: str = SNAPSHOT_PATH,
+    db_fingerprint: Optional[str] = None,
+) -> str:
+    """
+    Serializes `compiled` + `index` to `path` (atomically). With
+    index=None (full-text backend) the snapshot carries no postings.
+    `db_fingerprint` is database_fingerprint() of the database
+    `compiled` was built from. Returns the repertory version stored in it.
+    """
+    strings = _StringTable()
+    sections = {}
+
+    def ints(name, values):
+        sections[name] = array("q", values).tobytes()
+
+    rubrics = compiled.rubrics
+    ints("rubric_id", (r.id for r in rubrics))
+    ints("rubric_parent", (-1 if r.parent_id is None else r.parent_id for r in rubrics))
+    ints("rubric_depth", (r.depth for r in rubrics))
+    for field in _RUBRIC_STRING_FIELDS:
+        ints(f"rubric_{field}", (strings.add(getattr(r, field)) for r in rubrics))
+
+    ints("remedy_id", compiled.remedy_ids)
+    ints("remedy_name", (strings.add(n) for n in compiled.remedy_names))
+
+    for name in ("indptr", "indices", "grades") + CompiledRepertory.DERIVED:
+        ints(name, getattr(compiled, name))
+
+    # search postings, CSR by term (terms sorted)
+    terms = sorted(index.postings) if index is not None else []
+    term_ptr = array("q", [0])
+    post_rows = array("q")
+    post_tfs = array("q")
+    for term in terms:
+        for row, tf in index.postings[term]:
+            post_rows.append(row)
+            post_tfs.append(tf)
+        term_ptr.append(len(post_rows))
+    ints("term", (strings.add(t) for t in terms))
+    sections["term_ptr"] = term_ptr.tobytes()
+    sections["post_rows"] = post_rows.tobytes()
+    sections["post_tfs"] = post_tfs.tobytes()
+    ints("doc_lengths", index.doc_lengths if index is not None else ())
+
+    sections["str_offsets"] = strings.offsets.tobytes()
+    sections["strings"] = bytes(strings.blob)
+    sections["meta"] = json.dumps({
+        "version": compiled.version,
+        "fingerprint": index.fingerprint if index is not None else None,
+        "search_index": index is not None,
+        "db_fingerprint": db_fingerprint,
+        "created_at": time.time(),
+        "n_rubrics": compiled.n_rubrics,
+        "n_remedies": compiled.n_remedies,
+        "n_relations": compiled.n_relations,
+    }).encode("utf-8")
+
+    # lay out
+    data_start = _HEADER.size + _ENTRY.size * len(sections)
+    data_start += -data_start % _ALIGN
+
+    directory = []
+    payload = bytearray()
+    for name, data in sections.items():
+        assert len(name) <= 24, name
+        payload += b"\0" * (-len(payload) % _ALIGN)
+        directory.append(_ENTRY.pack(name.encode("ascii"), data_start + len(payload), len(data)))
+        payload += data
+
+    digest = hashlib.sha256(payload).digest()
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(sections), digest)
+    head = header + b"".join(directory)
+    head += b"\0" * (data_start - len(head))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(head)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return compiled.version
+
+
+# ---------------------------
+# READ
+# ---------------------------
+
+class RepertorySnapshot:
+    """
+    A mapped snapshot file. Keep it alive as long as anything built
+    from it (compiled repertory, search index) is in use.
+    """
+
+    def __init__(self, path, mm, sections, digest):
+        self.path = path
+        self._mmap = mm
+        self._sections = sections
+        self.checksum = digest.hex()
+        self.meta = json.loads(bytes(self._raw("meta")).decode("utf-8"))
+        # repertory content version (CompiledRepertory.version); computed
+        # on demand for snapshots written before it was stored
+        self.version = self.meta.get("version")
+
+        self._offsets = self.ints("str_offsets")
+        self._strings = self._raw("strings")
+        self._compiled = None
+        self._index = None
+
+    @classmethod
+    def open(cls, path: str = SNAPSHOT_PATH, verify: bool = True):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            view = memoryview(mm)
+            if len(view) < _HEADER.size:
+                raise SnapshotError("truncated header")
+
+            magic, version, n_sections, digest = _HEADER.unpack_from(view, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError("not a repertory snapshot")
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise SnapshotError(f"unsupported snapshot version {version}")
+
+            sections = {}
+            for i in range(n_sections):
+                name, offset, length = _ENTRY.unpack_from(view, _HEADER.size + i * _ENTRY.size)
+                if offset + length > len(view):
+                    raise SnapshotError(f"section {name!r} out of bounds")
+                sections[name.rstrip(b"\0").decode("ascii")] = view[offset:offset + length]
+
+            data_start = _HEADER.size + _ENTRY.size * n_sections
+            data_start += -data_start % _ALIGN
+            if verify and hashlib.sha256(view[data_start:]).digest() != digest:
+                raise SnapshotError("checksum mismatch")
+        except Exception:
+            sections = view = None
+            mm.close()
+            raise
+
+        return cls(path, mm, sections, digest)
+
+    def _raw(self, name):
+        try:
+            return self._sections[name]
+        except KeyError:
+            raise SnapshotError(f"missing section {name!r}")
+
+    def ints(self, name):
+        """Zero-copy int64 view of a section."""
+        return self._raw(name).cast("q")
+
+    def string(self, idx):
+        if idx < 0:
+            return None
+        return str(self._strings[self._offsets[idx]:self._offsets[idx + 1]], "utf-8")
+
+    def compiled(self) -> CompiledRepertory:
+        if self._compiled is not None:
+            return self._compiled
+
+        string = self.string
+        columns = [self.ints(f"rubric_{field}") for field in _RUBRIC_STRING_FIELDS]
+        chapters = {}
+
+        rubrics = []
+        for row, (rid, parent, depth) in enumerate(zip(
+            self.ints("rubric_id"), self.ints("rubric_parent"), self.ints("rubric_depth")
+        )):
+            chapter_idx = columns[0][row]
+            if chapter_idx not in chapters:
+                chapter = string(chapter_idx)
+                chapters[chapter_idx] = sys.intern(chapter) if chapter else chapter
+            rubrics.append(RubricRecord(
+                id=rid,
+                chapter=chapters[chapter_idx],
+                text=string(columns[1][row]),
+                text_en=string(columns[2][row]),
+                full_path=string(columns[3][row]),
+                full_path_en=string(columns[4][row]),
+                parent_id=None if parent < 0 else parent,
+                depth=depth,
+            ))
+
+        self._compiled = CompiledRepertory(
+            rubrics,
+            self.ints("remedy_id"),
+            [sys.intern(string(i) or "") for i in self.ints("remedy_name")],
+            self.ints("indptr"),
+            self.ints("indices"),
+            self.ints("grades"),
+            derived={name: self.ints(name) for name in CompiledRepertory.DERIVED},
+            snapshot=self,
+        )
+        return self._compiled
+
+    @property
+    def db_fingerprint(self) -> Optional[str]:
+        """database_fingerprint() of the database it was built from (None before it was stored)."""
+        return self.meta.get("db_fingerprint")
+
+    @property
+    def has_search_index(self) -> bool:
+        return self.meta.get("search_index", True)
+
+    def search_index(self) -> RubricSearchIndex:
+        if self._index is not None:
+            return self._index
+
+        term_ptr = self.ints("term_ptr")
+        post_rows = self.ints("post_rows")
+        post_tfs = self.ints("post_tfs")
+
+        postings = {}
+        for i, term_idx in enumerate(self.ints("term")):
+            start, end = term_ptr[i], term_ptr[i + 1]
+            postings[self.string(term_idx)] = PostingList(post_rows[start:end], post_tfs[start:end])
+
+        self._index = RubricSearchIndex(self.meta["fingerprint"], postings, self.ints("doc_lengths"))
+        return self._index
+
+
+# ---------------------------
+# PROCESS-WIDE INSTANCE
+# ---------------------------
+
+_snapshot: Optional[RepertorySnapshot] = None
+_lock = threading.Lock()
+_warmups = []
+_warmup_errors = 0
+
+
+def build_snapshot(db: Session, path: str = SNAPSHOT_PATH) -> str:
+    """
+    Compiles the golden tables and writes a fresh snapshot.
+    Used by the golden build. Returns the repertory version.
+    """
+    compiled = build_compiled_repertory(db)
+    return write_snapshot(compiled, RubricSearchIndex.build(compiled), path, database_fingerprint(db))
+
+
+def load_repertory(db: Session, path: str = SNAPSHOT_PATH) -> CompiledRepertory:
+    """
+    Startup entry point: maps the snapshot if there is a valid one built
+    from this database, otherwise compiles from SQL and writes the
+    snapshot for the next process. Installs the compiled repertory and search index as the
+    process-wide instances. The BM25 index is neither built nor loaded
+    when searches go to the database full-text index.
+    """
+    with_index = memory_index_needed(db)
+    fingerprint = database_fingerprint(db)
+
+    snapshot = None
+    if path and os.path.exists(path):
+        try:
+            snapshot = RepertorySnapshot.open(path)
+        except (OSError, ValueError, SnapshotError) as e:
+            print(f"Repertory snapshot warning (rebuilding): {e}")
+        else:
+            if snapshot.db_fingerprint != fingerprint:
+                print(
+                    "Repertory snapshot warning (rebuilding): built from"
+                    f" {snapshot.db_fingerprint}, database is {fingerprint}"
+                )
+                snapshot = None
+
+    if snapshot is None:
+        compiled = build_compiled_repertory(db)
+        index = RubricSearchIndex.build(compiled) if with_index else None
+        if not path:
+            set_compiled_repertory(compiled)
+            if index is not None:
+                set_search_index(index, compiled)
+            return compiled
+        try:
+            write_snapshot(compiled, index, path, fingerprint)
+            snapshot = RepertorySnapshot.open(path)
+        except (OSError, SnapshotError) as e:
+            print(f"Repertory snapshot warning (not persisted): {e}")
+            set_compiled_repertory(compiled)
+            if index is not None:
+                set_search_index(index, compiled)
+            return compiled
+
+    return install_snapshot(snapshot)
+
+
+def get_snapshot() -> Optional[RepertorySnapshot]:
+    return _snapshot
+
+
+def register_warmup(fn):
+    """
+    Registers `fn(compiled)` to build per-repertory state (token matcher,
+    fuzzy vocabulary, ...) before a snapshot is installed, so the first
+    requests on a new version do not pay for it.
+    """
+    _warmups.append(fn)
+    return fn
+
+
+def install_snapshot(snapshot: RepertorySnapshot) -> CompiledRepertory:
+    """
+    Prepares `snapshot` (compiled repertory, search index, warmups) and
+    then makes it the process-wide repertory.
+    """
+    global _snapshot, _warmup_errors
+
+    compiled = snapshot.compiled()
+    # full-text deployments never map the postings
+    index = snapshot.search_index() if snapshot.has_search_index and memory_index_needed() else None
+    for fn in _warmups:
+        try:
+            fn(compiled)
+        except Exception as e:
+            print("REPERTORY WARMUP ERROR:", e)
+            _warmup_errors += 1
+
+    with _lock:
+        _snapshot = snapshot
+        set_compiled_repertory(compiled)
+        if index is not None:
+            set_search_index(index, compiled)
+    return compiled
+
+
+# ---------------------------
+# HOT SWAP
+# ---------------------------
+
+class SnapshotWatcher:
+    """
+    Background thread that installs the snapshot at `path` whenever the
+    file is replaced (new inode / mtime / size) and carries a different
+    repertory version than the one being served. A snapshot built from
+    another database (db_fingerprint mismatch) is refused, like at startup.
+    """
+
+    def __init__(self, interval: float = REPERTORY_WATCH_INTERVAL, session_factory=None):
+        self.interval = interval
+        self.session_factory = session_factory
+        self.path = None
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.swaps = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_swap_at = None
+
+    def start(self, path: str = SNAPSHOT_PATH):
+        if not path or self.interval <= 0 or self._thread is not None:
+            return
+        self.path = path
+        self._signature = self._stat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="repertory-watcher", daemon=True)
+        self._thread.start()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # a failed swap must not stop watching for the next build
+                self._fail(e)
+
+    def _fail(self, error):
+        self.errors += 1
+        self.last_error = str(error)
+        print("REPERTORY SNAPSHOT ERROR:", error)
+
+    def _database_fingerprint(self):
+        db = self.session_factory()
+        try:
+            return database_fingerprint(db)
+        finally:
+            db.close()
+
+    def check(self) -> bool:
+        """
+        Installs the snapshot if it changed since the last check.
+        Returns True when a new version was swapped in.
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+
+        try:
+            snapshot = RepertorySnapshot.open(self.path)
+        except (OSError, ValueError, KeyError, SnapshotError) as e:
+            # a half-copied file is retried once its signature changes again
+            self._fail(e)
+            return False
+
+        current = _snapshot
+        if current is not None and current.version and current.version == snapshot.version:
+            return False
+
+        if self.session_factory is not None:
+            fingerprint = self._database_fingerprint()
+            if snapshot.db_fingerprint != fingerprint:
+                self._fail(SnapshotError(
+                    f"not swapping in {snapshot.version}: built from {snapshot.db_fingerprint},"
+                    f" database is {fingerprint}"
+                ))
+                return False
+
+        started = time.perf_counter()
+        install_snapshot(snapshot)
+        self.swaps += 1
+        self.last_swap_at = time.time()
+        print(
+            f"Repertory swapped to {snapshot.version}"
+            f" (was {current.version if current else 'none'},"
+            f" prepared in {time.perf_counter() - started:.2f}s)"
+        )
+        return True
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": _snapshot.version if _snapshot else None,
+            "interval": self.interval,
+            "running": self._thread is not None,
+            "swaps": self.swaps,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_swap_at": self.last_swap_at,
+        }
+
+
+snapshot_watcher = SnapshotWatcher(session_factory=SessionLocal)
+
+
+def _watcher_metrics():
+    yield "reperto_snapshot_swaps_total", "counter", "Rebuilt snapshots hot-swapped in.", {}, snapshot_watcher.swaps
+    yield (
+        "reperto_snapshot_swap_errors_total", "counter",
+        "Snapshot swaps refused or failed (unreadable file, database mismatch).", {}, snapshot_watcher.errors
+    )
+    yield "reperto_snapshot_warmup_errors_total", "counter", "Per-repertory warmups that raised.", {}, _warmup_errors
+
+
+register_collector(_watcher_metrics)
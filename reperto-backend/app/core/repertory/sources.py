@@ -0,0 +1,77 @@
+"""
+OOREP source adapters for the Golden Repertory build.
+
+The loader only needs four lookups from OOREP. Any object providing
+them can feed `build_golden_repertory`:
+
+- rubrics_by_fullpath(fullpaths)   -> rows with .id .fullpath .mother
+- rubric_ancestry(rubric_ids)      -> the same rows for the rubrics and all their ancestors
+- remedies_for_rubrics(rubric_ids) -> rows with .id .nameabbrev .namelong
+- relations_for_rubrics(rubric_ids)-> rows with .rubricid .remedyid .weight
+
+OorepSqlSource answers them from a live OOREP Postgres session;
+OorepDumpSource (oorep_dump.py) streams them out of a pg_dump file.
+"""
+from sqlalchemy import text
+
+
+class OorepSqlSource:
+
+    def __init__(self, oorep_db):
+        self.db = oorep_db
+
+    def rubrics_by_fullpath(self, fullpaths):
+        query = text("""
+            SELECT id, fullpath, mother
+            FROM rubric
+            WHERE fullpath = ANY(:fps)
+        """)
+        return self.db.execute(query, {"fps": list(fullpaths)}).fetchall()
+
+    def rubric_ancestry(self, rubric_ids):
+        # every starting rubric plus all its ancestors, in one round trip;
+        # UNION (not UNION ALL) also stops the walk on a cycle
+        query = text("""
+            WITH RECURSIVE ancestry(id) AS (
+                SELECT id FROM rubric WHERE id = ANY(:rids)
+                UNION
+                SELECT r.mother
+                FROM rubric r
+                JOIN ancestry a ON r.id = a.id
+                WHERE r.mother IS NOT NULL
+            )
+            SELECT r.id, r.fullpath, r.mother
+            FROM rubric r
+            JOIN ancestry a ON r.id = a.id
+        """)
+        return self.db.execute(query, {"rids": list(rubric_ids)}).fetchall()
+
+    def remedies_for_rubrics(self, rubric_ids):
+        query = text("""
+            SELECT id, nameabbrev, namelong
+            FROM remedy
+            WHERE id IN (
+                SELECT DISTINCT remedyid
+                FROM rubricremedy
+                WHERE rubricid = ANY(:rids)
+            )
+        """)
+        return self.db.execute(query, {"rids": list(rubric_ids)}).fetchall()
+
+    def relations_for_rubrics(self, rubric_ids):
+        query = text("""
+            SELECT rubricid, remedyid, weight
+            FROM rubricremedy
+            WHERE rubricid = ANY(:rids)
+        """)
+        return self.db.execute(query, {"rids": list(rubric_ids)}).fetchall()
+
+
+def as_source(oorep):
+    """
+    Accepts either a source adapter or a plain OOREP DB session
+    (the historical `oorep_db` argument) and returns an adapter.
+    """
+    if hasattr(oorep, "rubric_ancestry"):
+        return oorep
+    return OorepSqlSource(oorep)
@@ -5,11 +5,11 @@ import os
 # Add the current directory to path so we can import app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from app.database import engine, Base
 # Import all models to register them
 from app.models import User, Case
-from app.core.repertory.models import GoldenRubric, GoldenRemedy, GoldenRubricRemedy
+from app.core.repertory.models import GoldenRubric, GoldenRemedy, GoldenRubricRemedy, GoldenRubricClosure, GoldenBuildManifest
 
 def create():
     if engine is None:
@@ -33,6 +33,16 @@ def create():
         """))
         conn.commit()
 
+    # Bring older databases up to date: cases.owner + (owner, created_at) index
+    columns = {c["name"] for c in inspect(engine).get_columns("cases")}
+    with engine.connect() as conn:
+        if "owner" not in columns:
+            conn.execute(text("ALTER TABLE cases ADD COLUMN owner VARCHAR"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_cases_owner_created_at ON cases (owner, created_at)"
+        ))
+        conn.commit()
+
     print("✅ Tables created successfully in SQLite (reperto_db.sqlite)")
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+# backend/app/hashing.py
+"""
+Password hashing off the event loop.
+
+argon2 hash/verify is deliberately slow and CPU/memory heavy. Running it
+inline in an `async def` handler stalls every other request on the
+worker, so it runs on a dedicated, size-bounded thread pool instead
+(argon2-cffi releases the GIL while hashing).
+
+Backpressure: at most HASH_WORKERS jobs run and HASH_MAX_QUEUE wait;
+beyond that HashingOverloaded is raised so the API can answer 503
+instead of queueing logins without bound.
+
+The executor is created on first use, so the pool works again after
+shutdown() (e.g. a second app startup in the same process).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import register_collector
+
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.environ.get("HASH_MAX_QUEUE", "64"))
+
+# Latency samples kept for percentile metrics
+_LATENCY_WINDOW = 2048
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+class HashingPool:
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self._queue_wait = deque(maxlen=_LATENCY_WINDOW)
+        self._run_time = deque(maxlen=_LATENCY_WINDOW)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+            return self._executor
+
+    def _timed(self, submitted_at, fn, args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._queue_wait.append(started - submitted_at)
+                self._run_time.append(finished - started)
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingOverloaded("Password hashing queue is full")
+            self._pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool(), self._timed, time.perf_counter(), fn, args
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        def pct(samples, p):
+            if not samples:
+                return 0.0
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+        with self._lock:
+            queue_wait = list(self._queue_wait)
+            run_time = list(self._run_time)
+
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_ms_p50": pct(queue_wait, 0.50),
+            "queue_wait_ms_p99": pct(queue_wait, 0.99),
+            "hash_ms_p50": pct(run_time, 0.50),
+            "hash_ms_p99": pct(run_time, 0.99),
+        }
+
+
+hashing_pool = HashingPool(HASH_WORKERS, HASH_MAX_QUEUE)
+
+
+def _pool_metrics():
+    stats = hashing_pool.stats()
+    yield "reperto_hash_pending", "gauge", "Password hash jobs running or queued.", {}, stats["pending"]
+    yield "reperto_hash_completed_total", "counter", "Password hash jobs completed.", {}, stats["completed"]
+    yield "reperto_hash_rejected_total", "counter", "Password hash jobs rejected (queue full, 503).", {}, stats["rejected"]
+    for q, quantile in (("p50", "0.5"), ("p99", "0.99")):
+        labels = {"quantile": quantile}
+        yield (
+            "reperto_hash_queue_wait_ms", "gauge", "Password hash queue wait over the recent window.",
+            labels, stats[f"queue_wait_ms_{q}"]
+        )
+        yield (
+            "reperto_hash_duration_ms", "gauge", "Password hash/verify time over the recent window.",
+            labels, stats[f"hash_ms_{q}"]
+        )
+
+
+register_collector(_pool_metrics)
@@ -0,0 +1,188 @@
+# backend/app/llm.py
+"""
+Shared async OpenAI engine.
+
+All LLM traffic goes through one AsyncOpenAI client that runs on its own
+event loop in a background thread, so it can be used from both async
+handlers (`await engine.chat(...)`) and sync code running in FastAPI's
+threadpool (`engine.chat_sync(...)`) without blocking an event loop and
+without binding the HTTP pool to any one request's loop.
+
+- keep-alive HTTP connections, bounded by OPENAI_MAX_CONNECTIONS
+- at most OPENAI_MAX_CONCURRENCY calls in flight (global semaphore)
+- every call has a hard deadline of OPENAI_TIMEOUT seconds, time spent
+  queued for the semaphore included
+- OPENAI_BASE_URL points it at a local fake server for tests/benchmarks
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+from app.metrics import register_collector
+
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "20"))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "1"))
+
+
+class LLMEngine:
+
+    def __init__(
+        self,
+        timeout: float = OPENAI_TIMEOUT,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        max_connections: int = OPENAI_MAX_CONNECTIONS,
+    ):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    # ---------------------------
+    # LIFECYCLE
+    # ---------------------------
+
+    def start(self):
+        """
+        Starts the loop thread and client now instead of on the first call
+        (startup warmup). Raises ImportError if the openai SDK is missing.
+        """
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+
+        with self._start_lock:
+            if self._loop is not None:
+                return
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-engine", daemon=True)
+            thread.start()
+
+            async def setup():
+                # imported lazily: the SDK is heavy and only needed once a call is made
+                import httpx
+                from openai import AsyncOpenAI
+
+                http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                    timeout=httpx.Timeout(self.timeout),
+                )
+                self._client = AsyncOpenAI(
+                    api_key=os.environ.get("OPENAI_API_KEY"),
+                    base_url=os.environ.get("OPENAI_BASE_URL") or None,
+                    http_client=http_client,
+                    max_retries=OPENAI_MAX_RETRIES,
+                )
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            try:
+                asyncio.run_coroutine_threadsafe(setup(), loop).result()
+            except Exception:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise
+
+            self._thread = thread
+            self._loop = loop
+
+    def close(self):
+        with self._start_lock:
+            loop = self._loop
+            if loop is None:
+                return
+
+            async def teardown():
+                await self._client.close()
+
+            try:
+                asyncio.run_coroutine_threadsafe(teardown(), loop).result(timeout=5)
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+                self._thread.join(timeout=5)
+                loop.close()
+                self._loop = None
+                self._thread = None
+                self._client = None
+
+    # ---------------------------
+    # CALLS
+    # ---------------------------
+
+    async def _call(self, kwargs):
+        async with self._semaphore:
+            self.calls += 1
+            try:
+                return await self._client.chat.completions.create(**kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+
+    async def _chat(self, kwargs):
+        # the deadline covers waiting for a slot too, so a saturated
+        # engine fails fast instead of queueing callers without bound
+        try:
+            return await asyncio.wait_for(self._call(kwargs), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def submit(self, **kwargs):
+        """
+        Schedules a chat completion on the engine loop.
+        Returns a concurrent.futures.Future.
+        """
+        self._ensure_started()
+        kwargs.setdefault("model", OPENAI_MODEL)
+        return asyncio.run_coroutine_threadsafe(self._chat(kwargs), self._loop)
+
+    async def chat(self, **kwargs):
+        return await asyncio.wrap_future(self.submit(**kwargs))
+
+    def chat_sync(self, **kwargs):
+        future = self.submit(**kwargs)
+        try:
+            # backstop in case the engine loop itself is stuck
+            return future.result(timeout=self.timeout + 1)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+engine = LLMEngine()
+
+
+def _engine_metrics():
+    stats = engine.stats()
+    yield "reperto_llm_calls_total", "counter", "Chat completions sent to the LLM.", {}, stats["calls"]
+    yield "reperto_llm_timeouts_total", "counter", "LLM calls that hit OPENAI_TIMEOUT.", {}, stats["timeouts"]
+    yield "reperto_llm_errors_total", "counter", "LLM calls that failed.", {}, stats["errors"]
+
+
+register_collector(_engine_metrics)
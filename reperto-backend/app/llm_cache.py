@@ -0,0 +1,341 @@
+# backend/app/llm_cache.py
+"""
+Content-addressed cache for LLM responses.
+
+Key = sha256(model, prompt template version, normalized input), so the
+same case notes / rubric + remedy combination never pays for a second
+OpenAI round-trip, and bumping a template version naturally invalidates
+everything produced by the old prompt.
+
+Two tiers:
+- memory: TTLCache (LRU by entry count)
+- disk:   SQLite file at LLM_CACHE_PATH (empty disables it), evicted
+          least-recently-used once its payload exceeds LLM_CACHE_MAX_BYTES;
+          survives restarts and is shared between workers on the host
+
+Both tiers expire entries LLM_CACHE_TTL seconds after they were written.
+The disk tier is blocking I/O: async callers use aget/aset, which run it
+on a worker thread instead of the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from .cache import TTLCache
+from .metrics import register_cache, register_collector
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") not in ("0", "false", "no")
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(BASE_DIR, "data", "llm_cache.sqlite"))
+LLM_CACHE_MEMORY_SIZE = int(os.environ.get("LLM_CACHE_MEMORY_SIZE", "2048"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Evict down to this fraction of the budget so we don't evict on every write
+_EVICT_TARGET = 0.9
+# Disk hits refresh accessed_at (the LRU order) in batches, not one write per read
+_TOUCH_BATCH = 64
+_TOUCH_INTERVAL = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    template TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at);
+
+-- payload total, shared by every worker on the file (SUM(size) is a full scan)
+CREATE TABLE IF NOT EXISTS llm_cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO llm_cache_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM llm_cache;
+CREATE TRIGGER IF NOT EXISTS tr_llm_cache_insert AFTER INSERT ON llm_cache BEGIN
+    UPDATE llm_cache_size SET bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_llm_cache_delete AFTER DELETE ON llm_cache BEGIN
+    UPDATE llm_cache_size SET bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_llm_cache_update AFTER UPDATE OF size ON llm_cache BEGIN
+    UPDATE llm_cache_size SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt_text(text: str) -> str:
+    """Case and whitespace differences must not produce distinct keys."""
+    return _WS_RE.sub(" ", (text or "").strip().lower())
+
+
+def make_key(model: str, template: str, payload) -> str:
+    blob = json.dumps(
+        {"model": model, "template": template, "input": payload},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+
+    def __init__(
+        self,
+        path: str | None = LLM_CACHE_PATH,
+        memory_size: int = LLM_CACHE_MEMORY_SIZE,
+        ttl: float = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl, name="llm")
+
+        self._conn = None
+        self._lock = threading.Lock()
+        # last total seen in llm_cache_size (all workers' writes)
+        self._disk_bytes = 0
+        # key -> last disk hit not yet written to accessed_at
+        self._touched = {}
+        self._touched_since = time.monotonic()
+
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_evictions = 0
+        self.disk_read_errors = 0
+        self.disk_write_errors = 0
+        self.misses = 0
+
+    # ---------------------------
+    # DISK TIER
+    # ---------------------------
+
+    def _disk(self):
+        if self._conn is None and self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._disk_bytes = conn.execute("SELECT bytes FROM llm_cache_size").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key):
+        with self._lock:
+            try:
+                conn = self._disk()
+                if conn is None:
+                    return None
+                row = conn.execute(
+                    "SELECT value FROM llm_cache WHERE key = ? AND created_at >= ?",
+                    (key, time.time() - self.ttl)
+                ).fetchone()
+                if row is None:
+                    self.disk_misses += 1
+                    return None
+                self.disk_hits += 1
+                self._touched[key] = time.time()
+                if len(self._touched) >= _TOUCH_BATCH or time.monotonic() - self._touched_since >= _TOUCH_INTERVAL:
+                    self._flush_touched(conn)
+                return row[0]
+            except sqlite3.Error as e:
+                print("LLM CACHE READ ERROR:", e)
+                self.disk_read_errors += 1
+                return None
+
+    def _flush_touched(self, conn):
+        """Writes the pending accessed_at updates in one transaction."""
+        touched = [(at, key) for key, at in self._touched.items()]
+        self._touched.clear()
+        self._touched_since = time.monotonic()
+        if touched:
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("UPDATE llm_cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?", touched)
+
+    def _disk_set(self, key, template, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._disk()
+                if conn is None:
+                    return
+                conn.execute(
+                    # an upsert, not OR REPLACE: its implicit delete would skip the size trigger
+                    "INSERT INTO llm_cache (key, template, value, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET template = excluded.template, value = excluded.value, "
+                    "size = excluded.size, created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                    (key, template, value, size, now, now)
+                )
+                self._disk_bytes = conn.execute("SELECT bytes FROM llm_cache_size").fetchone()[0]
+                if self._disk_bytes > self.max_bytes:
+                    self._evict(conn)
+            except sqlite3.Error as e:
+                print("LLM CACHE WRITE ERROR:", e)
+                self.disk_write_errors += 1
+
+    def _evict(self, conn):
+        # the LRU order must include this worker's recent hits
+        self._flush_touched(conn)
+
+        # one write transaction; `with conn` rolls it back if any step
+        # fails (e.g. SQLITE_BUSY), so the shared connection never stays
+        # inside an open transaction
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # expired entries go first, whatever their last access
+            expired = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            evicted = expired.rowcount
+
+            # recount rather than trust the running total (e.g. a file
+            # written by an older version without the triggers)
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+            target = int(self.max_bytes * _EVICT_TARGET)
+            victims = []
+            freed = 0
+            if total > target:
+                for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+                    if total - freed <= target:
+                        break
+                    victims.append((key,))
+                    freed += size
+                conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+
+            # the triggers moved the stored total by the deletes; set it to
+            # the recount so any earlier drift is repaired as well
+            conn.execute("UPDATE llm_cache_size SET bytes = ? WHERE id = 0", (total - freed,))
+
+        self._disk_bytes = total - freed
+        self.disk_evictions += evicted + len(victims)
+
+    # ---------------------------
+    # PUBLIC
+    # ---------------------------
+
+    def get(self, key):
+        """
+        Returns a fresh copy of the cached JSON value, or None.
+        """
+        if not self.enabled:
+            return None
+
+        raw = self.memory.get(key)
+        if raw is None:
+            raw = self._disk_get(key)
+            if raw is None:
+                self.misses += 1
+                return None
+            self.memory.set(key, raw)
+        return json.loads(raw)
+
+    def set(self, key, template, value):
+        if not self.enabled:
+            return
+        raw = json.dumps(value, ensure_ascii=False)
+        self.memory.set(key, raw)
+        self._disk_set(key, template, raw)
+
+    async def aget(self, key):
+        """get() for async callers: the disk tier runs on a worker thread."""
+        if not self.enabled:
+            return None
+
+        raw = self.memory.get(key)
+        if raw is None:
+            raw = await asyncio.to_thread(self._disk_get, key)
+            if raw is None:
+                self.misses += 1
+                return None
+            self.memory.set(key, raw)
+        return json.loads(raw)
+
+    async def aset(self, key, template, value):
+        """set() for async callers: the disk tier runs on a worker thread."""
+        if not self.enabled:
+            return
+        raw = json.dumps(value, ensure_ascii=False)
+        self.memory.set(key, raw)
+        await asyncio.to_thread(self._disk_set, key, template, raw)
+
+    def open(self):
+        """
+        Opens the disk tier ahead of the first lookup (startup warmup).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._disk()
+
+    def clear(self):
+        self.memory.clear()
+        with self._lock:
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM llm_cache")
+                self._disk_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._flush_touched(self._conn)
+                except sqlite3.Error as e:
+                    print("LLM CACHE WRITE ERROR:", e)
+                    self.disk_write_errors += 1
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.disk_hits
+        total = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory": memory,
+            "disk": {
+                "path": self.path,
+                "bytes": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "evictions": self.disk_evictions,
+                "read_errors": self.disk_read_errors,
+                "write_errors": self.disk_write_errors,
+            },
+            "hits": hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+llm_cache = LLMResponseCache(path=LLM_CACHE_PATH or None, enabled=LLM_CACHE_ENABLED)
+register_cache("llm", llm_cache.stats)
+register_cache("llm_disk", lambda: llm_cache.stats()["disk"])
+
+
+def _disk_metrics():
+    for op, count in (("read", llm_cache.disk_read_errors), ("write", llm_cache.disk_write_errors)):
+        yield "reperto_llm_cache_disk_errors_total", "counter", "LLM cache disk-tier errors.", {"op": op}, count
+
+
+register_collector(_disk_metrics)
@@ -1,13 +1,19 @@
 # backend/app/main.py
 from app.database import SessionLocal
-from app.core.cdss.case_analyzer import analyze_case
-from app.core.repertory.repository import get_rubric_by_fullpath
-from app.core.repertory.scoring import score_remedies
+from app.core.cdss.case_analyzer import analyze_case, prepare_case, stream_case_analysis
+from app.core.repertory.scoring import score_remedies, get_strategy, DEFAULT_STRATEGY
 from app.core.cdss.explanation import build_explanations
+from app.core.repertory.compiled import pinned_repertory
+from app.core.repertory.snapshot import snapshot_watcher
+from app.core.repertory.batch import score_batch, shutdown_batch_pool
+from app.core.nlp.dataset_writer import phrase_writer
 import os
 import uuid
-from fastapi import FastAPI, HTTPException, Depends, Header
+import base64
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from typing import List, Optional
 
 from dotenv import load_dotenv
@@ -15,6 +21,18 @@ load_dotenv()
 
 from .database import SessionLocal
 from .models import User, Case
+from .schemas import (
+    UserCreate, UserLogin, UserResponse, Token, CaseCreate, CaseResponse, CasePage,
+    AnalyzeRequest, ScoreRequest, BatchScoreRequest
+)
+from .auth import create_user, authenticate_user, get_principal, decode_access_token
+from .hashing import HashingOverloaded, hashing_pool
+from .ai import parse_text_endpoint
+from .llm import engine as llm_engine
+from .llm_cache import llm_cache
+from .startup import startup_state, start_warmup
+from .metrics import MetricsMiddleware, stage, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import Session
 import json
 
@@ -29,6 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms + Server-Timing of the pipeline stages
+app.add_middleware(MetricsMiddleware)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -36,40 +57,70 @@ def get_db():
     finally:
         db.close()
 
-async def get_current_user(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def get_current_user(authorization: str = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     token = authorization.split(" ")[1]
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        user = db.query(User).filter(User.email == email).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return {"name": user.name, "email": user.email}
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    email = payload.get("sub")
+    user = get_principal(email) if email else None
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
 @app.on_event("startup")
 async def startup():
     # We no longer need database.connect() since we use SQLAlchemy engine directly
-    pass
+    # Warm the repertory (snapshot or compiled once), indexes and caches off
+    # the event loop; /health/ready flips when done. Rebuilt snapshots are
+    # then swapped in without a restart.
+    start_warmup(on_ready=snapshot_watcher.start)
 
 @app.on_event("shutdown")
 async def shutdown():
-    pass
+    snapshot_watcher.close()
+    shutdown_batch_pool()
+    hashing_pool.shutdown()
+    llm_engine.close()
+    llm_cache.close()
+    phrase_writer.close()
+
+@app.get("/health/live")
+async def health_live():
+    # the process is up and serving; no dependency checks
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    if not startup_state.ready:
+        return JSONResponse(status_code=503, content=startup_state.stats())
+    return startup_state.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus scrape target (this process only)
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 @app.post("/auth/signup", response_model=dict)
 async def signup(payload: UserCreate, db: Session = Depends(get_db)):
-    success = create_user(db, payload.name, payload.email, payload.password)
+    try:
+        success = await create_user(db, payload.name, payload.email, payload.password)
+    except HashingOverloaded:
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
     if not success:
         raise HTTPException(status_code=400, detail="User already exists")
     return {"status":"ok"}
 
 @app.post("/auth/login", response_model=Token)
 async def login(payload: UserLogin, db: Session = Depends(get_db)):
-    auth_data = authenticate_user(db, payload.email, payload.password)
+    try:
+        auth_data = await authenticate_user(db, payload.email, payload.password)
+    except HashingOverloaded:
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
     if not auth_data:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return auth_data
@@ -78,24 +129,93 @@ async def login(payload: UserLogin, db: Session = Depends(get_db)):
 async def get_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
-@app.get("/cases", response_model=List[CaseResponse])
-async def get_cases(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    cases = db.query(Case).order_by(Case.created_at.desc()).all()
-    # Convert string JSON back to lists/dicts for response
-    result = []
-    for c in cases:
-        case_dict = {
-            "id": c.id,
-            "name": c.name,
-            "initials": c.initials,
-            "specialty": c.specialty,
-            "time": c.time,
-            "summary": c.summary,
-            "rubrics": json.loads(c.rubrics) if c.rubrics else [],
-            "remedies": json.loads(c.remedies) if c.remedies else []
-        }
-        result.append(case_dict)
-    return result
+def _encode_cursor(created_at: datetime, case_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), case_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, case_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), case_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _case_to_dict(c: Case):
+    return {
+        "id": c.id,
+        "name": c.name,
+        "initials": c.initials,
+        "specialty": c.specialty,
+        "time": c.time,
+        "summary": c.summary,
+        "rubrics": json.loads(c.rubrics) if c.rubrics else [],
+        "remedies": json.loads(c.remedies) if c.remedies else []
+    }
+
+@app.get("/cases", response_model=CasePage)
+async def get_cases(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    The caller's cases, newest first, keyset-paginated on (created_at, id).
+    List items are a light projection; JSON blobs are only decoded by
+    GET /cases/{case_id}. `q` keeps cases whose name or specialty contains
+    it (case-insensitive); pass the same `q` with the cursor.
+    """
+    query = (
+        db.query(Case.id, Case.name, Case.initials, Case.specialty, Case.time, Case.created_at)
+        .filter(Case.owner == current_user["email"])
+    )
+
+    if q and q.strip():
+        pattern = "%" + q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.filter(or_(
+            Case.name.ilike(pattern, escape="\\"),
+            Case.specialty.ilike(pattern, escape="\\")
+        ))
+
+    if cursor:
+        created_at, case_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Case.created_at < created_at,
+            and_(Case.created_at == created_at, Case.id < case_id)
+        ))
+
+    rows = query.order_by(Case.created_at.desc(), Case.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "name": r.name,
+                "initials": r.initials,
+                "specialty": r.specialty,
+                "time": r.time
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
+@app.get("/cases/{case_id}", response_model=CaseResponse)
+async def get_case(case_id: str, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    case = (
+        db.query(Case)
+        .filter(Case.id == case_id, Case.owner == current_user["email"])
+        .first()
+    )
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return _case_to_dict(case)
 
 @app.post("/cases", response_model=CaseResponse)
 async def create_case(payload: CaseCreate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -108,7 +228,8 @@ async def create_case(payload: CaseCreate, current_user: dict = Depends(get_curr
         time=payload.time,
         summary=payload.summary,
         rubrics=json.dumps(payload.rubrics) if payload.rubrics else "[]",
-        remedies=json.dumps(payload.remedies) if payload.remedies else "[]"
+        remedies=json.dumps(payload.remedies) if payload.remedies else "[]",
+        owner=current_user["email"]
     )
     db.add(new_case)
     db.commit()
@@ -131,51 +252,165 @@ async def parse_text(body: dict, current_user: dict = Depends(get_current_user))
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
 
-    return parse_text_endpoint(text)
+    return await parse_text_endpoint(text)
 
 @app.post("/cdss/analyze")
 def cdss_analyze(
-    body: dict,
+    body: AnalyzeRequest,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    text = body.get("text", "").strip()
+    text = body.text.strip()
+    strategy = body.strategy or DEFAULT_STRATEGY
 
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
 
-    result = analyze_case(db, text)
+    try:
+        get_strategy(strategy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with pinned_repertory(db) as compiled:
+        result = analyze_case(
+            db,
+            text,
+            strategy=strategy,
+            include_subrubrics=body.include_subrubrics
+        )
 
     return {
         "user": current_user,
         "input": text,
+        "repertory_version": compiled.version,
         "result": result
     }
 
+@app.post("/cdss/analyze/stream")
+def cdss_analyze_stream(
+    body: AnalyzeRequest,
+    accept: str = Header("application/x-ndjson"),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Same pipeline as /cdss/analyze, streamed: a `result` event with
+    tokens, rubrics and scored remedies as soon as they are computed,
+    then an `insights` event with the summary and per-item rationales,
+    then `done`. NDJSON by default; SSE when `Accept: text/event-stream`.
+    """
+    text = body.text.strip()
+    strategy = body.strategy or DEFAULT_STRATEGY
+
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided")
+
+    try:
+        get_strategy(strategy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # DB work happens here, before the response starts, so the stream only waits on the LLM
+    with pinned_repertory(db) as compiled:
+        prepared = prepare_case(
+            db,
+            text,
+            strategy=strategy,
+            include_subrubrics=body.include_subrubrics
+        )
+
+    sse = "text/event-stream" in (accept or "")
+
+    async def events():
+        async for event, payload in stream_case_analysis(prepared):
+            if sse:
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            else:
+                yield json.dumps({"event": event, "data": payload}) + "\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Repertory-Version": compiled.version
+        }
+    )
+
 @app.post("/cdss/score")
 def cdss_score(
-    body: dict,
+    body: ScoreRequest,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    rubric_paths = body.get("rubrics", [])
-    if not rubric_paths:
-        return {"remedies": []}
+    rubric_paths = body.rubrics
+    strategy = body.strategy or DEFAULT_STRATEGY
+    include_subrubrics = body.include_subrubrics
+
+    try:
+        get_strategy(strategy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with pinned_repertory(db) as compiled:
+        if not rubric_paths:
+            return {"repertory_version": compiled.version, "remedies": []}
 
-    # Fetch rubric objects
-    rubrics = []
-    for path in rubric_paths:
-        r = get_rubric_by_fullpath(db, path)
-        if r:
-            rubrics.append(r)
+        # Fetch rubric objects (from the pinned version, not the live tables)
+        rubrics = []
+        for path in rubric_paths:
+            r = compiled.get_rubric_by_fullpath(path)
+            if r:
+                rubrics.append(r)
 
-    if not rubrics:
-        return {"remedies": []}
+        if not rubrics:
+            return {"repertory_version": compiled.version, "remedies": []}
 
-    # 3. Deterministic repertory scoring
-    raw_scores = score_remedies(db, rubrics)
-    explained_scores = build_explanations(db, raw_scores, rubrics)
+        # 3. Deterministic repertory scoring
+        with stage("repertory_score"):
+            raw_scores = score_remedies(
+                db,
+                rubrics,
+                strategy=strategy,
+                include_subrubrics=include_subrubrics
+            )
+        with stage("build_explanations"):
+            explained_scores = build_explanations(db, raw_scores, rubrics)
 
     return {
+        "strategy": strategy,
+        "repertory_version": compiled.version,
         "remedies": explained_scores[:10]
     }
+
+
+MAX_BATCH_CASES = int(os.getenv("MAX_BATCH_CASES", "10000"))
+
+@app.post("/cdss/score/batch")
+def cdss_score_batch(
+    body: BatchScoreRequest,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Scores many rubric sets in one call.
+    Body: {"cases": [[rubric_path, ...], ...], "top_k": 10}
+    Malformed cases (non-string paths) or top_k outside 1..100 -> 422.
+    """
+    cases = body.cases
+    top_k = body.top_k
+
+    if len(cases) > MAX_BATCH_CASES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CASES} cases per batch")
+    if not cases:
+        return {"results": []}
+
+    with pinned_repertory(db) as compiled:
+        with stage("score_batch"):
+            results = score_batch(compiled, cases, top_k=top_k)
+
+    return {
+        "repertory_version": compiled.version,
+        "results": results
+    }
@@ -0,0 +1,284 @@
+# backend/app/metrics.py
+"""
+Request and pipeline metrics, exposed at /metrics in the Prometheus text
+format (version 0.0.4). Stdlib only, per process: with several uvicorn
+workers each one is scraped (or summed) on its own.
+
+- reperto_http_request_duration_seconds{method,route,status}
+- reperto_stage_duration_seconds{stage}   one per `with stage(name):` block
+  in the CDSS pipeline (normalize, search_rubrics, confidence,
+  store_phrase_mapping, repertory_score, build_explanations, llm, ...)
+- reperto_stage_errors_total{stage}
+- reperto_cache_{hits,misses}_total{cache}, reperto_cache_hit_ratio{cache}
+  for every cache registered with register_cache
+- whatever collectors registered with register_collector report: the
+  LLM engine (reperto_llm_*), the auth hashing pool (reperto_hash_*: queue
+  depth, rejections, queue wait and hash time p50/p99), the phrase writer,
+  the LLM cache disk tier, the search index and the snapshot watcher
+
+The stages a request ran are also returned in a Server-Timing header
+(`normalize;dur=1.2, search_rubrics;dur=3.4, ..., total;dur=21.0`, in ms).
+Stages that run after the headers are sent (the LLM step of a streamed
+analysis) only reach the histograms.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Server-Timing reveals the pipeline layout; switch it off for untrusted clients
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "1") not in ("0", "false", "no")
+
+# seconds; the pipeline stages range from sub-millisecond lookups to LLM calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, count in items:
+            lines.append(f"{self.name}{_labels(self.labels, values)} {_number(count)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((values, list(series)) for values, series in self._series.items())
+        for values, series in items:
+            names = self.labels + ("le",)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(names, values + (_number(float(bound)),))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(names, values + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_number(round(series[-2], 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+http_request_seconds = Histogram(
+    "reperto_http_request_duration_seconds", "HTTP request latency.",
+    labels=("method", "route", "status"), buckets=HTTP_BUCKETS
+)
+stage_seconds = Histogram(
+    "reperto_stage_duration_seconds", "Time spent in each CDSS pipeline stage.", labels=("stage",)
+)
+stage_errors = Counter(
+    "reperto_stage_errors_total", "Pipeline stages that raised.", labels=("stage",)
+)
+
+
+# ---------------------------
+# COLLECTORS
+# ---------------------------
+
+_caches = {}
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def register_cache(name: str, stats):
+    """
+    `stats()` returns a mapping with "hits" and "misses" (TTLCache.stats(),
+    lru_cache's cache_info()._asdict(), ...) or None while the cache does
+    not exist yet. Registering a name again replaces it.
+    """
+    with _registry_lock:
+        _caches[name] = stats
+
+
+def register_collector(fn):
+    """
+    `fn()` yields (name, type, help, {label: value}, value) samples,
+    rendered at scrape time (e.g. a component's stats() counters).
+    """
+    with _registry_lock:
+        _collectors.append(fn)
+
+
+def _cache_lines():
+    with _registry_lock:
+        caches = sorted(_caches.items())
+
+    hits, misses, ratios = [], [], []
+    for name, stats in caches:
+        try:
+            s = stats()
+        except Exception as e:
+            print("METRICS ERROR:", name, e)
+            continue
+        if not s:
+            continue
+        total = s["hits"] + s["misses"]
+        label = _labels(("cache",), (name,))
+        hits.append(f"reperto_cache_hits_total{label} {s['hits']}")
+        misses.append(f"reperto_cache_misses_total{label} {s['misses']}")
+        ratios.append(f"reperto_cache_hit_ratio{label} {_number(round(s['hits'] / total, 4) if total else 0.0)}")
+
+    return [
+        "# HELP reperto_cache_hits_total Cache lookups answered from the cache.",
+        "# TYPE reperto_cache_hits_total counter", *hits,
+        "# HELP reperto_cache_misses_total Cache lookups that missed.",
+        "# TYPE reperto_cache_misses_total counter", *misses,
+        "# HELP reperto_cache_hit_ratio Hits / lookups since process start.",
+        "# TYPE reperto_cache_hit_ratio gauge", *ratios,
+    ]
+
+
+def _collector_lines():
+    with _registry_lock:
+        collectors = list(_collectors)
+
+    families = {}
+    for fn in collectors:
+        try:
+            for name, kind, help, labels, value in fn():
+                family = families.setdefault(name, (kind, help, []))
+                family[2].append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        except Exception as e:
+            print("METRICS ERROR:", e)
+
+    lines = []
+    for name, (kind, help, samples) in families.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", *samples]
+    return lines
+
+
+def render() -> str:
+    lines = http_request_seconds.render() + stage_seconds.render() + stage_errors.render()
+    lines += _cache_lines()
+    lines += _collector_lines()
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# STAGES / SERVER-TIMING
+# ---------------------------
+
+# [(stage, seconds), ...] of the current request; shared with the
+# threadpool (contexts are copied, the list is the same object)
+_request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Times a pipeline stage into the histograms and the request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(timings, total=None) -> str:
+    """`name;dur=ms` per stage (repeated stages summed, first-seen order)."""
+    merged = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    if total is not None:
+        merged["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items())
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (works with streaming responses): collects the
+    request's stage timings, adds the Server-Timing header and records the
+    request in reperto_http_request_duration_seconds by route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    value = server_timing(timings, time.perf_counter() - started)
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # templates, not raw paths, keep the label set bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], route, str(status))
@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, Integer, String, Text, DateTime
+from datetime import datetime, timezone
+from sqlalchemy import Table, Column, Integer, String, Text, DateTime, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -19,4 +20,14 @@ class Case(Base):
     summary = Column(Text, nullable=True)
     rubrics = Column(Text, nullable=True) # JSON string
     remedies = Column(Text, nullable=True) # JSON string
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    owner = Column(String, nullable=True) # User.email of the creator
+    # Python-side default keeps sub-second precision for keyset pagination
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        Index("ix_cases_owner_created_at", "owner", "created_at"),
+    )
@@ -1,5 +1,5 @@
 # schemas.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, StrictBool, conint
 from typing import List, Optional
 
 class UserCreate(BaseModel):
@@ -31,3 +31,31 @@ class CaseCreate(BaseModel):
 
 class CaseResponse(CaseCreate):
     id: str
+
+class CaseSummary(BaseModel):
+    id: str
+    name: str
+    initials: Optional[str] = None
+    specialty: Optional[str] = None
+    time: Optional[str] = None
+
+class CasePage(BaseModel):
+    items: List[CaseSummary]
+    next_cursor: Optional[str] = None
+
+class AnalyzeRequest(BaseModel):
+    text: str = ""
+    strategy: Optional[str] = None
+    # strict: "false" or 0 must not silently turn subrubric expansion on
+    include_subrubrics: StrictBool = False
+
+class ScoreRequest(BaseModel):
+    # rubric full paths
+    rubrics: List[str] = []
+    strategy: Optional[str] = None
+    include_subrubrics: StrictBool = False
+
+class BatchScoreRequest(BaseModel):
+    # one list of rubric full paths per case
+    cases: List[List[str]] = []
+    top_k: conint(ge=1, le=100) = 10
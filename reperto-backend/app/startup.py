@@ -0,0 +1,163 @@
+# backend/app/startup.py
+"""
+Startup and readiness.
+
+The process answers /health/live as soon as uvicorn has imported the app
+and run the startup hook. Everything that would make the first requests
+slow runs afterwards, on a warmup thread, before /health/ready flips:
+
+    repertory   map the snapshot (or compile + write it), BM25 search
+                index (memory backend only), token matcher (see
+                snapshot.register_warmup)
+    nlp         fuzzy vocabulary of the repertory, normalizer
+    auth        python-jose, passlib and the argon2 backend
+    llm_cache   open the on-disk LLM response cache
+    llm         OpenAI client + connection pool (only with OPENAI_API_KEY)
+
+A failing required step leaves the replica unready (503 on
+/health/ready) so the load balancer keeps it out of rotation; optional
+steps only record their error.
+"""
+import os
+import threading
+import time
+
+from app.database import SessionLocal
+
+# Run warmup inline in the startup hook instead of on a thread (the
+# process then only answers once it is warm, e.g. for plain `uvicorn`
+# deployments without a readiness probe)
+STARTUP_WARMUP_BLOCKING = os.getenv("STARTUP_WARMUP_BLOCKING", "0") == "1"
+
+
+class StartupState:
+
+    def __init__(self):
+        self.phase = "starting"
+        self.steps = {}
+        self.error = None
+        self.started_at = time.time()
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        """Blocks until warmup has finished (ready or failed)."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def stats(self):
+        return {
+            "phase": self.phase,
+            "ready": self.ready,
+            "error": self.error,
+            "seconds_to_ready": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "steps": self.steps,
+        }
+
+
+startup_state = StartupState()
+
+
+# ---------------------------
+# WARMUP STEPS
+# ---------------------------
+
+def _warm_repertory():
+    from app.core.repertory.snapshot import load_repertory, register_warmup
+    from app.core.nlp.rubric_confidence import get_token_matcher
+    from app.core.nlp.rubric_mapper import warm_rubric_vocabulary
+
+    # also run for every snapshot hot-swapped in later
+    register_warmup(get_token_matcher)
+    register_warmup(warm_rubric_vocabulary)
+
+    db = SessionLocal()
+    try:
+        load_repertory(db)
+    finally:
+        db.close()
+
+
+def _warm_nlp():
+    from app.core.nlp.normalizer import normalize_input
+    from app.core.nlp.rubric_mapper import sync_rubric_vocabulary
+
+    db = SessionLocal()
+    try:
+        sync_rubric_vocabulary(db)
+    finally:
+        db.close()
+    normalize_input("warmup")
+
+
+def _warm_auth():
+    from app.auth import warm_auth
+    warm_auth()
+
+
+def _warm_llm_cache():
+    from app.llm_cache import llm_cache
+    llm_cache.open()
+
+
+def _warm_llm():
+    if not os.getenv("OPENAI_API_KEY"):
+        return
+    from app.llm import engine
+    engine.start()
+
+
+# (name, function, required)
+WARMUP_STEPS = [
+    ("repertory", _warm_repertory, True),
+    ("nlp", _warm_nlp, False),
+    ("auth", _warm_auth, True),
+    ("llm_cache", _warm_llm_cache, False),
+    ("llm", _warm_llm, False),
+]
+
+
+def run_warmup(state: StartupState = startup_state, steps=None, on_ready=None):
+    state.phase = "warming"
+    failed = None
+
+    for name, fn, required in steps or WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            fn()
+            state.steps[name] = {"ms": round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            print(f"WARMUP ERROR ({name}):", e)
+            state.steps[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "error": str(e)}
+            if required and failed is None:
+                failed = f"{name}: {e}"
+
+    if failed is not None:
+        state.phase = "failed"
+        state.error = failed
+    else:
+        if on_ready is not None:
+            on_ready()
+        state.phase = "ready"
+        state.ready_at = time.time()
+        state._ready.set()
+    state._done.set()
+
+
+def start_warmup(state: StartupState = startup_state, on_ready=None):
+    """
+    Called from the startup hook: runs the warmup phase on a background
+    thread (or inline with STARTUP_WARMUP_BLOCKING=1).
+    """
+    if STARTUP_WARMUP_BLOCKING:
+        run_warmup(state, on_ready=on_ready)
+        return
+    threading.Thread(
+        target=run_warmup, kwargs={"state": state, "on_ready": on_ready},
+        name="startup-warmup", daemon=True
+    ).start()
@@ -0,0 +1,110 @@
+"""
+Login latency under concurrent load.
+
+Fires bursts of concurrent /auth/login requests at the app in-process
+(no network) while a probe keeps calling /auth/me, and reports p50/p95/p99
+for both. Run with --inline to hash on the event loop (the old behaviour)
+for comparison.
+
+    python -m benchmarks.bench_login --concurrency 32 --requests 256
+    python -m benchmarks.bench_login --concurrency 32 --requests 256 --inline
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(prefix="reperto-bench-"), "bench.sqlite")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+
+def report(name, samples):
+    print(
+        f"{name:<12} n={len(samples):<5} "
+        f"p50={percentile(samples, 0.50):8.1f}ms "
+        f"p95={percentile(samples, 0.95):8.1f}ms "
+        f"p99={percentile(samples, 0.99):8.1f}ms"
+    )
+
+
+async def run(concurrency, total, inline):
+    import httpx
+    from app.create_tables import create
+    from app.main import app
+    from app.hashing import hashing_pool
+
+    create()
+
+    if inline:
+        async def run_inline(fn, *args):
+            return fn(*args)
+        hashing_pool.run = run_inline
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        creds = {"email": "bench@example.com", "password": "bench-password"}
+        await client.post("/auth/signup", json={"name": "Bench", **creds})
+        token = (await client.post("/auth/login", json=creds)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        login_times = []
+        probe_times = []
+        errors = 0
+        done = asyncio.Event()
+        sem = asyncio.Semaphore(concurrency)
+
+        async def login():
+            nonlocal errors
+            async with sem:
+                t = time.perf_counter()
+                r = await client.post("/auth/login", json=creds)
+                login_times.append(time.perf_counter() - t)
+                if r.status_code != 200:
+                    errors += 1
+
+        async def probe():
+            while not done.is_set():
+                t = time.perf_counter()
+                await client.get("/auth/me", headers=headers)
+                probe_times.append(time.perf_counter() - t)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    print(f"mode={'inline' if inline else 'pool'} concurrency={concurrency} "
+          f"logins={total} errors={errors} throughput={total / elapsed:.1f}/s")
+    report("login", login_times)
+    report("/auth/me", probe_times)
+    if not inline:
+        print("pool:", hashing_pool.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop (old behaviour)")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.concurrency, args.requests, args.inline))
+
+
+if __name__ == "__main__":
+    main()
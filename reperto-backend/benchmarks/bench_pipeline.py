@@ -0,0 +1,320 @@
+"""
+CDSS pipeline benchmarks on a synthetic repertory.
+
+For each size preset (see benchmarks/synthetic.py) --processes fresh
+interpreters each build a seeded synthetic golden repertory in a
+temporary SQLite DB, compile it, and time, per call:
+
+    normalize_input       doctor text -> canonical tokens
+    search_rubrics        BM25 rubric search (in-memory index)
+    map_text_to_rubrics   text -> ranked rubric candidates
+    repertory_score       5 rubrics, default strategy
+    build_explanations    explanations for the scored remedies
+    analyze_case          the whole pipeline, LLM stubbed out
+
+The LLM is replaced by a stub returning canned JSON (optionally after
+--llm-latency ms), and the LLM response cache is disabled, so
+analyze_case measures our own work.
+
+    python -m benchmarks.bench_pipeline --sizes 1k,10k
+    python -m benchmarks.bench_pipeline --sizes 1k,10k --save benchmarks/baselines/pipeline.json
+    python -m benchmarks.bench_pipeline --sizes 1k,10k --compare benchmarks/baselines/pipeline.json
+
+With --compare the run fails (exit 1) when a benchmark's best round
+median (over all rounds of all processes) is more than --tolerance
+slower than the baseline, and by more than --min-delta ms, so
+sub-microsecond noise never fails a run. Baseline times are first
+scaled by a calibration workload timed in the same processes, so
+baselines stay usable across machines. Timings vary far more between
+processes than within one, hence several processes per size.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.synthetic import PRESETS  # noqa: E402
+
+BENCHMARKS = (
+    "normalize_input", "search_rubrics", "map_text_to_rubrics",
+    "repertory_score", "build_explanations", "analyze_case",
+)
+
+
+def summarize(rounds):
+    ordered = sorted(s for samples in rounds for s in samples)
+    return {
+        "n": len(ordered),
+        # fastest round's median: what --compare checks, the least
+        # sensitive to other load on the machine
+        "best_ms": round(min(statistics.median(samples) for samples in rounds) * 1000, 4),
+        "median_ms": round(statistics.median(ordered) * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+    }
+
+
+def calibrate(repeat=30):
+    """
+    Best time of a fixed pure-Python workload (dicts, sorting, string
+    ops), in ms. Comparisons are scaled by it, so a baseline recorded on
+    a faster or less loaded machine does not read as a regression.
+    """
+    def workload():
+        words = [f"rubric{i % 997}word{i}" for i in range(4000)]
+        counts = {}
+        for w in words:
+            counts[w[:9]] = counts.get(w[:9], 0) + 1
+        return sorted(words, key=lambda w: (counts[w[:9]], w))[:10]
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        workload()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 4)
+
+
+def timed(fn, inputs, warmup, rounds):
+    for args in inputs[:warmup]:
+        fn(*args)
+    per_round = []
+    for _ in range(rounds):
+        samples = []
+        for args in inputs:
+            started = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - started)
+        per_round.append(samples)
+    return summarize(per_round)
+
+
+# ---------------------------
+# CHILD: one preset per process
+# ---------------------------
+
+def run_preset(preset, seed, rounds, llm_latency):
+    from types import SimpleNamespace
+
+    from app.create_tables import create
+    from app.database import SessionLocal
+    from app.llm import engine
+    from app.core.nlp.normalizer import normalize_input
+    from app.core.nlp.rubric_mapper import map_text_to_rubrics
+    from app.core.repertory.compiled import build_compiled_repertory, set_compiled_repertory
+    from app.core.repertory.search_index import RubricSearchIndex, set_search_index
+    from app.core.repertory.rubric_search import search_rubrics
+    from app.core.repertory.scoring import repertory_score, score_remedies
+    from app.core.cdss.explanation import build_explanations
+    from app.core.cdss.case_analyzer import analyze_case
+    from app.core.nlp.dataset_writer import phrase_writer
+    from benchmarks.synthetic import populate, doctor_texts
+    import random
+
+    canned = json.dumps({"summary": "Synthetic case.", "rubric_rationales": {}, "remedy_insights": {}})
+
+    def stub_chat_sync(**kwargs):
+        if llm_latency:
+            time.sleep(llm_latency / 1000)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=canned))])
+
+    engine.chat_sync = stub_chat_sync
+
+    create()
+    setup = {}
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        n_rubrics, n_remedies, n_relations = populate(db, preset, seed)
+        setup["generate_s"] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        compiled = set_compiled_repertory(build_compiled_repertory(db))
+        setup["compile_s"] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        set_search_index(RubricSearchIndex.build(compiled), compiled)
+        setup["index_s"] = round(time.perf_counter() - started, 3)
+
+        rnd = random.Random(seed)
+        texts = [(t,) for t in doctor_texts(50, seed)]
+        queries = [(" ".join(normalize_input(t)),) for (t,) in texts]
+        rubric_ids = [r.id for r in compiled.rubrics]
+        picks = [rnd.sample(rubric_ids, 5) for _ in range(50)]
+        selections = [[compiled.get_rubric(rid) for rid in ids] for ids in picks]
+        scored = [(score_remedies(db, rubrics), rubrics) for rubrics in selections]
+
+        results = {
+            "normalize_input": timed(normalize_input, texts, 10, rounds),
+            "search_rubrics": timed(lambda q: search_rubrics(db, q), queries, 10, rounds),
+            "map_text_to_rubrics": timed(lambda t: map_text_to_rubrics(db, t), texts, 10, rounds),
+            "repertory_score": timed(lambda ids: repertory_score(db, ids), [(ids,) for ids in picks], 10, rounds),
+            "build_explanations": timed(lambda s, r: build_explanations(db, s, r), scored, 10, rounds),
+            "analyze_case": timed(lambda t: analyze_case(db, t), texts, 5, max(1, rounds // 2)),
+        }
+    finally:
+        db.close()
+        phrase_writer.close()
+
+    return {
+        "rubrics": n_rubrics, "remedies": n_remedies, "relations": n_relations,
+        "calibration_ms": calibrate(), "setup": setup, "benchmarks": results,
+    }
+
+
+# ---------------------------
+# PARENT
+# ---------------------------
+
+def run_in_child(preset, seed, rounds, llm_latency):
+    workdir = tempfile.mkdtemp(prefix=f"reperto-bench-{preset}-")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}",
+        "LLM_CACHE_ENABLED": "0",
+        "RUBRIC_SEARCH_BACKEND": "memory",
+        "PHRASE_SPILL_PATH": os.path.join(workdir, "spill.ndjson"),
+        "OPENAI_API_KEY": "bench",
+        # set/dict order changes how much work search and matching do
+        "PYTHONHASHSEED": "0",
+    })
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_pipeline", "--child", preset,
+             "--seed", str(seed), "--rounds", str(rounds), "--llm-latency", str(llm_latency)],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"benchmark for {preset} failed ({proc.returncode})")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def merge_processes(results):
+    """Combines the runs of one preset made in separate processes."""
+    merged = dict(results[0])
+    merged["processes"] = len(results)
+    merged["calibration_ms"] = min(r["calibration_ms"] for r in results)
+    merged["setup"] = {k: min(r["setup"][k] for r in results) for k in results[0]["setup"]}
+    merged["benchmarks"] = {}
+    for name, first in results[0]["benchmarks"].items():
+        runs = [r["benchmarks"][name] for r in results]
+        merged["benchmarks"][name] = {
+            "n": sum(r["n"] for r in runs),
+            "best_ms": min(r["best_ms"] for r in runs),
+            "median_ms": round(statistics.median(r["median_ms"] for r in runs), 4),
+            "p95_ms": round(statistics.median(r["p95_ms"] for r in runs), 4),
+            "mean_ms": round(statistics.fmean(r["mean_ms"] for r in runs), 4),
+        }
+    return merged
+
+
+def compare(current, baseline, tolerance, min_delta):
+    """Returns the list of regressions, printing one line per benchmark."""
+    regressions = []
+    for preset, result in current["sizes"].items():
+        base = baseline.get("sizes", {}).get(preset)
+        if base is None:
+            print(f"{preset}: no baseline")
+            continue
+        # how much slower this machine is right now than the baseline's
+        speed = result["calibration_ms"] / base["calibration_ms"]
+        print(f"  {preset}: machine speed factor {speed:.2f} (calibration "
+              f"{base['calibration_ms']}ms -> {result['calibration_ms']}ms)")
+        for name, stats in result["benchmarks"].items():
+            if name not in base["benchmarks"]:
+                continue
+            old = base["benchmarks"][name]["best_ms"] * speed
+            new = stats["best_ms"]
+            ratio = new / old if old else float("inf")
+            regressed = new > old * (1 + tolerance) and new - old > min_delta
+            print(f"  {preset:<5} {name:<20} {old:10.4f}ms -> {new:10.4f}ms  {ratio:5.2f}x"
+                  f"{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((preset, name, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,10k", help=f"comma-separated presets ({', '.join(PRESETS)})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=7, help="passes over the 50 seeded inputs")
+    parser.add_argument("--processes", type=int, default=3, help="separate interpreters per size")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub LLM delay in ms")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline (merged by size)")
+    parser.add_argument("--compare", metavar="PATH", help="fail if slower than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.40, help="allowed slowdown (0.40 = 40%%)")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="ignore slowdowns below this many ms")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_preset(args.child, args.seed, args.rounds, args.llm_latency)))
+        return
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in PRESETS]
+    if unknown:
+        raise SystemExit(f"unknown size(s): {', '.join(unknown)}")
+
+    current = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "rounds": args.rounds,
+        "processes": args.processes,
+        "llm_latency_ms": args.llm_latency,
+        "sizes": {},
+    }
+    for preset in sizes:
+        result = merge_processes([
+            run_in_child(preset, args.seed, args.rounds, args.llm_latency)
+            for _ in range(max(1, args.processes))
+        ])
+        current["sizes"][preset] = result
+        print(f"\n{preset}: rubrics={result['rubrics']} remedies={result['remedies']} "
+              f"relations={result['relations']} setup={result['setup']}")
+        for name in BENCHMARKS:
+            stats = result["benchmarks"][name]
+            print(f"  {name:<20} best={stats['best_ms']:10.4f}ms median={stats['median_ms']:10.4f}ms "
+                  f"p95={stats['p95_ms']:10.4f}ms n={stats['n']}")
+
+    if args.save:
+        saved = {}
+        if os.path.exists(args.save):
+            with open(args.save, encoding="utf-8") as f:
+                saved = json.load(f)
+        saved.update({k: v for k, v in current.items() if k != "sizes"})
+        saved.setdefault("sizes", {}).update(current["sizes"])
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.compare} (tolerance {args.tolerance:.0%}, min delta {args.min_delta}ms):")
+        regressions = compare(current, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Startup profile: import time and time-to-ready of the API.
+
+Each run starts a fresh interpreter (cold imports) that imports app.main
+under `python -X importtime`, runs the startup hooks and waits for the
+warmup phase to finish. Reports the median over --runs of
+
+    import   time to import app.main
+    live     import + startup hooks (the process can answer /health/live)
+    ready    until /health/ready flips (repertory, indexes, caches warm)
+
+plus the heaviest packages imported by `import app.main` and, separately,
+the ones the warmup phase loads before readiness (instead of the first
+request). Runs against a copy of the bundled SQLite DB with its own
+snapshot and LLM cache files.
+
+    python -m benchmarks.bench_startup --runs 7
+    python -m benchmarks.bench_startup --runs 7 --json benchmarks/results/startup-after.json
+
+benchmarks/results/startup-before.json and startup-after.json are the
+recorded profiles from before and after the startup subsystem (app/startup.py).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# packages reported on their own, whether or not they make the top list
+WATCHED = ("jose", "passlib", "openai", "httpx", "sqlalchemy", "fastapi", "app.core.cdss.case_analyzer")
+
+_MARKER = "--- app.main imported ---"
+
+_CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import app.main as main
+t_import = time.perf_counter()
+sys.stderr.write("%s\n" % MARKER)
+
+async def lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        t_live = time.perf_counter()
+        state = getattr(main, "startup_state", None)
+        if state is not None:
+            await asyncio.to_thread(state.wait, 120)
+        return t_live, time.perf_counter()
+
+t_live, t_ready = asyncio.run(lifespan())
+print(json.dumps({"import": t_import - t0, "live": t_live - t0, "ready": t_ready - t0}))
+"""
+
+
+def parse_importtime(stderr):
+    """{module: cumulative seconds} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(cumulative) / 1e6, depth)
+    return modules
+
+
+def run_once(env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.replace("MARKER", repr(_MARKER))],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"startup run failed ({proc.returncode})")
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    at_import, _, at_warmup = proc.stderr.partition(_MARKER)
+    return timings, parse_importtime(at_import), parse_importtime(at_warmup)
+
+
+def summarize(runs, top):
+    """Median cumulative import time: (top-level modules, WATCHED packages)."""
+    samples = {}
+    for modules in runs:
+        for name, (seconds, depth) in modules.items():
+            samples.setdefault(name, ([], depth))[0].append(seconds)
+    medians = {name: (statistics.median(s), depth) for name, (s, depth) in samples.items()}
+
+    top_level = dict(sorted(
+        ((name, s) for name, (s, depth) in medians.items() if depth <= 1 and name != "app.main"),
+        key=lambda item: item[1], reverse=True
+    )[:top])
+
+    watched = {}
+    for package in WATCHED:
+        # a package's cost is charged to whichever of its modules came first
+        hits = [s for name, (s, _) in medians.items() if name == package or name.startswith(package + ".")]
+        watched[package] = max(hits) if hits else None
+    return top_level, watched
+
+
+def _as_ms(summary):
+    top_level, watched = summary
+    return {
+        "top_imports_ms": {k: round(v * 1000, 1) for k, v in top_level.items()},
+        "watched_ms": {k: (None if v is None else round(v * 1000, 1)) for k, v in watched.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="heaviest top-level imports to list")
+    parser.add_argument("--json", metavar="PATH", help="write the profile as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="reperto-startup-")
+    db_file = os.path.join(workdir, "startup.sqlite")
+    shutil.copy(os.path.join(ROOT, "reperto_db.sqlite"), db_file)
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_file}",
+        "REPERTORY_SNAPSHOT": os.path.join(workdir, "repertory.snap"),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite"),
+        "PHRASE_SPILL_PATH": os.path.join(workdir, "spill.ndjson"),
+        "REPERTORY_WATCH_INTERVAL": "0",
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "bench"),
+        "PYTHONDONTWRITEBYTECODE": "0",
+    })
+
+    try:
+        # first run writes the snapshot and byte-code; not measured
+        run_once(env)
+        runs = [run_once(env) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    timings = {
+        phase: statistics.median(t[phase] for t, _, _ in runs)
+        for phase in ("import", "live", "ready")
+    }
+    at_import = summarize([m for _, m, _ in runs], args.top)
+    at_warmup = summarize([m for _, _, m in runs], args.top)
+
+    print(f"runs={args.runs} python={sys.version.split()[0]}")
+    for phase, seconds in timings.items():
+        print(f"{phase:<8} {seconds * 1000:8.1f}ms")
+    for title, (top_level, watched) in (("import app.main", at_import), ("warmup", at_warmup)):
+        print(f"\n{title}: heaviest imports (cumulative)")
+        for name, seconds in top_level.items():
+            print(f"  {name:<40} {seconds * 1000:8.1f}ms")
+        print(f"{title}: watched packages")
+        for name, seconds in watched.items():
+            print(f"  {name:<40} {'-' if seconds is None else f'{seconds * 1000:8.1f}ms'}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "runs": args.runs,
+                "python": sys.version.split()[0],
+                "timings_ms": {k: round(v * 1000, 1) for k, v in timings.items()},
+                "import": _as_ms(at_import),
+                "warmup": _as_ms(at_warmup),
+            }, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
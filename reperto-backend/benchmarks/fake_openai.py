@@ -0,0 +1,204 @@
+"""
+Local fake OpenAI-compatible server for offline load tests.
+
+Answers POST /v1/chat/completions with a chat.completion whose content is
+JSON every caller in app/ai.py accepts (summary, risk, rubrics,
+rubric_rationales, remedy_insights), after a tunable latency, and fails a
+tunable fraction of calls:
+
+    --latency-ms / --jitter-ms   base latency, +- uniform jitter
+    --slow-rate / --slow-ms      fraction of calls with a long tail latency
+    --error-rate                 fraction answered with one of --error-codes
+    --hang-rate                  fraction that never answer within --hang-ms
+                                 (exercises the engine's deadline)
+
+GET /stats returns request / error counters. Point the API at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m benchmarks.fake_openai --port 8765 --latency-ms 800 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_CONTENT = json.dumps({
+    "summary": "Synthetic clinical summary from the fake OpenAI server.",
+    "risk": "low",
+    "rubrics": [{"path": "Mind, anxiety", "confidence": 0.8, "evidence": "fake"}],
+    "rubric_rationales": {},
+    "remedy_insights": {},
+})
+
+
+class FakeOpenAIServer:
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency_ms=300.0,
+        jitter_ms=100.0,
+        slow_rate=0.0,
+        slow_ms=5000.0,
+        error_rate=0.0,
+        error_codes=(500, 429, 503),
+        hang_rate=0.0,
+        hang_ms=60000.0,
+        seed=1,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.hangs = 0
+        self.slow = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._json(200, server.stats())
+                elif self.path.rstrip("/").endswith("/models"):
+                    self._json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+                else:
+                    self._json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": "not found"}})
+                    return
+
+                delay, status = server._plan()
+                time.sleep(delay)
+                if status != 200:
+                    self._json(status, {"error": {"message": "injected failure", "type": "fake_error"}})
+                    return
+
+                self._json(200, {
+                    "id": f"chatcmpl-fake-{server.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": _CONTENT},
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+            def _json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up (deadline); nothing to answer
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _plan(self):
+        """(delay seconds, HTTP status) for the next call."""
+        with self._lock:
+            self.requests += 1
+            roll = self._rnd.random()
+            jitter = self._rnd.uniform(-self.jitter_ms, self.jitter_ms)
+
+            if roll < self.hang_rate:
+                self.hangs += 1
+                return self.hang_ms / 1000, 200
+            roll -= self.hang_rate
+            if roll < self.error_rate:
+                self.errors += 1
+                return max(0.0, self.latency_ms + jitter) / 1000 / 4, self._rnd.choice(self.error_codes)
+            roll -= self.error_rate
+            if roll < self.slow_rate:
+                self.slow += 1
+                return self.slow_ms / 1000, 200
+            return max(0.0, self.latency_ms + jitter) / 1000, 200
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "hangs": self.hangs,
+            "slow": self.slow,
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-codes", default="500,429,503")
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-ms", type=float, default=60000.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        host=args.host, port=args.port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+        error_rate=args.error_rate, error_codes=[int(c) for c in args.error_codes.split(",")],
+        hang_rate=args.hang_rate, hang_ms=args.hang_ms, seed=args.seed,
+    )
+    print(f"fake OpenAI listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
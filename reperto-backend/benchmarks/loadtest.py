@@ -0,0 +1,396 @@
+"""
+End-to-end HTTP load test of the API.
+
+Seeds a throwaway SQLite database (golden repertory + N accounts with
+cases), starts the fake OpenAI server (benchmarks/fake_openai.py) and the
+API under uvicorn against both, waits for /health/ready and drives it
+with virtual users over real HTTP. Fully offline.
+
+Each virtual user logs in once, then loops until --duration: pick an
+action by the scenario's weights, run it, sleep an exponential think
+time (mean --think-ms). Users start evenly over --ramp-up seconds.
+
+    login     POST /auth/login
+    cases     GET  /cases?limit=20
+    score     POST /cdss/score     (3-8 rubric paths sampled from the DB)
+    analyze   POST /cdss/analyze   (seeded doctor notes)
+
+Scenarios are weight tables; built-ins are listed in SCENARIOS, or pass
+--scenario-file with {"login": 1, "cases": 5, ...}. Reports per endpoint
+the request count, throughput, error rate (HTTP >= 400 or transport
+error) and p50/p95/p99/max latency, plus the fake LLM's counters.
+
+    python -m benchmarks.loadtest --users 20 --duration 60
+    python -m benchmarks.loadtest --scenario analyze --users 10 --llm-latency-ms 1200 --llm-error-rate 0.05
+    python -m benchmarks.loadtest --repertory 10k --workers 2 --json /tmp/load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.fake_openai import FakeOpenAIServer  # noqa: E402
+from benchmarks.synthetic import PRESETS, doctor_texts  # noqa: E402
+
+# action -> weight
+SCENARIOS = {
+    "mixed": {"login": 1, "cases": 6, "score": 4, "analyze": 2},
+    "browse": {"cases": 1},
+    "login": {"login": 1},
+    "score": {"score": 1},
+    "analyze": {"analyze": 1},
+}
+
+ENDPOINTS = {
+    "login": "POST /auth/login",
+    "cases": "GET /cases",
+    "score": "POST /cdss/score",
+    "analyze": "POST /cdss/analyze",
+}
+
+PASSWORD = "load-test-password"
+
+
+# ---------------------------
+# SEEDING
+# ---------------------------
+
+def seed_database(workdir, repertory, accounts, cases_per_user, seed):
+    """
+    Creates workdir/load.sqlite and returns (database_url, rubric paths).
+    Runs in a child interpreter so this process never binds app.database.
+    """
+    db_file = os.path.join(workdir, "load.sqlite")
+    if repertory == "bundled":
+        shutil.copy(os.path.join(ROOT, "reperto_db.sqlite"), db_file)
+
+    database_url = f"sqlite:///{db_file}"
+    proc = subprocess.run(
+        [sys.executable, "-c", _SEED, repertory, str(accounts), str(cases_per_user), str(seed)],
+        cwd=ROOT, env={**os.environ, "DATABASE_URL": database_url},
+        capture_output=True, text=True, timeout=1800
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"seeding failed ({proc.returncode})")
+    return database_url, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+_SEED = r"""
+import json, random, sys
+from datetime import datetime, timedelta, timezone
+from app.create_tables import create
+from app.database import SessionLocal
+from app.models import User, Case
+from app.core.repertory.models import GoldenRubric
+from app.auth import get_pwd_context
+from benchmarks.synthetic import populate
+from benchmarks.loadtest import PASSWORD, account_email
+
+repertory, accounts, cases_per_user, seed = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+create()
+db = SessionLocal()
+try:
+    if repertory != "bundled":
+        populate(db, repertory, seed)
+
+    # one argon2 hash for every account; seeding stays fast
+    password_hash = get_pwd_context().hash(PASSWORD)
+    db.bulk_insert_mappings(User, [
+        {"name": f"Load {i}", "email": account_email(i), "password_hash": password_hash}
+        for i in range(accounts)
+    ])
+    now = datetime.now(timezone.utc)
+    db.bulk_insert_mappings(Case, [
+        {
+            "id": f"load-{i}-{j}", "name": f"Patient {j}", "initials": "LP",
+            "specialty": "General", "time": "10:00", "summary": "Seeded case",
+            "rubrics": "[]", "remedies": "[]", "owner": account_email(i),
+            "created_at": now - timedelta(minutes=j),
+        }
+        for i in range(accounts) for j in range(cases_per_user)
+    ])
+    db.commit()
+
+    paths = [p for (p,) in db.query(GoldenRubric.full_path).all()]
+finally:
+    db.close()
+
+rnd = random.Random(seed)
+print(json.dumps(rnd.sample(paths, min(len(paths), 500))))
+"""
+
+
+def account_email(i):
+    return f"load{i}@example.com"
+
+
+# ---------------------------
+# SERVER
+# ---------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(workdir, database_url, llm_base_url, port, workers, llm_cache):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "OPENAI_API_KEY": "load-test",
+        "OPENAI_BASE_URL": llm_base_url,
+        "LLM_CACHE_ENABLED": "1" if llm_cache else "0",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite"),
+        "REPERTORY_SNAPSHOT": os.path.join(workdir, "repertory.snap"),
+        "PHRASE_SPILL_PATH": os.path.join(workdir, "spill.ndjson"),
+        "REPERTORY_WATCH_INTERVAL": "0",
+    })
+    log = open(os.path.join(workdir, "uvicorn.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return proc, log
+
+
+async def wait_ready(client, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"API exited during startup ({proc.returncode}); see uvicorn.log")
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit(f"API not ready after {timeout}s")
+
+
+# ---------------------------
+# VIRTUAL USERS
+# ---------------------------
+
+class Recorder:
+
+    def __init__(self):
+        self.samples = {name: [] for name in ENDPOINTS.values()}
+        self.errors = {name: 0 for name in ENDPOINTS.values()}
+        self.status = {}
+
+    def record(self, endpoint, seconds, status):
+        self.samples[endpoint].append(seconds)
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+        self.status[status] = self.status.get(status, 0) + 1
+
+
+async def timed(client, recorder, action, method, url, **kwargs):
+    started = time.perf_counter()
+    status = None
+    response = None
+    try:
+        response = await client.request(method, url, **kwargs)
+        status = response.status_code
+    except Exception:
+        pass
+    recorder.record(ENDPOINTS[action], time.perf_counter() - started, status)
+    return response
+
+
+async def virtual_user(vu, client, recorder, weights, args, rubric_paths, texts, stop_at):
+    rnd = random.Random(args.seed * 100_003 + vu)
+    creds = {"email": account_email(vu % args.accounts), "password": PASSWORD}
+    headers = {}
+
+    async def login():
+        response = await timed(client, recorder, "login", "POST", "/auth/login", json=creds)
+        if response is not None and response.status_code == 200:
+            headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    async def cases():
+        await timed(client, recorder, "cases", "GET", "/cases", params={"limit": 20}, headers=headers)
+
+    async def score():
+        body = {"rubrics": rnd.sample(rubric_paths, min(len(rubric_paths), rnd.randint(3, 8)))}
+        await timed(client, recorder, "score", "POST", "/cdss/score", json=body, headers=headers)
+
+    async def analyze():
+        body = {"text": rnd.choice(texts)}
+        await timed(client, recorder, "analyze", "POST", "/cdss/analyze", json=body, headers=headers)
+
+    actions = {"login": login, "cases": cases, "score": score, "analyze": analyze}
+    names = list(weights)
+    cum_weights = []
+    total = 0
+    for name in names:
+        total += weights[name]
+        cum_weights.append(total)
+
+    await login()
+    while time.monotonic() < stop_at:
+        await actions[rnd.choices(names, cum_weights=cum_weights)[0]]()
+        if args.think_ms > 0:
+            await asyncio.sleep(min(rnd.expovariate(1000.0 / args.think_ms), max(0.0, stop_at - time.monotonic())))
+
+
+async def drive(base_url, api, args, weights, rubric_paths):
+    import httpx
+
+    recorder = Recorder()
+    texts = doctor_texts(200, args.seed)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        await wait_ready(client, api, args.startup_timeout)
+
+        started = time.monotonic()
+        stop_at = started + args.ramp_up + args.duration
+
+        async def delayed(vu):
+            await asyncio.sleep(args.ramp_up * vu / max(1, args.users))
+            await virtual_user(vu, client, recorder, weights, args, rubric_paths, texts, stop_at)
+
+        await asyncio.gather(*(delayed(vu) for vu in range(args.users)))
+        elapsed = time.monotonic() - started
+    return recorder, elapsed
+
+
+# ---------------------------
+# REPORT
+# ---------------------------
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+
+def summarize(recorder, elapsed):
+    rows = {}
+    for endpoint, samples in recorder.samples.items():
+        if not samples:
+            continue
+        rows[endpoint] = {
+            "requests": len(samples),
+            "rps": round(len(samples) / elapsed, 2),
+            "error_rate": round(recorder.errors[endpoint] / len(samples), 4),
+            "p50_ms": round(percentile(samples, 0.50), 1),
+            "p95_ms": round(percentile(samples, 0.95), 1),
+            "p99_ms": round(percentile(samples, 0.99), 1),
+            "max_ms": round(max(samples) * 1000, 1),
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    parser.add_argument("--scenario-file", help="JSON {action: weight}; overrides --scenario")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds at full load (after ramp-up)")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds to start all users")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean think time between actions (0 = none)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client request timeout (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    # database
+    parser.add_argument("--repertory", choices=("bundled",) + tuple(PRESETS), default="bundled",
+                        help="bundled reperto_db.sqlite or a synthetic preset")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--cases-per-user", type=int, default=50)
+    # API
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    # fake OpenAI
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0)
+    parser.add_argument("--llm-slow-ms", type=float, default=5000.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory (DB, uvicorn.log)")
+    args = parser.parse_args()
+
+    if args.scenario_file:
+        with open(args.scenario_file, encoding="utf-8") as f:
+            weights = json.load(f)
+        unknown = set(weights) - set(ENDPOINTS)
+        if unknown:
+            raise SystemExit(f"unknown actions in scenario: {', '.join(sorted(unknown))}")
+    else:
+        weights = SCENARIOS[args.scenario]
+
+    workdir = tempfile.mkdtemp(prefix="reperto-load-")
+    print(f"seeding {args.repertory} repertory, {args.accounts} accounts x {args.cases_per_user} cases ...")
+    database_url, rubric_paths = seed_database(workdir, args.repertory, args.accounts, args.cases_per_user, args.seed)
+
+    llm = FakeOpenAIServer(
+        latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+        slow_rate=args.llm_slow_rate, slow_ms=args.llm_slow_ms,
+        error_rate=args.llm_error_rate, seed=args.seed,
+    ).start()
+    port = _free_port()
+    api, log = start_api(workdir, database_url, llm.base_url, port, args.workers, args.llm_cache)
+
+    try:
+        print(f"driving {args.users} users for {args.duration:g}s (+{args.ramp_up:g}s ramp-up), scenario {weights}")
+        recorder, elapsed = asyncio.run(drive(f"http://127.0.0.1:{port}", api, args, weights, rubric_paths))
+    finally:
+        api.terminate()
+        try:
+            api.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            api.kill()
+        log.close()
+        llm.stop()
+        if args.keep:
+            print(f"work directory: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    rows = summarize(recorder, elapsed)
+    print(f"\n{'endpoint':<20} {'n':>6} {'req/s':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for endpoint, r in rows.items():
+        print(
+            f"{endpoint:<20} {r['requests']:>6} {r['rps']:>8.2f} {r['error_rate'] * 100:>5.1f}% "
+            f"{r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['max_ms']:>7.1f}ms"
+        )
+    total = sum(r["requests"] for r in rows.values())
+    print(f"\ntotal {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s); status {recorder.status}")
+    print(f"fake LLM: {llm.stats()}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "scenario": weights,
+                "users": args.users,
+                "duration_s": round(elapsed, 2),
+                "think_ms": args.think_ms,
+                "repertory": args.repertory,
+                "workers": args.workers,
+                "endpoints": rows,
+                "status": {str(k): v for k, v in recorder.status.items()},
+                "llm": llm.stats(),
+            }, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
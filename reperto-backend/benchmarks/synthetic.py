@@ -0,0 +1,218 @@
+"""
+Seeded synthetic Golden Repertory.
+
+Fills golden_rubrics / golden_remedies / golden_rubric_remedies with a
+repertory shaped like the real one (German paths with English
+translations, chapter roots, a tree up to MAX_DEPTH levels, a few
+polychrest remedies appearing everywhere, grades 1-3 skewed to 1) at any
+size, so the pipeline can be benchmarked at 1k/10k/100k rubrics and up
+to 1M relations. The same (preset, seed) always yields the same rows.
+
+    python -m benchmarks.synthetic --preset 10k --out /tmp/synthetic-10k.sqlite
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# name -> (rubrics, relations, remedies)
+PRESETS = {
+    "1k": (1_000, 10_000, 300),
+    "10k": (10_000, 100_000, 1_000),
+    "100k": (100_000, 1_000_000, 2_500),
+}
+
+MAX_DEPTH = 4
+
+# (German, English) chapter names as in the real golden repertory
+CHAPTERS = [
+    ("Gemüt", "Mind"), ("Kopf", "Head"), ("Schwindel", "Vertigo"), ("Augen", "Eyes"),
+    ("Ohren", "Ears"), ("Nase", "Nose"), ("Gesicht", "Face"), ("Mund", "Mouth"),
+    ("Hals", "Throat"), ("Magen", "Stomach"), ("Abdomen", "Abdomen"), ("Rektum", "Rectum"),
+    ("Blase", "Bladder"), ("Atmung", "Respiration"), ("Husten", "Cough"), ("Brust", "Chest"),
+    ("Rücken", "Back"), ("Extremitäten", "Extremities"), ("Schlaf", "Sleep"), ("Fieber", "Fever"),
+    ("Haut", "Skin"), ("Allgemeines", "Generalities"),
+]
+
+# rubric words; the first ones are the normalizer's anchors so doctor
+# text resolves onto the synthetic rubrics like it does onto real ones
+WORDS = [
+    ("Angst", "anxiety"), ("Furcht", "fear"), ("Unruhe", "restlessness"), ("Schlaf", "sleep"),
+    ("Schlaflosigkeit", "sleeplessness"), ("Schmerz", "pain"), ("Brennen", "burning"),
+    ("Kopfschmerz", "headache"), ("Traurigkeit", "sadness"), ("Reizbarkeit", "irritability"),
+    ("Zorn", "anger"), ("Verwirrung", "confusion"), ("Schwäche", "weakness"), ("Durst", "thirst"),
+    ("Übelkeit", "nausea"), ("Erbrechen", "vomiting"), ("Kälte", "coldness"), ("Hitze", "heat"),
+    ("Schweiß", "perspiration"), ("Jucken", "itching"), ("Schwellung", "swelling"),
+    ("Krampf", "cramp"), ("Druck", "pressure"), ("Stechen", "stitching"), ("Taubheit", "numbness"),
+    ("Trockenheit", "dryness"), ("Ausschlag", "eruption"), ("Blutung", "haemorrhage"),
+    ("Entzündung", "inflammation"), ("Zittern", "trembling"), ("Müdigkeit", "weariness"),
+    ("Appetit", "appetite"), ("Husten", "cough"), ("Atemnot", "dyspnoea"), ("Herzklopfen", "palpitation"),
+]
+
+MODIFIERS = [
+    ("nachts", "night"), ("morgens", "morning"), ("abends", "evening"), ("nach dem Essen", "after eating"),
+    ("beim Gehen", "walking"), ("in der Ruhe", "rest"), ("im Freien", "open air"), ("durch Kälte", "from cold"),
+    ("vor Mitternacht", "before midnight"), ("bei Kindern", "in children"), ("plötzlich", "sudden"),
+    ("periodisch", "periodical"), ("links", "left"), ("rechts", "right"), ("mit Angst", "with anxiety"),
+    ("durch Kummer", "from grief"), ("beim Liegen", "lying"), ("nach Schlaf", "after sleep"),
+]
+
+_SYLLABLES = ["ab", "al", "an", "ar", "ba", "ca", "co", "da", "fe", "gel", "ka", "la", "lo",
+              "ma", "me", "na", "ni", "ox", "pa", "ph", "ra", "sa", "sil", "ta", "to", "ur", "ve", "zi"]
+
+# doctor phrasing (keys of the normalizer dictionary + free words)
+COMPLAINTS = [
+    "anxiety", "fear of death", "restless at night", "sleep disturbed", "no sleep", "neend nahi aati",
+    "headache", "sir dard", "burning in stomach", "pet me jalan", "thirst for cold water", "weakness",
+    "nausea after eating", "cough dry at night", "irritability", "sadness", "anger", "confusion",
+    "perspiration at night", "itching of skin", "palpitation with anxiety", "pain left side",
+]
+
+
+def _remedy_name(rnd, used):
+    while True:
+        name = "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        long_name = f"{name} {rnd.choice(['Album', 'Nigrum', 'Officinalis', 'Carbonica', 'Muriaticum', 'Sulphuricum'])}"
+        if long_name not in used:
+            used.add(long_name)
+            return f"{name[:5]}.", long_name
+
+
+def generate_rows(n_rubrics: int, n_relations: int, n_remedies: int, seed: int = 1):
+    """
+    Returns (rubrics, remedies, relations) as lists of dicts ready for
+    bulk insert. Deterministic for a given seed.
+    """
+    rnd = random.Random(seed)
+
+    rubrics = []
+    paths = set()
+    by_depth = [[] for _ in range(MAX_DEPTH)]
+
+    def add(chapter, text, text_en, parent):
+        rid = len(rubrics) + 1
+        if parent is None:
+            full_path, full_path_en, depth = f"{chapter[0]}, {text}", f"{chapter[1]}, {text_en}", 0
+        else:
+            full_path = f"{parent['full_path']}, {text}"
+            full_path_en = f"{parent['full_path_en']}, {text_en}"
+            depth = parent["depth"] + 1
+        if full_path in paths:
+            # keep full_path unique (as in golden_rubrics) without a new word
+            full_path = f"{full_path} {rid}"
+            full_path_en = f"{full_path_en} {rid}"
+        paths.add(full_path)
+
+        row = {
+            "id": rid, "chapter": chapter[1], "text": text, "text_en": text_en,
+            "full_path": full_path, "full_path_en": full_path_en,
+            "parent_id": parent["id"] if parent else None, "depth": depth, "oorep_id": rid,
+        }
+        rubrics.append(row)
+        if depth < MAX_DEPTH:
+            by_depth[depth].append(row)
+        return row
+
+    n_roots = max(len(CHAPTERS), n_rubrics // 12)
+    while len(rubrics) < n_rubrics:
+        word = rnd.choice(WORDS)
+        if len(rubrics) < n_roots:
+            add(rnd.choice(CHAPTERS), word[0], word[1], None)
+            continue
+        # shallow levels are wider, as in a real repertory
+        depth = min(rnd.choices(range(MAX_DEPTH - 1), weights=(6, 3, 1))[0], MAX_DEPTH - 2)
+        while not by_depth[depth]:
+            depth -= 1
+        parent = rnd.choice(by_depth[depth])
+        if rnd.random() < 0.5:
+            modifier = rnd.choice(MODIFIERS)
+            add((None, parent["chapter"]), modifier[0], modifier[1], parent)
+        else:
+            add((None, parent["chapter"]), word[0], word[1], parent)
+
+    used = set()
+    remedies = []
+    for i in range(n_remedies):
+        short_name, long_name = _remedy_name(rnd, used)
+        remedies.append({"id": i + 1, "short_name": short_name, "long_name": long_name,
+                         "description": None, "oorep_id": i + 1})
+
+    # Zipf-like remedy popularity: a few polychrests in most rubrics
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(n_remedies)]
+    cumulative = []
+    total = 0.0
+    for w in weights:
+        total += w
+        cumulative.append(total)
+
+    relations = []
+    per_rubric = n_relations / n_rubrics
+    for rubric in rubrics:
+        # larger rubrics near the root
+        target = max(1, int(rnd.expovariate(1.0 / per_rubric) * (1.5 if rubric["depth"] == 0 else 1.0)))
+        target = min(target, n_remedies, n_relations - len(relations))
+        chosen = set()
+        while len(chosen) < target:
+            chosen.add(rnd.choices(range(n_remedies), cum_weights=cumulative)[0] + 1)
+        for remedy_id in sorted(chosen):
+            relations.append({
+                "id": len(relations) + 1, "rubric_id": rubric["id"], "remedy_id": remedy_id,
+                "grade": rnd.choices((1, 2, 3), weights=(50, 33, 17))[0],
+            })
+        if len(relations) >= n_relations:
+            break
+
+    return rubrics, remedies, relations
+
+
+def doctor_texts(n: int, seed: int = 1):
+    """Seeded doctor notes: 2-4 complaints each."""
+    rnd = random.Random(seed)
+    return [", ".join(rnd.sample(COMPLAINTS, rnd.randint(2, 4))) for _ in range(n)]
+
+
+def populate(db, preset: str = "1k", seed: int = 1):
+    """
+    Inserts the synthetic repertory into the (empty) golden tables of `db`.
+    Returns (n_rubrics, n_remedies, n_relations).
+    """
+    from app.core.repertory.loader import bulk_insert
+    from app.core.repertory.models import GoldenRubric, GoldenRemedy, GoldenRubricRemedy
+
+    rubrics, remedies, relations = generate_rows(*PRESETS[preset], seed=seed)
+    bulk_insert(db, GoldenRubric.__table__, rubrics)
+    bulk_insert(db, GoldenRemedy.__table__, remedies)
+    bulk_insert(db, GoldenRubricRemedy.__table__, relations)
+    db.commit()
+    return len(rubrics), len(remedies), len(relations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=PRESETS, default="1k")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", required=True, help="SQLite file to create")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        raise SystemExit(f"{args.out} exists")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.out)}"
+
+    from app.create_tables import create
+    from app.database import SessionLocal
+
+    create()
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        n = populate(db, args.preset, args.seed)
+    finally:
+        db.close()
+    print(f"rubrics={n[0]} remedies={n[1]} relations={n[2]} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
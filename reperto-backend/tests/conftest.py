@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+# Small golden repertory:
+#   1 Kopf
+#   2 Kopf, Schmerz
+#   3 Kopf, Schmerz, Stirn
+#   4 Kopf, Schmerz, Hinterkopf
+#   5 Gemüt
+#   6 Gemüt, Angst
+RUBRICS = [
+    (1, "Kopf", "Kopf", "Head", None, 0),
+    (2, "Kopf", "Kopf, Schmerz", "Head, pain", 1, 1),
+    (3, "Kopf", "Kopf, Schmerz, Stirn", "Head, pain, forehead", 2, 2),
+    (4, "Kopf", "Kopf, Schmerz, Hinterkopf", "Head, pain, occiput", 2, 2),
+    (5, "Gemüt", "Gemüt", "Mind", None, 0),
+    (6, "Gemüt", "Gemüt, Angst", "Mind, anxiety", 5, 1),
+]
+REMEDIES = [(1, "Acon.", "Aconitum"), (2, "Bell.", "Belladonna"), (3, "Calc.", "Calcarea"), (4, "Nux-v.", "Nux vomica")]
+# (rubric, remedy, grade); Aconitum only sits in the subrubrics of "Kopf, Schmerz"
+RELATIONS = [
+    (3, 1, 3), (4, 1, 3),
+    (2, 2, 3), (6, 2, 1),
+    (6, 3, 2), (2, 3, 1),
+    (5, 4, 1), (6, 4, 3), (3, 4, 1),
+]
+
+
+@pytest.fixture
+def golden_db(tmp_path):
+    from app.core.repertory.models import GoldenRubric, GoldenRemedy, GoldenRubricRemedy
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'golden.sqlite'}")
+    tables = [GoldenRubric.__table__, GoldenRemedy.__table__, GoldenRubricRemedy.__table__]
+    GoldenRubric.metadata.create_all(bind=engine, tables=tables)
+
+    with engine.begin() as conn:
+        conn.execute(GoldenRubric.__table__.insert(), [
+            {"id": i, "chapter": c, "full_path": fp, "text": fp.split(",")[-1].strip(),
+             "full_path_en": en, "text_en": en.split(",")[-1].strip(),
+             "parent_id": parent, "depth": depth, "oorep_id": 100 + i}
+            for i, c, fp, en, parent, depth in RUBRICS
+        ])
+        conn.execute(GoldenRemedy.__table__.insert(), [
+            {"id": i, "short_name": short, "long_name": long, "oorep_id": 200 + i}
+            for i, short, long in REMEDIES
+        ])
+        conn.execute(GoldenRubricRemedy.__table__.insert(), [
+            {"rubric_id": r, "remedy_id": m, "grade": g} for r, m, g in RELATIONS
+        ])
+
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def compiled(golden_db):
+    """The seeded repertory, installed as the process-wide one for the test."""
+    from app.core.repertory.compiled import (
+        build_compiled_repertory, current_compiled_repertory, set_compiled_repertory
+    )
+
+    previous = current_compiled_repertory()
+    compiled = set_compiled_repertory(build_compiled_repertory(golden_db))
+    yield compiled
+    set_compiled_repertory(previous)
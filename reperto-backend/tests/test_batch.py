@@ -0,0 +1,54 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+from app.core.repertory import batch
+from app.core.repertory.batch import score_batch, score_case_batch, shutdown_batch_pool
+from app.core.repertory.scoring import repertory_score
+
+CASES = [
+    ["Kopf, Schmerz"],
+    ["Kopf, Schmerz", "Gemüt, Angst"],
+    ["Kopf, Schmerz, Stirn", "Kopf, Schmerz, Hinterkopf", "Gemüt"],
+    ["Gemüt, Angst", "Gemüt, Angst", "Nicht, vorhanden"],
+    [],
+]
+
+
+def assert_matches_single(db, compiled, cases, results, top_k):
+    assert len(results) == len(cases)
+    for paths, result in zip(cases, results):
+        known = [p for p in paths if p in compiled.row_of_path]
+        assert result["unmatched"] == [p for p in paths if p not in compiled.row_of_path]
+
+        ids = list(dict.fromkeys(compiled.rubrics[compiled.row_of_path[p]].id for p in known))
+        single = repertory_score(db, ids) if ids else []
+        by_id = {r["remedy_id"]: r["score"] for r in single}
+
+        # same top scores (ties may pick different remedies), each one right
+        assert [r["score"] for r in result["remedies"]] == [r["score"] for r in single[:top_k]]
+        for remedy in result["remedies"]:
+            assert by_id[remedy["remedy_id"]] == remedy["score"]
+
+
+@pytest.mark.parametrize("dense_budget", [batch.DENSE_CELL_BUDGET, 0], ids=["dense", "sparse"])
+def test_batch_matches_single_scoring(golden_db, compiled, monkeypatch, dense_budget):
+    monkeypatch.setattr(batch, "DENSE_CELL_BUDGET", dense_budget)
+    for top_k in (1, 2, 10):
+        results = score_case_batch(compiled, CASES, top_k=top_k)
+        assert_matches_single(golden_db, compiled, CASES, results, top_k)
+
+
+def test_process_pool_keeps_order(golden_db, compiled, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_PARALLEL_THRESHOLD", 1)
+    monkeypatch.setattr(batch, "BATCH_WORKERS", 2)
+    rnd = random.Random(3)
+    paths = [row[0] for row in golden_db.execute(text("SELECT full_path FROM golden_rubrics"))]
+    cases = [rnd.sample(paths, rnd.randint(1, 3)) for _ in range(9)]
+    try:
+        results = score_batch(compiled, cases, top_k=3)
+    finally:
+        shutdown_batch_pool()
+    assert results == score_case_batch(compiled, cases, top_k=3)
+    assert_matches_single(golden_db, compiled, cases, results, 3)
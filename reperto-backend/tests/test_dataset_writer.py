@@ -0,0 +1,111 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+from app.core.nlp.dataset_writer import PhraseMapWriter
+
+ROWS = [{"d": "anxiety", "t": "[\"anxiety\"]", "r": f"Gemüt, Angst {i}", "c": 0.9} for i in range(7)]
+
+
+def _create_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE clinical_phrase_map (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doctor_text TEXT, normalized_tokens TEXT, rubric TEXT, confidence REAL
+            )
+        """))
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM clinical_phrase_map")).scalar()
+
+
+def test_failed_writes_are_kept_until_committed(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    spill = str(tmp_path / "spill.ndjson")
+
+    # no table yet: every INSERT fails, nothing may be lost
+    writer = PhraseMapWriter(batch_size=3, flush_interval=0.05, spill_path=spill)
+    writer.submit(engine, ROWS)
+    writer.close()
+    assert writer.written == 0
+    assert os.path.exists(spill) or os.path.exists(spill + ".draining")
+
+    _create_table(engine)
+    writer = PhraseMapWriter(batch_size=3, flush_interval=0.05, spill_path=spill)
+    writer.submit(engine, [])
+    writer.close()
+
+    assert _count(engine) == len(ROWS)
+    assert not os.path.exists(spill + ".draining")
+
+
+def test_partial_drain_keeps_only_uncommitted_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    _create_table(engine)
+    spill = str(tmp_path / "spill.ndjson")
+
+    writer = PhraseMapWriter(batch_size=3, spill_path=spill)
+    writer._overflow(ROWS)
+    writer.engine = engine
+
+    calls = []
+    write = writer._write
+
+    def flaky(rows):
+        calls.append(len(rows))
+        return write(rows) if len(calls) == 1 else False
+
+    writer._write = flaky
+    writer._drain_spill()
+    assert _count(engine) == 3
+
+    writer._write = write
+    writer._drain_spill()
+    assert _count(engine) == len(ROWS)
+    assert not os.path.exists(spill + ".draining")
+
+
+def test_truncated_spill_line_is_quarantined(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    _create_table(engine)
+    spill = str(tmp_path / "spill.ndjson")
+
+    writer = PhraseMapWriter(batch_size=3, spill_path=spill)
+    writer._overflow(ROWS[:2])
+    with open(spill, "a", encoding="utf-8") as f:
+        f.write('{"d": "anx')  # crash mid-append
+    with open(spill, "a", encoding="utf-8") as f:
+        f.write("\n")
+    writer._overflow(ROWS[2:])
+
+    writer.engine = engine
+    writer._drain_spill()
+
+    assert _count(engine) == len(ROWS)
+    assert writer.corrupt == 1
+    assert not os.path.exists(spill + ".draining")
+    with open(spill + ".bad", encoding="utf-8") as f:
+        assert f.read() == '{"d": "anx\n'
+
+
+def test_only_one_worker_drains_a_claim(tmp_path):
+    from app.core.nlp.dataset_writer import _file_lock
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    _create_table(engine)
+    spill = str(tmp_path / "spill.ndjson")
+
+    writer = PhraseMapWriter(batch_size=3, spill_path=spill)
+    writer._overflow(ROWS)
+    writer.engine = engine
+
+    # another worker is draining
+    with _file_lock(spill + ".draining.lock"):
+        writer._drain_spill()
+    assert _count(engine) == 0
+
+    writer._drain_spill()
+    assert _count(engine) == len(ROWS)
@@ -0,0 +1,84 @@
+"""
+Database full-text backend (SQLite FTS5 trigram) on the seeded repertory.
+"""
+from sqlalchemy import text
+
+from app.core.repertory import rubric_search
+from app.core.repertory.fulltext import (
+    FTS_TABLE, ensure_fulltext_index, fulltext_available, search_rubrics_fulltext
+)
+from app.core.repertory.models import GoldenRubric
+
+
+def _add_rubric(db, rid, full_path, full_path_en, parent_id):
+    db.add(GoldenRubric(
+        id=rid, chapter=full_path.split(",")[0], full_path=full_path,
+        text=full_path.split(",")[-1].strip(), full_path_en=full_path_en,
+        text_en=full_path_en.split(",")[-1].strip(), parent_id=parent_id,
+        depth=full_path.count(","), oorep_id=100 + rid
+    ))
+    db.commit()
+
+
+def _paths(rows):
+    return [r.full_path for r in rows]
+
+
+def test_matches_inside_words(golden_db):
+    ensure_fulltext_index(golden_db)
+    # written after the index exists: the triggers keep it in sync
+    _add_rubric(golden_db, 7, "Kopf, Kopfschmerzen, dumpf", "Head, headache, dull", 1)
+
+    found = _paths(search_rubrics_fulltext(golden_db, ["schmerz"]))
+
+    assert "Kopf, Kopfschmerzen, dumpf" in found
+    assert "Kopf, Schmerz" in found
+    assert "Gemüt, Angst" not in found
+    # English column, middle of a word, case-insensitive
+    assert _paths(search_rubrics_fulltext(golden_db, ["CIPU"])) == ["Kopf, Schmerz, Hinterkopf"]
+
+
+def test_ranks_rubrics_matching_more_terms_first(golden_db):
+    ensure_fulltext_index(golden_db)
+
+    found = _paths(search_rubrics_fulltext(golden_db, ["schmerz", "stirn"]))
+
+    assert found[0] == "Kopf, Schmerz, Stirn"
+    assert set(found) == {"Kopf, Schmerz", "Kopf, Schmerz, Stirn", "Kopf, Schmerz, Hinterkopf"}
+
+
+def test_short_tokens_are_not_looked_up(golden_db):
+    ensure_fulltext_index(golden_db)
+
+    assert search_rubrics_fulltext(golden_db, ["ko"]) == []
+    assert _paths(search_rubrics_fulltext(golden_db, ["ko", "angst"])) == ["Gemüt, Angst"]
+
+
+def test_prefix_index_of_an_earlier_build_is_replaced(golden_db):
+    golden_db.execute(text(f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            full_path, full_path_en, content='golden_rubrics', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 0'
+        )
+    """))
+    golden_db.commit()
+    assert not fulltext_available(golden_db)
+
+    ensure_fulltext_index(golden_db)
+    ensure_fulltext_index(golden_db)
+
+    assert fulltext_available(golden_db)
+    assert "Kopf, Schmerz, Hinterkopf" in _paths(search_rubrics_fulltext(golden_db, ["hinterkopf"]))
+    assert "Kopf, Schmerz, Hinterkopf" in _paths(search_rubrics_fulltext(golden_db, ["terkopf"]))
+
+
+def test_search_rubrics_uses_the_fulltext_backend(golden_db, monkeypatch):
+    ensure_fulltext_index(golden_db)
+    monkeypatch.setattr(rubric_search, "RUBRIC_SEARCH_BACKEND", "fulltext")
+    rubric_search.reset_fulltext_check()
+    try:
+        found = _paths(rubric_search.search_rubrics(golden_db, "gst"))
+    finally:
+        rubric_search.reset_fulltext_check()
+
+    assert found == ["Gemüt, Angst"]
@@ -0,0 +1,20 @@
+import asyncio
+
+from app.hashing import HashingPool
+
+
+def test_pool_runs_again_after_shutdown():
+    pool = HashingPool(workers=1, max_queue=1)
+    assert asyncio.run(pool.run(sum, [1, 2])) == 3
+    pool.shutdown()
+    assert asyncio.run(pool.run(sum, [3, 4])) == 7
+    pool.shutdown()
+    assert pool.completed == 2
+
+
+def test_pool_is_exposed_on_metrics():
+    from app.metrics import render
+
+    text = render()
+    assert "reperto_hash_rejected_total " in text
+    assert 'reperto_hash_queue_wait_ms{quantile="0.99"}' in text
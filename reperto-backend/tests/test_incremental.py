@@ -0,0 +1,236 @@
+"""
+Differential build round trip: a full build followed by differential
+runs against an edited source must leave the golden tables exactly as
+a fresh full build of that source would, with an empty diff after.
+"""
+from collections import namedtuple
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.repertory import incremental, loader
+from app.core.repertory.incremental import (
+    build_golden_repertory_incremental,
+    diff_is_empty,
+    diff_manifests,
+    load_manifest,
+)
+from app.core.repertory.models import (
+    GoldenBuildManifest, GoldenRemedy, GoldenRubric, GoldenRubricClosure, GoldenRubricRemedy
+)
+
+Rubric = namedtuple("Rubric", "id fullpath mother")
+Remedy = namedtuple("Remedy", "id nameabbrev namelong")
+Relation = namedtuple("Relation", "rubricid remedyid weight")
+
+# OOREP-side ids, deliberately unrelated to the golden ids
+SOURCE_RUBRICS = [
+    Rubric(11, "Kopf", None),
+    Rubric(12, "Kopf, Schmerz", 11),
+    Rubric(13, "Kopf, Schmerz, Stirn", 12),
+    Rubric(14, "Kopf, Schmerz, Hinterkopf", 12),
+    Rubric(15, "Gemüt", None),
+    Rubric(16, "Gemüt, Angst", 15),
+]
+SOURCE_REMEDIES = [
+    Remedy(21, "Acon.", "Aconitum"),
+    Remedy(22, "Bell.", "Belladonna"),
+    Remedy(23, "Calc.", "Calcarea"),
+    Remedy(24, "Nux-v.", "Nux vomica"),
+]
+SOURCE_RELATIONS = [
+    Relation(13, 21, 3), Relation(14, 21, 3),
+    Relation(12, 22, 3), Relation(16, 22, 1),
+    Relation(16, 23, 2), Relation(12, 23, 1),
+    Relation(16, 24, 3), Relation(13, 24, 1),
+]
+WHITELIST = ["Kopf, Schmerz, Stirn", "Kopf, Schmerz, Hinterkopf", "Gemüt, Angst"]
+
+
+class StubSource:
+    """In-memory source adapter (see sources.py)."""
+
+    def __init__(self, rubrics, remedies, relations):
+        self.rubrics = {r.id: r for r in rubrics}
+        self.remedies = list(remedies)
+        self.relations = list(relations)
+
+    def rubrics_by_fullpath(self, fullpaths):
+        wanted = set(fullpaths)
+        return [r for r in self.rubrics.values() if r.fullpath in wanted]
+
+    def rubric_ancestry(self, rubric_ids):
+        found = {}
+        frontier = list(rubric_ids)
+        while frontier:
+            row = self.rubrics[frontier.pop()]
+            found[row.id] = row
+            if row.mother and row.mother not in found:
+                frontier.append(row.mother)
+        return list(found.values())
+
+    def relations_for_rubrics(self, rubric_ids):
+        wanted = set(rubric_ids)
+        return [rel for rel in self.relations if rel.rubricid in wanted]
+
+    def remedies_for_rubrics(self, rubric_ids):
+        used = {rel.remedyid for rel in self.relations_for_rubrics(rubric_ids)}
+        return [r for r in self.remedies if r.id in used]
+
+
+def _empty_golden_db(path):
+    engine = create_engine(f"sqlite:///{path}")
+    tables = [
+        GoldenRubric.__table__, GoldenRemedy.__table__, GoldenRubricRemedy.__table__,
+        GoldenRubricClosure.__table__, GoldenBuildManifest.__table__,
+    ]
+    GoldenRubric.metadata.create_all(bind=engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+
+def _golden_content(db):
+    """The golden tables keyed by OOREP ids, so two builds compare equal."""
+    rubric_oorep = dict(db.query(GoldenRubric.id, GoldenRubric.oorep_id).all())
+    remedy_oorep = dict(db.query(GoldenRemedy.id, GoldenRemedy.oorep_id).all())
+    rubrics = {
+        (r.oorep_id, r.full_path, r.full_path_en, r.chapter, r.depth, rubric_oorep.get(r.parent_id))
+        for r in db.query(GoldenRubric).all()
+    }
+    remedies = set(db.query(GoldenRemedy.oorep_id, GoldenRemedy.short_name, GoldenRemedy.long_name).all())
+    relations = {
+        (rubric_oorep[r.rubric_id], remedy_oorep[r.remedy_id], r.grade)
+        for r in db.query(GoldenRubricRemedy).all()
+    }
+    closure = {
+        (rubric_oorep[c.ancestor_id], rubric_oorep[c.descendant_id])
+        for c in db.query(GoldenRubricClosure).all()
+    }
+    return rubrics, remedies, relations, closure
+
+
+@pytest.fixture
+def build_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(loader, "GOLDEN_CORE_RUBRICS", list(WHITELIST))
+    # the search indexes are written into app/data; not what is under test
+    for module in (loader, incremental):
+        monkeypatch.setattr(module, "build_search_index", lambda db: None)
+        monkeypatch.setattr(module, "build_fulltext_index", lambda db: None)
+
+    dbs = []
+
+    def new_db(name):
+        db = _empty_golden_db(tmp_path / f"{name}.sqlite")
+        dbs.append(db)
+        return db
+
+    yield new_db
+    for db in dbs:
+        db.close()
+
+
+def _edited_source():
+    rubrics = SOURCE_RUBRICS + [Rubric(17, "Kopf, Schmerz, Schläfe", 12)]
+    remedies = [
+        Remedy(21, "Acon.", "Aconitum napellus"),   # renamed
+        Remedy(22, "Bell.", "Belladonna"),
+        # 23 Calcarea dropped with its relations
+        Remedy(24, "Nux-v.", "Nux vomica"),
+        Remedy(25, "Gels.", "Gelsemium"),           # new
+    ]
+    relations = [
+        Relation(13, 21, 2), Relation(14, 21, 3),   # 13:21 regraded
+        Relation(12, 22, 3), Relation(16, 22, 1),
+        Relation(16, 24, 3),                        # 13:24 removed
+        Relation(17, 25, 3), Relation(12, 25, 2),   # new rubric and remedy
+    ]
+    return StubSource(rubrics, remedies, relations)
+
+
+def test_full_build_records_a_manifest_the_next_diff_agrees_with(build_env):
+    db = build_env("golden")
+    source = StubSource(SOURCE_RUBRICS, SOURCE_REMEDIES, SOURCE_RELATIONS)
+
+    loader.build_golden_repertory(db, source)
+    manifest = load_manifest(db)
+
+    assert set(manifest["rubric"]) == {str(r.id) for r in SOURCE_RUBRICS}
+    assert set(manifest["remedy"]) == {str(r.id) for r in SOURCE_REMEDIES}
+    assert len(manifest["relation"]) == len(SOURCE_RELATIONS)
+
+    diff = build_golden_repertory_incremental(db, source)
+    assert diff_is_empty(diff)
+
+
+def test_differential_build_matches_a_fresh_full_build(build_env):
+    db = build_env("golden")
+    loader.build_golden_repertory(db, StubSource(SOURCE_RUBRICS, SOURCE_REMEDIES, SOURCE_RELATIONS))
+
+    loader.GOLDEN_CORE_RUBRICS.append("Kopf, Schmerz, Schläfe")
+    edited = _edited_source()
+
+    diff = build_golden_repertory_incremental(db, edited)
+
+    assert diff["rubric"]["added"] == ["17"]
+    assert diff["remedy"]["added"] == ["25"]
+    assert diff["remedy"]["removed"] == ["23"]
+    assert diff["remedy"]["changed"] == ["21"]
+    assert diff["relation"]["changed"] == ["13:21"]
+    assert set(diff["relation"]["removed"]) == {"16:23", "12:23", "13:24"}
+    assert set(diff["relation"]["added"]) == {"17:25", "12:25"}
+
+    reference = build_env("reference")
+    loader.build_golden_repertory(reference, edited)
+    assert _golden_content(db) == _golden_content(reference)
+    assert load_manifest(db) == load_manifest(reference)
+
+    assert diff_is_empty(build_golden_repertory_incremental(db, edited))
+
+
+def test_database_without_manifest_is_reconciled_from_a_baseline(build_env):
+    db = build_env("golden")
+    loader.build_golden_repertory(db, StubSource(SOURCE_RUBRICS, SOURCE_REMEDIES, SOURCE_RELATIONS))
+    # as built before golden_build_manifest existed
+    db.query(GoldenBuildManifest).delete()
+    db.commit()
+
+    loader.GOLDEN_CORE_RUBRICS.append("Kopf, Schmerz, Schläfe")
+    edited = _edited_source()
+    build_golden_repertory_incremental(db, edited)
+
+    reference = build_env("reference")
+    loader.build_golden_repertory(reference, edited)
+    assert _golden_content(db) == _golden_content(reference)
+    assert load_manifest(db) == load_manifest(reference)
+
+
+def test_dry_run_reports_without_applying(build_env):
+    db = build_env("golden")
+    loader.build_golden_repertory(db, StubSource(SOURCE_RUBRICS, SOURCE_REMEDIES, SOURCE_RELATIONS))
+    before = _golden_content(db)
+
+    loader.GOLDEN_CORE_RUBRICS.append("Kopf, Schmerz, Schläfe")
+    diff = build_golden_repertory_incremental(db, _edited_source(), dry_run=True)
+
+    assert not diff_is_empty(diff)
+    assert _golden_content(db) == before
+
+
+def test_manifest_without_fingerprints_rewrites_every_row():
+    old = {
+        "rubric": {"11": "", "12": ""},
+        "remedy": {"21": "a"},
+        "relation": {"11:21": "x", "12:21": "y"},
+    }
+    new = {
+        "rubric": {"11": "f", "12": "g"},
+        "remedy": {"21": "a", "22": "b"},
+        "relation": {"11:21": "x", "12:21": "z"},
+    }
+
+    diff = diff_manifests(old, new)
+
+    assert sorted(diff["rubric"]["changed"]) == ["11", "12"]
+    assert diff["remedy"] == {"added": ["22"], "changed": [], "removed": []}
+    assert diff["relation"] == {"added": [], "changed": ["12:21"], "removed": []}
+    assert diff_is_empty(diff_manifests(new, new))
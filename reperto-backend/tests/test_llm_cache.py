@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from app.llm_cache import LLMResponseCache
+
+
+def test_disk_tier_honours_ttl(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    LLMResponseCache(path=path, ttl=60).set("k", "t", {"a": 1})
+
+    # a fresh process (empty memory tier) still gets it while it is fresh
+    assert LLMResponseCache(path=path, ttl=60).get("k") == {"a": 1}
+
+    stale = LLMResponseCache(path=path, ttl=60)
+    stale._disk().execute("UPDATE llm_cache SET created_at = ?", (time.time() - 120,))
+    assert stale.get("k") is None
+
+
+def test_size_budget_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    value = "x" * 1000
+    first = LLMResponseCache(path=path, max_bytes=10_000)
+    second = LLMResponseCache(path=path, max_bytes=10_000)
+    first.open()
+    second.open()
+
+    for i in range(8):
+        first.set(f"a{i}", "t", value)
+        second.set(f"b{i}", "t", value)
+
+    total = first._disk().execute("SELECT SUM(size) FROM llm_cache").fetchone()[0]
+    assert total <= 10_000
+
+
+def test_async_access_reaches_the_disk_tier(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+
+    async def roundtrip():
+        await LLMResponseCache(path=path).aset("k", "t", ["v"])
+        return await LLMResponseCache(path=path).aget("k")
+
+    assert asyncio.run(roundtrip()) == ["v"]
+
+
+def test_overwrites_keep_the_size_total_exact(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "llm.sqlite"))
+    for value in ("x" * 100, "y" * 40, "z" * 70):
+        cache.set("k", "t", value)
+    conn = cache._disk()
+    assert conn.execute("SELECT bytes FROM llm_cache_size").fetchone()[0] == \
+        conn.execute("SELECT SUM(size) FROM llm_cache").fetchone()[0]
+
+
+def test_busy_eviction_leaves_no_open_transaction(tmp_path):
+    import sqlite3
+
+    import pytest
+
+    path = str(tmp_path / "llm.sqlite")
+    cache = LLMResponseCache(path=path, max_bytes=10_000)
+    for i in range(5):
+        cache.set(f"k{i}", "t", "x" * 1000)
+    conn = cache._disk()
+    conn.execute("PRAGMA busy_timeout = 0")
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        cache._evict(conn)
+    assert not conn.in_transaction
+    other.execute("ROLLBACK")
+
+    cache.max_bytes = 2_000
+    cache._evict(conn)
+    assert conn.execute("SELECT SUM(size) FROM llm_cache").fetchone()[0] <= 2_000
+
+
+def test_disk_hits_touch_accessed_at_in_batches(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    LLMResponseCache(path=path).set("k", "t", "v")
+    conn = LLMResponseCache(path=path)._disk()
+    before = conn.execute("SELECT accessed_at FROM llm_cache").fetchone()[0]
+
+    reader = LLMResponseCache(path=path)
+    time.sleep(0.01)
+    assert reader.get("k") == "v"
+    assert conn.execute("SELECT accessed_at FROM llm_cache").fetchone()[0] == before
+
+    reader.close()
+    assert conn.execute("SELECT accessed_at FROM llm_cache").fetchone()[0] > before
@@ -0,0 +1,34 @@
+import pytest
+
+from app.core.nlp.fuzzy import edit_distance
+from app.core.nlp.normalizer import build_rubric_vocabulary, install_rubric_vocabulary, resolve_token
+
+
+@pytest.fixture(autouse=True)
+def rubric_vocabulary():
+    # words of the bundled repertory the false positives used to land on
+    install_rubric_vocabulary(build_rubric_vocabulary(["tearing", "dreams", "sleepiness", "schmerz"]))
+    yield
+    install_rubric_vocabulary(build_rubric_vocabulary([]))
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("ghabrahut", ("angst",)),
+    ("neendh", ("schlaf",)),
+    ("anxity", ("angst",)),
+    ("insomia", ("schlaflosigkeit",)),
+])
+def test_intended_corrections(token, expected):
+    assert resolve_token(token) == expected
+
+
+@pytest.mark.parametrize("token", ["hearing", "fearing", "paint", "dread", "sleeping"])
+def test_ordinary_words_are_not_corrected(token):
+    assert resolve_token(token) == (token,)
+
+
+def test_edit_distance():
+    assert edit_distance("neendh", "neend") == 1
+    assert edit_distance("ghabrahut", "ghabrahat") == 1
+    assert edit_distance("anixety", "anxiety") == 1  # transposition
+    assert edit_distance("sleeping", "sleepiness") == 3
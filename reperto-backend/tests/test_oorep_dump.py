@@ -0,0 +1,160 @@
+"""
+PgDumpReader / OorepDumpSource on a small plain-format pg_dump.
+"""
+import gzip
+
+import pytest
+
+from app.core.repertory.oorep_dump import (
+    OorepDumpSource, PgDumpReader, RelationRow, RemedyRow, RubricRow, decode_copy_field
+)
+
+# What pg_dump --format=plain writes, trimmed: DDL around the COPY
+# blocks, tables in dump order, columns not in the order the reader asks
+DUMP = r"""--
+-- PostgreSQL database dump
+--
+
+SET client_encoding = 'UTF8';
+
+CREATE TABLE public.info (
+    abbrev text
+);
+
+COPY public.info (abbrev) FROM stdin;
+kent
+\.
+
+
+CREATE TABLE public.remedy (
+    id integer NOT NULL,
+    namelong text,
+    nameabbrev text
+);
+
+COPY public.remedy (id, namelong, nameabbrev) FROM stdin;
+21	Aconitum napellus	Acon.
+22	Belladonna\t(Tollkirsche)	Bell.
+23	Calcarea \\ carbonica	Calc.
+24	\N	Nux-v.
+\.
+
+
+COPY "public"."rubric" (abbrev, id, mother, fullpath) FROM stdin;
+kent	11	\N	Kopf
+kent	12	11	Kopf, Schmerz
+kent	13	12	Kopf, Schmerz, Stirn
+kent	14	12	Kopf, Schmerz, Hinterkopf
+kent	15	\N	Gem\303\274t
+kent	16	15	Gemüt, Angst
+\.
+
+
+COPY public.rubricremedy (abbrev, rubricid, remedyid, weight, chapterid) FROM stdin;
+kent	13	21	3	1
+kent	14	21	3	1
+kent	12	22	3	1
+kent	16	22	1	2
+kent	16	23	2	2
+kent	13	24	1	1
+kent	12	24	\N	1
+\.
+
+
+--
+-- PostgreSQL database dump complete
+--
+"""
+
+
+@pytest.fixture(params=[".sql", ".sql.gz"])
+def dump_path(request, tmp_path):
+    path = tmp_path / f"oorep{request.param}"
+    data = DUMP.encode("utf-8")
+    if request.param.endswith(".gz"):
+        data = gzip.compress(data)
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (b"plain", "plain"),
+    (b"\\N", None),
+    (b"a\\tb", "a\tb"),
+    (b"line\\nbreak\\r", "line\nbreak\r"),
+    (b"back\\\\slash", "back\\slash"),
+    (b"\\101\\x42", "AB"),
+    (b"\\\\N", "\\N"),
+    ("Gemüt".encode("utf-8"), "Gemüt"),
+    # escapes are bytes: a multi-byte UTF-8 character spelled out
+    (b"Gem\\303\\274t", "Gemüt"),
+    (b"Gem\\xc3\\xbct", "Gemüt"),
+    (b"", ""),
+])
+def test_decode_copy_field(raw, expected):
+    assert decode_copy_field(raw) == expected
+
+
+def test_rows_selects_columns_by_name(dump_path):
+    reader = PgDumpReader(dump_path)
+
+    rows = list(reader.rows("remedy", ("id", "nameabbrev", "namelong")))
+
+    assert rows == [
+        ("21", "Acon.", "Aconitum napellus"),
+        ("22", "Bell.", "Belladonna\t(Tollkirsche)"),
+        ("23", "Calc.", "Calcarea \\ carbonica"),
+        ("24", "Nux-v.", None),
+    ]
+
+
+def test_rows_reads_blocks_in_any_order_and_again(dump_path):
+    reader = PgDumpReader(dump_path)
+
+    relations = list(reader.rows("rubricremedy", ("rubricid", "weight")))
+    # earlier block, found through the offsets recorded while scanning
+    rubrics = list(reader.rows("rubric", ("id", "fullpath")))
+
+    assert len(relations) == 7
+    assert relations[-1] == ("12", None)
+    assert ("15", "Gemüt") in rubrics
+    assert list(reader.rows("rubric", ("id", "fullpath"))) == rubrics
+    assert list(reader.rows("info", ("abbrev",))) == [("kent",)]
+
+
+def test_rows_rejects_unknown_table_and_column(dump_path):
+    reader = PgDumpReader(dump_path)
+
+    with pytest.raises(ValueError, match="No COPY block"):
+        list(reader.rows("chapter", ("id",)))
+    with pytest.raises(ValueError, match="rubric"):
+        list(reader.rows("rubric", ("id", "textt")))
+
+
+def test_source_adapter(dump_path):
+    source = OorepDumpSource(dump_path)
+
+    assert source.rubrics_by_fullpath(["Kopf, Schmerz, Stirn", "Gemüt, Angst", "Rücken"]) == [
+        RubricRow(13, "Kopf, Schmerz, Stirn", 12),
+        RubricRow(16, "Gemüt, Angst", 15),
+    ]
+
+    ancestry = sorted(source.rubric_ancestry([13, 16]))
+    assert ancestry == [
+        RubricRow(11, "Kopf", None),
+        RubricRow(12, "Kopf, Schmerz", 11),
+        RubricRow(13, "Kopf, Schmerz, Stirn", 12),
+        RubricRow(15, "Gemüt", None),
+        RubricRow(16, "Gemüt, Angst", 15),
+    ]
+
+    assert source.relations_for_rubrics([12, 16]) == [
+        RelationRow(12, 22, 3),
+        RelationRow(16, 22, 1),
+        RelationRow(16, 23, 2),
+        RelationRow(12, 24, None),
+    ]
+    assert source.remedies_for_rubrics([16]) == [
+        RemedyRow(22, "Bell.", "Belladonna\t(Tollkirsche)"),
+        RemedyRow(23, "Calc.", "Calcarea \\ carbonica"),
+    ]
@@ -0,0 +1,17 @@
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import AnalyzeRequest, ScoreRequest
+
+
+@pytest.mark.parametrize("value", ["false", "0", 0, 1, "true"])
+def test_include_subrubrics_only_takes_json_booleans(value):
+    with pytest.raises(ValidationError):
+        ScoreRequest(rubrics=["Kopf"], include_subrubrics=value)
+    with pytest.raises(ValidationError):
+        AnalyzeRequest(text="x", include_subrubrics=value)
+
+
+def test_include_subrubrics_defaults_off():
+    assert ScoreRequest().include_subrubrics is False
+    assert AnalyzeRequest(text="x", include_subrubrics=True).include_subrubrics is True
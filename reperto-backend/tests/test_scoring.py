@@ -0,0 +1,27 @@
+import math
+
+from app.core.repertory.scoring import repertory_score
+
+
+def _scores(results):
+    return {r["remedy_name"]: r["score"] for r in results}
+
+
+def test_subrubrics_count_once_towards_coverage(golden_db, compiled):
+    # Aconitum covers only "Kopf, Schmerz" (through two of its subrubrics)
+    results = repertory_score(golden_db, [2, 6], strategy="boenninghausen", include_subrubrics=True)
+    col = list(compiled.remedy_ids).index(1)
+    relative = max(compiled.remedy_totals[col] / compiled.mean_remedy_total, 1.0)
+    assert _scores(results)["Aconitum"] == round(1 * (3 + 3) / math.sqrt(relative), 3)
+
+
+def test_coverage_first_ranks_by_selected_rubrics(golden_db, compiled):
+    results = repertory_score(golden_db, [2, 6], strategy="coverage_first", include_subrubrics=True)
+    # the others cover both selected rubrics; Aconitum has the most grades but covers one
+    assert [r["remedy_name"] for r in results][-1] == "Aconitum"
+
+
+def test_nested_selection_counts_both_rubrics(golden_db, compiled):
+    # "Kopf, Schmerz, Stirn" lies under both selected rubrics
+    results = repertory_score(golden_db, [1, 2], strategy="coverage_first", include_subrubrics=True)
+    assert results[0]["remedy_name"] == "Aconitum"
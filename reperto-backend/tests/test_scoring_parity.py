@@ -0,0 +1,72 @@
+"""
+The compiled-repertory scorer against the SQL aggregation it replaced
+(relations of the selected rubrics, grades summed per remedy).
+"""
+import os
+import random
+
+import pytest
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.repertory.compiled import (
+    build_compiled_repertory, current_compiled_repertory, set_compiled_repertory
+)
+from app.core.repertory.scoring import repertory_score
+
+BUNDLED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reperto_db.sqlite")
+
+SQL_RELATIONS = text("""
+    SELECT rubric_id, remedy_id, grade
+    FROM golden_rubric_remedies
+    WHERE rubric_id IN :ids
+    ORDER BY id
+""").bindparams(bindparam("ids", expanding=True))
+
+
+def sql_scores(db, rubric_ids):
+    """remedy_id -> (score, sorted contributions), as the SQL scorer computed them."""
+    scores = {}
+    for rubric_id, remedy_id, grade in db.execute(SQL_RELATIONS, {"ids": list(rubric_ids)}):
+        score, contributions = scores.get(remedy_id, (0, []))
+        scores[remedy_id] = (score + grade, contributions + [(rubric_id, grade)])
+    return {rid: (score, sorted(c)) for rid, (score, c) in scores.items()}
+
+
+def compiled_scores(results):
+    return {
+        r["remedy_id"]: (r["score"], sorted((c["rubric_id"], c["grade"]) for c in r["contributions"]))
+        for r in results
+    }
+
+
+def assert_parity(db, rubric_ids):
+    results = repertory_score(db, rubric_ids)
+    assert compiled_scores(results) == sql_scores(db, rubric_ids)
+    ranked = [r["score"] for r in results]
+    assert ranked == sorted(ranked, reverse=True)
+
+
+@pytest.mark.parametrize("rubric_ids", [[2], [2, 6], [1, 3, 4], [5, 6, 3], [6, 6, 2], [99], []])
+def test_seeded_parity(golden_db, compiled, rubric_ids):
+    if not rubric_ids:
+        assert repertory_score(golden_db, rubric_ids) == []
+        return
+    assert_parity(golden_db, rubric_ids)
+
+
+@pytest.fixture
+def bundled():
+    db = sessionmaker(bind=create_engine(f"sqlite:///{BUNDLED_DB}"))()
+    previous = current_compiled_repertory()
+    set_compiled_repertory(build_compiled_repertory(db))
+    yield db
+    set_compiled_repertory(previous)
+    db.close()
+
+
+def test_bundled_parity(bundled):
+    rubric_ids = [row[0] for row in bundled.execute(text("SELECT id FROM golden_rubrics ORDER BY id"))]
+    rnd = random.Random(7)
+    for _ in range(25):
+        assert_parity(bundled, rnd.sample(rubric_ids, rnd.randint(1, 8)))
@@ -0,0 +1,38 @@
+from app.core.repertory.search_index import PARTIAL_MATCH_WEIGHT, RubricSearchIndex, tokenize
+
+
+def _index():
+    # rows: 0 "Kopf", 1 "Kopf, Kopfschmerz", 2 "Allgemeines, Schmerz"
+    postings = {
+        "kopf": [(0, 1), (1, 1)],
+        "kopfschmerz": [(1, 1)],
+        "allgemeines": [(2, 1)],
+        "schmerz": [(2, 1)],
+    }
+    return RubricSearchIndex("test", postings, [1, 2, 2])
+
+
+def test_exact_term_also_expands_to_containing_terms():
+    index = _index()
+    assert index._expand_token("schmerz") == (("schmerz", 1.0), ("kopfschmerz", PARTIAL_MATCH_WEIGHT))
+
+
+def test_schmerz_finds_kopfschmerz():
+    rows = [row for row, _ in _index().search(["schmerz"])]
+    assert rows == [2, 1]
+
+
+def test_partial_only_token():
+    rows = [row for row, _ in _index().search(["schmer"])]
+    assert sorted(rows) == [1, 2]
+
+
+def test_tokenize_drops_punctuation():
+    assert tokenize("Kopf, Kopfschmerz; (Hinterkopf)") == ["kopf", "kopfschmerz", "hinterkopf"]
+
+
+def test_containing_terms_match_a_vocabulary_scan():
+    terms = ["kopf", "kopfschmerz", "schmerz", "hinterkopf", "abcab", "bcabc", "ab"]
+    index = RubricSearchIndex("test", {t: [(0, 1)] for t in terms}, [1])
+    for token in ("kopf", "schmerz", "bcab", "abcab", "ab", "zzz", "opfsch"):
+        assert index._containing_terms(token) == [t for t in index.vocabulary if token in t]
@@ -0,0 +1,51 @@
+import os
+import shutil
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.repertory.snapshot import RepertorySnapshot, load_repertory
+
+DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reperto_db.sqlite")
+
+
+def test_snapshot_of_another_database_is_rebuilt(tmp_path):
+    shutil.copy(DB, tmp_path / "db.sqlite")
+    db = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}"))()
+    path = str(tmp_path / "repertory.snap")
+
+    load_repertory(db, path)
+    written = RepertorySnapshot.open(path).meta["db_fingerprint"]
+
+    # unchanged database: the snapshot is reused as is
+    stamp = os.stat(path).st_mtime_ns
+    load_repertory(db, path)
+    assert os.stat(path).st_mtime_ns == stamp
+
+    db.execute(text("UPDATE golden_rubric_remedies SET grade = grade + 1 WHERE id = 1"))
+    db.commit()
+    compiled = load_repertory(db, path)
+
+    rebuilt = RepertorySnapshot.open(path)
+    assert rebuilt.meta["db_fingerprint"] != written
+    assert rebuilt.version == compiled.version
+    db.close()
+
+
+def test_watcher_refuses_a_snapshot_of_another_database(golden_db, compiled):
+    import time
+
+    from app.core.repertory.snapshot import SnapshotWatcher, database_fingerprint, write_snapshot
+
+    path = str(golden_db.get_bind().url.database) + ".snap"
+    watcher = SnapshotWatcher(interval=1, session_factory=lambda: golden_db)
+    watcher.path = path
+
+    write_snapshot(compiled, None, path, db_fingerprint="rubrics=1/1;remedies=1/1;relations=1/1/1")
+    assert watcher.check() is False
+    assert watcher.errors == 1 and "database is" in watcher.last_error
+
+    time.sleep(0.01)  # new mtime
+    write_snapshot(compiled, None, path, db_fingerprint=database_fingerprint(golden_db))
+    assert watcher.check() is True
+    assert watcher.swaps == 1
@@ -0,0 +1,76 @@
+import math
+
+import pytest
+from sqlalchemy import text
+
+from app.core.repertory import scoring
+from app.core.repertory.scoring import (
+    DEFAULT_STRATEGY, SCORING_STRATEGIES, get_strategy, register_strategy, repertory_score
+)
+
+SELECTIONS = [[2], [2, 6], [3, 4, 5], [1, 2, 3, 4, 5, 6]]
+
+
+def _reference(db, rubric_ids):
+    """Every strategy's score recomputed from SQL aggregates."""
+    relations = db.execute(text("SELECT rubric_id, remedy_id, grade FROM golden_rubric_remedies")).fetchall()
+    remedies = [r[0] for r in db.execute(text("SELECT id FROM golden_remedies"))]
+
+    sizes, totals = {}, dict.fromkeys(remedies, 0)
+    for rubric_id, remedy_id, grade in relations:
+        sizes[rubric_id] = sizes.get(rubric_id, 0) + 1
+        totals[remedy_id] += grade
+    mean_total = sum(totals.values()) / len(remedies)
+
+    grades, covered, rarity = {}, {}, {}
+    for rubric_id, remedy_id, grade in relations:
+        if rubric_id not in rubric_ids:
+            continue
+        grades[remedy_id] = grades.get(remedy_id, 0) + grade
+        covered.setdefault(remedy_id, set()).add(rubric_id)
+        rarity[remedy_id] = rarity.get(remedy_id, 0.0) + grade * math.log(1 + len(remedies) / sizes[rubric_id])
+
+    return {
+        "sum_of_grades": {m: (s, s) for m, s in grades.items()},
+        "coverage_first": {m: (s, (len(covered[m]), s)) for m, s in grades.items()},
+        "rarity_weighted": {m: (round(v, 3), round(v, 3)) for m, v in rarity.items()},
+        "boenninghausen": {
+            m: (v, v) for m, v in (
+                (m, round(len(covered[m]) * s / math.sqrt(max(totals[m] / mean_total, 1.0)), 3))
+                for m, s in grades.items()
+            )
+        },
+    }
+
+
+@pytest.mark.parametrize("strategy", sorted(SCORING_STRATEGIES))
+@pytest.mark.parametrize("rubric_ids", SELECTIONS)
+def test_strategy_matches_sql_reference(golden_db, compiled, strategy, rubric_ids):
+    expected = _reference(golden_db, rubric_ids)[strategy]
+    results = repertory_score(golden_db, rubric_ids, strategy=strategy)
+
+    assert {r["remedy_id"]: r["score"] for r in results} == {m: score for m, (score, _) in expected.items()}
+    keys = [expected[r["remedy_id"]][1] for r in results]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_every_builtin_strategy_is_registered():
+    assert set(SCORING_STRATEGIES) == {"sum_of_grades", "coverage_first", "rarity_weighted", "boenninghausen"}
+    assert get_strategy(None) is SCORING_STRATEGIES[DEFAULT_STRATEGY]
+
+
+def test_unknown_strategy_lists_the_available_ones():
+    with pytest.raises(ValueError, match="boenninghausen"):
+        get_strategy("nope")
+
+
+def test_registered_strategy_is_used(golden_db, compiled, monkeypatch):
+    monkeypatch.setattr(scoring, "SCORING_STRATEGIES", dict(SCORING_STRATEGIES))
+
+    @register_strategy("fewest_grades")
+    def fewest_grades(compiled, scores, contributions, origin=None):
+        return {col: (score, -score) for col, score in scores.items()}
+
+    results = repertory_score(golden_db, [2, 6], strategy="fewest_grades")
+    ranked = [r["score"] for r in results]
+    assert ranked == sorted(ranked)
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, ScrollView, ActivityIndicator, TouchableOpacity, Platform } from 'react-native';
 import { Colors, Shadows } from '../styles';
-import { api } from '../services/api';
+import { getCase } from '../services/api';
 import RemedyResultCard from '../components/RemedyResultCard';
 
 export default function CaseDetailScreen({ route, navigation }: any) {
@@ -15,12 +15,8 @@ export default function CaseDetailScreen({ route, navigation }: any) {
 
   async function fetchCaseDetails() {
     try {
-      const res = await api.get(`/cases`);
-      // Since backend uses in-memory list for demo, we find it in the list
-      const found = res.data.find((c: any) => c.id === caseId);
-      if (found) {
-        setCaseData(found);
-      }
+      const found = await getCase(caseId);
+      setCaseData(found);
     } catch (error) {
       console.error("Error fetching case details:", error);
     } finally {
@@ -1,5 +1,5 @@
 import { useFocusEffect } from '@react-navigation/native';
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { View, Text, TouchableOpacity, StyleSheet, FlatList, TextInput, StatusBar, ActivityIndicator, Alert, Platform } from 'react-native';
 import { Colors, Shadows } from '../styles';
 import { NativeStackNavigationProp } from '@react-navigation/native-stack';
@@ -14,11 +14,22 @@ type Props = {
   navigation: CasesNav;
 };
 
+const PAGE_SIZE = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+
 export default function CaseListScreen({ navigation }: Props) {
   const [search, setSearch] = useState('');
   const [userName, setUserName] = useState('Doctor');
   const [cases, setCases] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // search runs on the server (GET /cases?q=), so it covers every page
+  const query = useRef('');
+  // bumped by every first-page load; stale responses are dropped
+  const generation = useRef(0);
+  const searchMounted = useRef(false);
 
   useFocusEffect(
     useCallback(() => {
@@ -26,23 +37,59 @@ export default function CaseListScreen({ navigation }: Props) {
     }, [])
   );
 
+  useEffect(() => {
+    // the focus effect loads the first page on mount
+    if (!searchMounted.current) {
+      searchMounted.current = true;
+      return;
+    }
+    query.current = search.trim();
+    const timer = setTimeout(() => {
+      loadFirstPage().catch(e => console.error("Failed to search cases", e));
+    }, SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  async function loadFirstPage() {
+    const current = ++generation.current;
+    const page = await getCases(undefined, PAGE_SIZE, query.current || undefined);
+    if (current !== generation.current) return;
+    setCases(page.items);
+    setNextCursor(page.next_cursor);
+  }
+
+  async function loadMore() {
+    if (!nextCursor || loadingMore) return;
+    const current = generation.current;
+    setLoadingMore(true);
+    try {
+      const page = await getCases(nextCursor, PAGE_SIZE, query.current || undefined);
+      if (current !== generation.current) return;
+      setCases(prev => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (e) {
+      console.error("Failed to load more cases", e);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   async function loadInitialData() {
     try {
       // Try to get name from storage first for instant UI
       const storedName = await AsyncStorage.getItem('user_name');
       if (storedName) setUserName(storedName);
 
-      // Fetch fresh profile and cases
-      const [profile, casesData] = await Promise.all([
+      // Fetch fresh profile and the first page of cases
+      const [profile] = await Promise.all([
         getProfile(),
-        getCases()
+        loadFirstPage()
       ]);
 
       if (profile?.name) {
         setUserName(profile.name);
         await AsyncStorage.setItem('user_name', profile.name);
       }
-      setCases(casesData);
     } catch (e) {
       console.error("Failed to load data", e);
     } finally {
@@ -50,11 +97,6 @@ export default function CaseListScreen({ navigation }: Props) {
     }
   }
 
-  const filteredCases = cases.filter(c =>
-    c.name.toLowerCase().includes(search.toLowerCase()) ||
-    c.specialty.toLowerCase().includes(search.toLowerCase())
-  );
-
   if (loading) {
     return (
       <View style={[styles.container, { justifyContent: 'center', alignItems: 'center' }]}>
@@ -137,8 +179,13 @@ export default function CaseListScreen({ navigation }: Props) {
 
       {/* Cases List */}
       <FlatList
-        data={filteredCases}
+        data={cases}
         keyExtractor={(item) => item.id}
+        onEndReached={loadMore}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={
+          loadingMore ? <ActivityIndicator style={{ marginVertical: 16 }} color={Colors.primary} /> : null
+        }
         renderItem={({ item }) => (
           <TouchableOpacity onPress={() => navigation.navigate('CaseDetail', { caseId: item.id })}>
             <PatientCard
@@ -44,8 +44,13 @@ export async function getProfile() {
   return res.data;
 }
 
-export async function getCases() {
-  const res = await api.get("/cases");
+export async function getCases(cursor?: string, limit: number = 50, q?: string) {
+  const res = await api.get("/cases", { params: { limit, cursor, q } });
+  return res.data; // { items, next_cursor }
+}
+
+export async function getCase(caseId: string) {
+  const res = await api.get(`/cases/${caseId}`);
   return res.data;
 }
 